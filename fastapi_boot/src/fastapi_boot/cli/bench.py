@@ -0,0 +1,288 @@
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from statistics import quantiles
+from time import perf_counter
+from typing import Any
+from urllib.parse import urlsplit
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from starlette.routing import compile_path
+from starlette.types import ASGIApp
+
+from fastapi_boot.core.const import PropNameConstant
+from fastapi_boot.core.radix import UncompilableRouteException, iter_leaf_routes
+
+
+@dataclass
+class BenchRequest:
+    method: str
+    path: str
+    query: str = ''
+    body: bytes = b''
+    headers: list[tuple[bytes, bytes]] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, route: str, body: bytes = b'', headers: list[tuple[bytes, bytes]] = []):
+        """如 GET /user/1?x=1"""
+        method, _, url = route.strip().partition(' ')
+        parts = urlsplit(url.strip())
+        return cls(method.upper(), parts.path or '/', parts.query, body, list(headers))
+
+    def __str__(self) -> str:
+        return f'{self.method} {self.path}' + (f'?{self.query}' if self.query else '')
+
+
+@dataclass
+class BenchResult:
+    request: BenchRequest
+    # {状态码: 次数}
+    statuses: dict[int, int]
+    rps: float
+    p50: float
+    p95: float
+    p99: float
+    # 同一个endpoint挂载到普通FastAPI上的p50，没有匹配的APIRoute时为None
+    plain_p50: float | None = None
+
+
+async def call_asgi(app: ASGIApp, request: BenchRequest, state: dict[str, Any]) -> tuple[int, bytes, str]:
+    """不经过网络直接调用app
+
+    Returns:
+        tuple[int, bytes, str]: 状态码、响应体、content-type
+    """
+    headers = [(b'host', b'bench'), *request.headers]
+    if request.body:
+        headers.append((b'content-length', str(len(request.body)).encode()))
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': request.method,
+        'scheme': 'http',
+        'path': request.path,
+        'raw_path': request.path.encode(),
+        'root_path': '',
+        'query_string': request.query.encode(),
+        'headers': headers,
+        'client': ('127.0.0.1', 0),
+        'server': ('bench', 80),
+        'state': dict(state),
+    }
+    status = 0
+    content_type = ''
+    chunks: list[bytes] = []
+    done = asyncio.Event()
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': request.body, 'more_body': False}
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal status, content_type
+        if message['type'] == 'http.response.start':
+            status = message['status']
+            for k, v in message.get('headers', []):
+                if k.lower() == b'content-type':
+                    content_type = v.decode()
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                done.set()
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # ServerErrorMiddleware返回500后会继续抛出异常
+        status = status or 500
+    finally:
+        done.set()
+    return status, b''.join(chunks), content_type
+
+
+@asynccontextmanager
+async def lifespan(app: ASGIApp, state: dict[str, Any]) -> AsyncIterator[None]:
+    """执行app的lifespan，app不支持时忽略"""
+    receive_queue: asyncio.Queue = asyncio.Queue()
+    send_queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(
+        app({'type': 'lifespan', 'asgi': {'version': '3.0'}, 'state': state}, receive_queue.get, send_queue.put)  # type: ignore
+    )
+
+    async def wait(expected: str) -> bool:
+        await receive_queue.put({'type': f'lifespan.{expected}'})
+        getter = asyncio.ensure_future(send_queue.get())
+        await asyncio.wait([getter, task], return_when=asyncio.FIRST_COMPLETED)
+        if not getter.done():
+            getter.cancel()
+            return False
+        message = getter.result()
+        if message['type'] == f'lifespan.{expected}.failed':
+            raise RuntimeError(message.get('message', f'lifespan {expected} failed'))
+        return True
+
+    supported = await wait('startup')
+    try:
+        yield
+    finally:
+        if supported:
+            await wait('shutdown')
+        if not task.done():
+            task.cancel()
+
+
+def _has_required_params(route: APIRoute) -> bool:
+    dependants = [route.dependant]
+    while dependants:
+        dependant = dependants.pop()
+        for name in ('query_params', 'header_params', 'cookie_params', 'body_params'):
+            if any(p.field_info.is_required() for p in getattr(dependant, name)):
+                return True
+        dependants.extend(dependant.dependencies)
+    return False
+
+
+def discover_routes(app: FastAPI) -> list[BenchRequest]:
+    """没有路径参数、没有必填参数的GET路由"""
+    requests = []
+    for route in app.router.routes:
+        try:
+            leaves = list(iter_leaf_routes(route))
+        except UncompilableRouteException:
+            continue
+        for path, leaf in leaves:
+            if not isinstance(leaf, APIRoute) or 'GET' not in leaf.methods or '{' in path:
+                continue
+            if not _has_required_params(leaf):
+                requests.append(BenchRequest('GET', path))
+    return requests
+
+
+async def measure(
+    app: ASGIApp,
+    request: BenchRequest,
+    state: dict[str, Any],
+    requests: int,
+    concurrency: int,
+    warmup: int,
+) -> tuple[list[float], dict[int, int], float]:
+    """
+    Returns:
+        tuple[list[float], dict[int, int], float]: 每个请求的耗时、{状态码: 次数}、总耗时
+    """
+    for _ in range(warmup):
+        await call_asgi(app, request, state)
+    costs: list[float] = []
+    statuses: dict[int, int] = {}
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = perf_counter()
+            status, _, _ = await call_asgi(app, request, state)
+            costs.append(perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return costs, statuses, perf_counter() - start
+
+
+def match_route(app: ASGIApp, request: BenchRequest) -> tuple[str, APIRoute] | None:
+    """请求匹配的APIRoute及其完整路径，没有时为None"""
+    for route in getattr(app, 'routes', []):
+        try:
+            leaves = list(iter_leaf_routes(route))
+        except UncompilableRouteException:
+            continue
+        for path, leaf in leaves:
+            if (
+                isinstance(leaf, APIRoute)
+                and request.method in leaf.methods
+                and compile_path(path)[0].match(request.path)
+            ):
+                return path, leaf
+    return None
+
+
+def plain_app(request: BenchRequest, path: str, route: APIRoute) -> FastAPI:
+    """同一个endpoint挂载到普通FastAPI上，不经过trans_endpoint、use_dep、use_http_middleware，作为对比"""
+    app = FastAPI(openapi_url=None)
+    endpoint = getattr(route.endpoint, PropNameConstant.PLAIN_ENDPOINT, route.endpoint)
+    app.add_api_route(
+        path,
+        endpoint,
+        methods=[request.method],
+        response_model=route.response_model,
+        status_code=route.status_code,
+        response_class=route.response_class,
+        dependencies=route.dependencies,
+    )
+    return app
+
+
+@asynccontextmanager
+async def _noop() -> AsyncIterator[None]:
+    yield
+
+
+async def bench(
+    app: ASGIApp,
+    requests: list[BenchRequest],
+    total: int = 1000,
+    concurrency: int = 1,
+    warmup: int = 50,
+    compare: bool = True,
+    run_lifespan: bool = True,
+) -> list[BenchResult]:
+    """依次压测每个请求
+
+    Args:
+        total (int, optional): 每个请求的次数，计算分位数至少需要2次. Defaults to 1000.
+        concurrency (int, optional): 并发数. Defaults to 1.
+        warmup (int, optional): 预热的次数，不计入结果. Defaults to 50.
+        compare (bool, optional): 是否和挂载到普通FastAPI上的同一个endpoint对比. Defaults to True.
+        run_lifespan (bool, optional): 是否执行app的lifespan. Defaults to True.
+    """
+    if total < 2:
+        raise ValueError(f'total需要至少为2才能计算分位数: {total}')
+    state: dict[str, Any] = {}
+    results = []
+    async with lifespan(app, state) if run_lifespan else _noop():
+        for request in requests:
+            costs, statuses, elapsed = await measure(app, request, state, total, concurrency, warmup)
+            q = quantiles(costs, n=100)
+            result = BenchResult(request, statuses, len(costs) / elapsed, q[49], q[94], q[98])
+            if compare and (matched := match_route(app, request)) is not None:
+                plain = plain_app(request, *matched)
+                plain_costs, _, _ = await measure(plain, request, state, total, concurrency, warmup)
+                result.plain_p50 = quantiles(plain_costs, n=100)[49]
+            results.append(result)
+    return results
+
+
+def format_report(results: list[BenchResult]) -> str:
+    lines = [
+        f'{"rps":>9} {"p50 us":>9} {"p95 us":>9} {"p99 us":>9} {"plain us":>9} {"overhead":>9}  {"status":<12} route'
+    ]
+    for r in results:
+        if r.plain_p50 is None:
+            plain = overhead = '-'
+        else:
+            plain = f'{r.plain_p50 * 1e6:.0f}'
+            overhead = f'{(r.p50 - r.plain_p50) * 1e6:+.0f}'
+        statuses = ','.join(f'{k}x{v}' for k, v in sorted(r.statuses.items()))
+        lines.append(
+            f'{r.rps:>9.0f} {r.p50 * 1e6:>9.0f} {r.p95 * 1e6:>9.0f} {r.p99 * 1e6:>9.0f} {plain:>9} {overhead:>9}  {statuses:<12} {r.request}'
+        )
+    return '\n'.join(lines)
@@ -1,19 +1,20 @@
 import argparse
 import os
+import sys
+from importlib import import_module
 
 from .template import FastAPIBootCLITemplate
 
 
-def main():
-    parser = argparse.ArgumentParser(description="FastAPI Boot CLI")
-    parser.add_argument('--host', type=str, default='127.0.0.1', help='Host address')
-    parser.add_argument('--port', type=int, default=8000, help='Port number')
-    parser.add_argument('--reload', action='store_true', help='Enable auto-reload')
-    parser.add_argument(
-        '--name', type=str, default='demo', help='name of first controller'
-    )
+def at_least_2(value: str) -> int:
+    """计算分位数至少需要2个样本"""
+    n = int(value)
+    if n < 2:
+        raise argparse.ArgumentTypeError(f'must be at least 2, got {n}')
+    return n
+
 
-    args = parser.parse_args()
+def scaffold(args: argparse.Namespace):
     if os.path.exists('./main.py'):
         raise Exception('File main.py already exists')
     if os.path.exists(f'./src/controller/{args.name}.py'):
@@ -30,5 +31,127 @@ def main():
         f.write(FastAPIBootCLITemplate.gen_controller(args.name))
 
 
+def profile(args: argparse.Namespace):
+    """导入app，输出启动耗时报告和collapsed stack文件"""
+    from fastapi_boot.core.profiler import startup_profiler
+
+    startup_profiler.enable(trace_memory=not args.no_memory)
+    try:
+        with startup_profiler.span('app', args.app):
+            load_app(args.app)
+    finally:
+        startup_profiler.disable()
+    print(startup_profiler.report(args.top))
+    if args.output:
+        startup_profiler.write_collapsed(args.output)
+        print(f'collapsed stack已写入 {args.output}')
+
+
+def load_app(target: str):
+    """导入"模块:变量"指定的app"""
+    sys.path.insert(0, os.getcwd())
+    module, _, attr = target.partition(':')
+    return getattr(import_module(module), attr or 'app')
+
+
+def bench(args: argparse.Namespace):
+    """进程内压测app的路由"""
+    import asyncio
+
+    from .bench import BenchRequest, bench, discover_routes, format_report
+
+    app = load_app(args.app)
+    headers = [
+        (k.strip().lower().encode(), v.strip().encode())
+        for k, _, v in (h.partition(':') for h in args.header)
+    ]
+    body = args.json.encode() if args.json else b''
+    if body:
+        headers.append((b'content-type', b'application/json'))
+    requests = [BenchRequest.parse(r, body, headers) for r in args.route] or discover_routes(app)
+    if not requests:
+        raise Exception('No routes to bench, use --route "GET /path"')
+    results = asyncio.run(
+        bench(
+            app,
+            requests,
+            total=args.requests,
+            concurrency=args.concurrency,
+            warmup=args.warmup,
+            compare=not args.no_compare,
+            run_lifespan=not args.no_lifespan,
+        )
+    )
+    print(format_report(results))
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="FastAPI Boot CLI")
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Host address')
+    parser.add_argument('--port', type=int, default=8000, help='Port number')
+    parser.add_argument('--reload', action='store_true', help='Enable auto-reload')
+    parser.add_argument(
+        '--name', type=str, default='demo', help='name of first controller'
+    )
+    subparsers = parser.add_subparsers(dest='command')
+
+    profile_parser = subparsers.add_parser('profile', help='Profile app startup')
+    profile_parser.add_argument('app', type=str, help='App to import, e.g. main:app')
+    profile_parser.add_argument(
+        '--output',
+        '-o',
+        type=str,
+        default='startup.collapsed',
+        help='Collapsed stack file for flame graphs, empty to skip',
+    )
+    profile_parser.add_argument(
+        '--top', type=int, default=30, help='Max rows of each kind in the report'
+    )
+    profile_parser.add_argument(
+        '--no-memory', action='store_true', help='Disable tracemalloc'
+    )
+
+    bench_parser = subparsers.add_parser(
+        'bench', help='Benchmark routes in-process over ASGI, without network'
+    )
+    bench_parser.add_argument('app', type=str, help='App to import, e.g. main:app')
+    bench_parser.add_argument(
+        '--route',
+        '-r',
+        action='append',
+        default=[],
+        help='Request to bench, e.g. "GET /user/1?x=1", repeatable. Defaults to all GET routes without required params',
+    )
+    bench_parser.add_argument(
+        '--requests', '-n', type=at_least_2, default=1000, help='Requests per route'
+    )
+    bench_parser.add_argument(
+        '--concurrency', '-c', type=int, default=1, help='Concurrent requests'
+    )
+    bench_parser.add_argument(
+        '--warmup', type=int, default=50, help='Warmup requests per route, not measured'
+    )
+    bench_parser.add_argument(
+        '--header', '-H', action='append', default=[], help='Header, e.g. "X-Token: 1"'
+    )
+    bench_parser.add_argument('--json', type=str, default='', help='JSON request body')
+    bench_parser.add_argument(
+        '--no-compare',
+        action='store_true',
+        help='Skip the same endpoint mounted on a plain FastAPI app',
+    )
+    bench_parser.add_argument(
+        '--no-lifespan', action='store_true', help='Do not run the app lifespan'
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == 'profile':
+        profile(args)
+    elif args.command == 'bench':
+        bench(args)
+    else:
+        scaffold(args)
+
+
 if __name__ == "__main__":
     main()
@@ -4,6 +4,7 @@ import inspect
 from typing import Annotated, Any, TypeVar, get_args, get_origin, overload
 from .const import dep_store
 from .model import InjectFailException
+from .profiler import startup_profiler
 
 T = TypeVar('T')
 
@@ -50,16 +51,17 @@ def inject_params_deps(params: list[Parameter]):
 
 
 def create_injectable_instance(cls: type[T]) -> T:
-    old_params = list(signature(cls.__init__).parameters.values())[1:]  # omit self
-    new_params = [
-        i
-        for i in old_params
-        if i.kind not in (Parameter.VAR_KEYWORD, Parameter.VAR_POSITIONAL)
-    ]  # omit *args、**kwargs
-    calling_params = inject_params_deps(new_params)
-    if hasattr(cls.__init__, '__globals__'):
-        cls.__init__.__globals__.update({cls.__name__: cls})
-    return cls(*calling_params[0], **calling_params[1])
+    with startup_profiler.span('injectable', f'{cls.__module__}.{cls.__qualname__}'):
+        old_params = list(signature(cls.__init__).parameters.values())[1:]  # omit self
+        new_params = [
+            i
+            for i in old_params
+            if i.kind not in (Parameter.VAR_KEYWORD, Parameter.VAR_POSITIONAL)
+        ]  # omit *args、**kwargs
+        calling_params = inject_params_deps(new_params)
+        if hasattr(cls.__init__, '__globals__'):
+            cls.__init__.__globals__.update({cls.__name__: cls})
+        return cls(*calling_params[0], **calling_params[1])
 
 
 @overload
@@ -97,15 +99,16 @@ def Injectable(class_or_name: str | type[T], /):
 
 
 def create_bean_instance(func: Callable[[Any], T]) -> T:
-    params = list(signature(func).parameters.values())
-    params = [
-        i
-        for i in params
-        if i.kind not in (Parameter.VAR_KEYWORD, Parameter.VAR_POSITIONAL)
-    ]  # omit *args、**kwargs
-    calling_params = inject_params_deps(params)
-    instance = func(*calling_params[0], **calling_params[1])
-    return instance
+    with startup_profiler.span('bean', f'{func.__module__}.{func.__qualname__}'):
+        params = list(signature(func).parameters.values())
+        params = [
+            i
+            for i in params
+            if i.kind not in (Parameter.VAR_KEYWORD, Parameter.VAR_POSITIONAL)
+        ]  # omit *args、**kwargs
+        calling_params = inject_params_deps(params)
+        instance = func(*calling_params[0], **calling_params[1])
+        return instance
 
 
 @overload
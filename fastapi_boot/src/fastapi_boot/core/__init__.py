@@ -1,5 +1,13 @@
 from .DI import Injectable, Bean
-from .helper import provide_app, use_dep, use_http_middleware, use_ws_middleware, inject
+from .helper import (
+    provide_app,
+    use_dep,
+    use_http_middleware,
+    use_metrics,
+    use_profiler,
+    use_ws_middleware,
+    inject,
+)
 from .routing import (
     Controller,
     Delete,
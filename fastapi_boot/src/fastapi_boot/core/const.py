@@ -21,6 +21,8 @@ class PropNameConstant:
     CONTROLLER_ROUTE_RECORD: Literal[
         'fastapi_boot__controller_route_record_prop_name'
     ] = 'fastapi_boot__controller_route_record_prop_name'
+    # trans_endpoint处理前的endpoint属性名，Controller的方法绑定到实例
+    PLAIN_ENDPOINT: Literal['fastapi_boot__plain_endpoint'] = 'fastapi_boot__plain_endpoint'
 
     # 请求时
     # use_dep添加的依赖在endpoint中的参数名前缀
@@ -99,9 +101,13 @@ class APPTaskStore:
     tasks: defaultdict[int, list[APPTask]] = field(
         default_factory=lambda: defaultdict(list)
     )
+    # Controller、顶层Req、WS定义所在的模块，{key: 模块名}，扫描时用
+    modules: dict[int, str] = field(default_factory=dict)
 
-    def add(self, key: int, task: APPTask) -> Self:
+    def add(self, key: int, task: APPTask, module: str | None = None) -> Self:
         self.tasks[key].append(task)
+        if module is not None:
+            self.modules.setdefault(key, module)
         return self
 
     def emit(self, key: int, app: FastAPI) -> Self:
@@ -109,8 +115,13 @@ class APPTaskStore:
             task(app)
         return self
 
+    def keys_of(self, modules: set[str]) -> list[int]:
+        """模块中定义的Controller、顶层Req、WS，按注册顺序"""
+        return [k for k, m in self.modules.items() if m in modules]
+
     def clear(self):
         self.tasks.clear()
+        self.modules.clear()
 
 
 app_task_store = APPTaskStore()
@@ -1,6 +1,6 @@
-from collections.abc import Callable, Coroutine
+from collections.abc import Callable, Coroutine, Sequence
 from typing import Any, Protocol, TypeVar, ParamSpec
-from fastapi import Depends, FastAPI, Request, Response, WebSocket
+from fastapi import Depends, FastAPI, Request, Response, WebSocket, params
 from .const import (
     PropNameConstant,
     UseMiddlewareReturnValuePlaceholder,
@@ -8,7 +8,15 @@ from .const import (
     app_task_store,
     use_dep_record_store,
 )
-from .model import UseMiddlewareRecord
+from .model import UseMetricsRecord, UseMiddlewareRecord, UseProfilerRecord
+from .lazy import LazyLoader
+from .metrics import DEFAULT_BUCKETS
+from .profiler import startup_profiler
+from .openapi import use_method_operation_ids, use_openapi_cache
+from .radix import use_radix_router
+from .scan import scan_package as scan
+from .warmup import use_warmup
+from .watchdog import use_lag_monitor
 
 T = TypeVar('T')
 
@@ -90,6 +98,70 @@ def use_http_middleware(
     return _create_use_middleware_return_value(record)
 
 
+def use_metrics(path: str = '/metrics', buckets: Sequence[float] = DEFAULT_BUCKETS) -> Any:
+    """作为类变量，统计Controller中所有 **直接** http的endpoint的请求数(按1xx~5xx)、处理中的请求数、延迟直方图，
+    并在app上添加prometheus文本格式的指标路由
+
+    - 计数只在事件循环线程中修改，不加锁，每个worker进程各自计数
+    - 延迟从参数校验开始，到endpoint返回值序列化完成为止，不包括流式响应的发送
+
+    >>> Example
+    ```python
+    @Controller('/foo')
+    class FooController:
+        _ = use_metrics('/metrics')
+
+        @Get('/bar')
+        def bar(self):
+            return 'bar'
+
+    # GET /metrics
+    # fastapi_boot_requests_total{controller="FooController",endpoint="bar",method="GET",path="/foo/bar",status="2xx"} 1
+    # fastapi_boot_request_duration_seconds_bucket{controller="FooController",endpoint="bar",method="GET",path="/foo/bar",le="0.005"} 1
+    # ...
+    ```
+
+    Args:
+        path (str, optional): 指标路由的路径，多个Controller可共用. Defaults to '/metrics'.
+        buckets (Sequence[float], optional): 延迟直方图的分桶上界(秒). Defaults to DEFAULT_BUCKETS.
+    """
+    return UseMetricsRecord(path, tuple(buckets))
+
+
+def use_profiler(
+    path: str = '/admin/profile', dependencies: Sequence[params.Depends] | None = None
+) -> Any:
+    """作为类变量，让Controller中所有 **直接** http的endpoint可以被按需采样，并在app上添加采样路由
+
+    请求采样路由后，在`seconds`秒内，每隔`interval`秒采样一次事件循环线程的调用栈，
+    只保留正在执行被选中路由的请求时的栈，返回collapsed stack或pstats文件；不需要重启
+
+    - GET {path}?seconds=10&controller=FooController&route=/foo/bar&format=collapsed&interval=0.005
+    - `controller`为Controller类名，`route`为路由路径或endpoint名，都省略时采样所有声明了use_profiler的路由
+    - 同时只能有一个采样，否则返回409
+
+    >>> Example
+    ```python
+    def admin_only(token: str = Header()):
+        if token != 'xxx':
+            raise HTTPException(403)
+
+    @Controller('/foo')
+    class FooController:
+        _ = use_profiler('/admin/profile', dependencies=[Depends(admin_only)])
+
+        @Get('/bar')
+        def bar(self):
+            return 'bar'
+    ```
+
+    Args:
+        path (str, optional): 采样路由的路径，多个Controller可共用. Defaults to '/admin/profile'.
+        dependencies (Sequence[params.Depends] | None, optional): 采样路由的依赖，如鉴权. Defaults to None.
+    """
+    return UseProfilerRecord(path, dependencies)
+
+
 def use_ws_middleware(
     *dispatches: Callable[
         [WebSocket, Callable[[WebSocket], Coroutine[Any, Any, None]]], Any
@@ -170,23 +242,68 @@ class DispatchCls(Protocol):
 def provide_app(
     app: FastAPI | None = None,
     controllers: list[Any] = [],
+    radix_router: bool = False,
+    scan_package: str | None = None,
+    manifest_path: str | None = None,
+    lazy: bool = False,
+    warmup: bool = False,
+    openapi_cache: str | None = None,
+    lag_threshold: float | None = None,
 ) -> FastAPI:
     """启动入口
 
     Args:
         app (FastAPI): FastAPi实例.
-        controllers (list[Any], optional): scan_mode关闭时需手动导入Controller，可以传到这里，防止未使用被代码格式化工具移除. Defaults to [].
-    Raises:
-        e: _description_
+        controllers (list[Any], optional): 未设置scan_package时需手动导入Controller，可以传到这里，防止未使用被代码格式化工具移除. Defaults to [].
+        radix_router (bool, optional): 用前缀树查找路由，路由很多时降低匹配耗时，见`RadixRouter`. Defaults to False.
+        scan_package (str | None, optional): 扫描的包名，包中的Controller、顶层Req、WS都会挂载到app上. Defaults to None.
+        manifest_path (str | None, optional): 扫描清单的路径，见`scan_package`函数. Defaults to `包目录/__pycache__/fastapi_boot_manifest.json`.
+        lazy (bool, optional): 清单有效时先按清单注册占位路由，第一次请求时才导入模块、创建Controller实例. Defaults to False.
+        warmup (bool, optional): 启动时构建所有路由的依赖、校验器、序列化器，并生成OpenAPI文档(lazy时不生成)，见`use_warmup`. Defaults to False.
+        openapi_cache (str | None, optional): OpenAPI文档的磁盘缓存路径，路由和模型的哈希不变时直接读取，见`OpenAPICache`. Defaults to None.
+        lag_threshold (float | None, optional): 启动后监控事件循环阻塞，超过该秒数时记录调用栈和正在处理的路由，见`LoopLagMonitor`. Defaults to None.
 
     Returns:
-        FastAPI: _description_
+        FastAPI: app
     """
-    app = app or FastAPI()
-    # emit controller tasks
-    for controller in controllers:
-        app_task_store.emit(id(controller), app)
-    return app
+    with startup_profiler.span('provide_app', scan_package or f'{len(controllers)} controllers'):
+        app = app or FastAPI()
+        use_method_operation_ids(app)
+        # emit controller tasks
+        for controller in controllers:
+            with startup_profiler.span('mount', getattr(controller, '__qualname__', '')):
+                app_task_store.emit(id(controller), app)
+        if scan_package is not None:
+            emitted = {id(i) for i in controllers}
+            with startup_profiler.span('scan', scan_package):
+                manifest, modules = scan(scan_package, manifest_path, lazy)
+
+            def mount(keys: list[int]):
+                for key in keys:
+                    if key not in emitted:
+                        emitted.add(key)
+                        with startup_profiler.span('mount', app_task_store.modules[key]):
+                            app_task_store.emit(key, app)
+
+            if lazy and (pending := [m for m in manifest.modules if m not in modules]):
+                loader = LazyLoader(app, emitted)
+                # 按清单中模块的顺序挂载或注册占位路由，与不延迟挂载时的顺序相同
+                for module in manifest.modules:
+                    if module in pending:
+                        loader.add(module, manifest.routes.get(module, []))
+                    else:
+                        mount(app_task_store.keys_of({module}))
+            else:
+                mount(app_task_store.keys_of(set(modules)))
+        if radix_router:
+            use_radix_router(app.router)
+        if openapi_cache is not None:
+            use_openapi_cache(app, openapi_cache)
+        if warmup:
+            use_warmup(app, openapi=not lazy)
+        if lag_threshold is not None:
+            use_lag_monitor(app, lag_threshold)
+        return app
 
 
 def inject(tp: type[T], name: str | None = None) -> T:
@@ -0,0 +1,95 @@
+from importlib import import_module
+from typing import Any
+
+from fastapi import FastAPI
+from starlette.routing import BaseRoute, Match, NoMatchFound, compile_path, get_route_path
+from starlette.types import Receive, Scope, Send
+
+from .const import app_task_store
+from .util import mark_routes_changed
+
+
+class LazyRoute(BaseRoute):
+    """扫描清单中的路由占位，第一次命中时导入模块、挂载真正的路由，再重新分发请求"""
+
+    def __init__(self, path: str, methods: list[str] | None, module: str, loader: 'LazyLoader'):
+        self.path = path
+        # websocket为None
+        self.methods = None if methods is None else set(methods)
+        self.module = module
+        self.loader = loader
+        self.path_regex, self.path_format, _ = compile_path(path)
+
+    def matches(self, scope: Scope) -> tuple[Match, Scope]:
+        if scope['type'] != ('websocket' if self.methods is None else 'http'):
+            return Match.NONE, {}
+        if not self.path_regex.match(get_route_path(scope)):
+            return Match.NONE, {}
+        if self.methods is not None and scope['method'] not in self.methods:
+            return Match.PARTIAL, {}
+        return Match.FULL, {}
+
+    def url_path_for(self, name: str, /, **path_params: Any):
+        raise NoMatchFound(name, path_params)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send):
+        self.loader.load(self.module)
+        await self.loader.app.router(scope, receive, send)
+
+    def __repr__(self) -> str:
+        return f'LazyRoute(path={self.path!r}, module={self.module!r})'
+
+
+class LazyLoader:
+    """按模块延迟挂载Controller，生成OpenAPI文档时挂载所有模块"""
+
+    def __init__(self, app: FastAPI, emitted: set[int]):
+        self.app = app
+        # 已挂载的Controller等的key
+        self.emitted = emitted
+        # 未导入的模块
+        self.pending: set[str] = set()
+        self._openapi = app.openapi
+        app.openapi = self.openapi  # type: ignore
+
+    def add(self, module: str, routes: list[list]):
+        """
+        Args:
+            module (str): 模块名
+            routes (list[list]): [[路径, 请求方法列表或None]]
+        """
+        self.pending.add(module)
+        for path, methods in routes:
+            self.app.router.routes.append(LazyRoute(path, methods, module, self))
+
+    def load(self, module: str):
+        if module not in self.pending:
+            return
+        self.pending.discard(module)
+        routes = self.app.router.routes
+        count = len(routes)
+        import_module(module)
+        for key in app_task_store.keys_of({module}):
+            if key not in self.emitted:
+                self.emitted.add(key)
+                app_task_store.emit(key, self.app)
+        # 挂载的路由放到占位路由的位置，与不延迟挂载时的顺序相同
+        added = routes[count:]
+        res: list[BaseRoute] = []
+        for r in routes[:count]:
+            if isinstance(r, LazyRoute) and r.module == module:
+                res.extend(added)
+                added = []
+            else:
+                res.append(r)
+        routes[:] = [*res, *added]
+        mark_routes_changed(self.app.router)
+        self.app.openapi_schema = None
+
+    def load_all(self):
+        for module in sorted(self.pending):
+            self.load(module)
+
+    def openapi(self) -> dict[str, Any]:
+        self.load_all()
+        return self._openapi()
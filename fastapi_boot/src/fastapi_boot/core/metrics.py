@@ -0,0 +1,152 @@
+from bisect import bisect_left
+from collections.abc import Callable, Coroutine, Sequence
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any
+
+from fastapi import FastAPI, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute, request_response
+from starlette.routing import Route
+
+# prometheus客户端的默认分桶(秒)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class RouteMetrics:
+    """一个路由的一个请求方法的指标
+
+    只在事件循环线程中修改，不加锁；每个worker进程各自计数
+    """
+
+    __slots__ = ('labels', 'bounds', 'in_flight', 'statuses', 'buckets', 'sum')
+
+    def __init__(self, labels: str, bounds: Sequence[float]):
+        # 渲染好的标签，如 controller="Foo",endpoint="bar",method="GET",path="/foo"
+        self.labels = labels
+        self.bounds = bounds
+        self.in_flight = 0
+        # 1xx~5xx的请求数，下标为状态码//100，0为其他
+        self.statuses = [0] * 6
+        # 每个分桶的请求数(非累计)，最后一个为+Inf
+        self.buckets = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _bound(value: float) -> str:
+    return repr(float(value))
+
+
+@dataclass
+class MetricsStore:
+    routes: list[RouteMetrics] = field(default_factory=list)
+
+    def register(
+        self, controller: str, endpoint: str, method: str, path: str, buckets: Sequence[float]
+    ) -> RouteMetrics:
+        labels = ','.join(
+            f'{k}="{_label(v)}"'
+            for k, v in (
+                ('controller', controller),
+                ('endpoint', endpoint),
+                ('method', method),
+                ('path', path),
+            )
+        )
+        metrics = RouteMetrics(labels, tuple(sorted(buckets)))
+        self.routes.append(metrics)
+        return metrics
+
+    def instrument(
+        self, route: APIRoute, controller: str, endpoint: str, path: str, buckets: Sequence[float]
+    ):
+        """包装路由的handler，直接挂载和include_router时FastAPI都通过`get_route_handler`构建handler"""
+        by_method = {
+            method: self.register(controller, endpoint, method, path, buckets)
+            for method in sorted(route.methods)
+        }
+        get_route_handler = route.get_route_handler
+
+        def instrumented_get_route_handler():
+            return _instrumented(get_route_handler(), by_method)
+
+        route.get_route_handler = instrumented_get_route_handler  # type: ignore
+        route.app = request_response(route.get_route_handler())
+
+    def render(self) -> str:
+        """prometheus文本格式"""
+        lines = [
+            '# HELP fastapi_boot_requests_total Requests by status class.',
+            '# TYPE fastapi_boot_requests_total counter',
+        ]
+        for m in self.routes:
+            for cls, cnt in enumerate(m.statuses):
+                if cnt:
+                    status = f'{cls}xx' if cls else 'other'
+                    lines.append(f'fastapi_boot_requests_total{{{m.labels},status="{status}"}} {cnt}')
+        lines.append('# HELP fastapi_boot_requests_in_flight Requests being processed.')
+        lines.append('# TYPE fastapi_boot_requests_in_flight gauge')
+        lines.extend(f'fastapi_boot_requests_in_flight{{{m.labels}}} {m.in_flight}' for m in self.routes)
+        lines.append('# HELP fastapi_boot_request_duration_seconds Request latency in seconds.')
+        lines.append('# TYPE fastapi_boot_request_duration_seconds histogram')
+        for m in self.routes:
+            total = 0
+            for bound, cnt in zip((*m.bounds, '+Inf'), m.buckets):
+                total += cnt
+                le = bound if isinstance(bound, str) else _bound(bound)
+                lines.append(f'fastapi_boot_request_duration_seconds_bucket{{{m.labels},le="{le}"}} {total}')
+            lines.append(f'fastapi_boot_request_duration_seconds_sum{{{m.labels}}} {m.sum!r}')
+            lines.append(f'fastapi_boot_request_duration_seconds_count{{{m.labels}}} {total}')
+        return '\n'.join(lines) + '\n'
+
+    async def endpoint(self, request: Request) -> Response:
+        return Response(self.render(), media_type=CONTENT_TYPE)
+
+    def mount(self, app: FastAPI, path: str):
+        """添加指标路由，同一个app的同一个路径只添加一次"""
+        for route in app.router.routes:
+            if isinstance(route, Route) and route.path == path and route.endpoint == self.endpoint:
+                return
+        app.add_route(path, self.endpoint, methods=['GET'], include_in_schema=False)
+
+    def clear(self):
+        self.routes.clear()
+
+
+def _instrumented(
+    handler: Callable[[Request], Coroutine[Any, Any, Response]],
+    by_method: dict[str, RouteMetrics],
+) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+    async def app(request: Request) -> Response:
+        metrics = by_method[request.scope['method']]
+        metrics.in_flight += 1
+        # 被取消(客户端断开等)时计入other
+        status = 0
+        start = perf_counter()
+        try:
+            response = await handler(request)
+            status = response.status_code
+            return response
+        except RequestValidationError:
+            status = 422
+            raise
+        except Exception as e:
+            status = getattr(e, 'status_code', 500)
+            raise
+        finally:
+            # 每个请求都会执行，不调用方法，减少开销
+            elapsed = perf_counter() - start
+            metrics.in_flight -= 1
+            metrics.statuses[status // 100 if 100 <= status < 600 else 0] += 1
+            metrics.buckets[bisect_left(metrics.bounds, elapsed)] += 1
+            metrics.sum += elapsed
+
+    return app
+
+
+metrics_store = MetricsStore()
@@ -1,12 +1,13 @@
+import re
 from collections.abc import Callable, Coroutine, Sequence
-from dataclasses import asdict, dataclass, field
+from dataclasses import dataclass, field, fields
 from enum import Enum
-from functools import wraps
+from functools import cache, wraps
 from http import HTTPMethod
 from typing import Any, Generic, Literal, Self, TypeVar
 
 from fastapi import APIRouter, FastAPI, Response, Request, WebSocket
-from fastapi.datastructures import Default
+from fastapi.datastructures import Default, DefaultPlaceholder
 from fastapi.params import Depends
 from fastapi.responses import JSONResponse
 from fastapi.routing import APIRoute
@@ -29,10 +30,20 @@ HttpStrMethod = Literal[
 LowerHttpMethod = [m.value.lower() for m in list(HTTPMethod)]
 
 
+@cache
+def _field_names(cls: type) -> tuple[str, ...]:
+    return tuple(f.name for f in fields(cls))
+
+
+def shallow_dict(ins: Any) -> dict[str, Any]:
+    """dataclass实例转为dict，字段值不深拷贝(`asdict`会深拷贝)"""
+    return {name: getattr(ins, name) for name in _field_names(ins.__class__)}
+
+
 # -------------------------------------------------- request params -------------------------------------------------- #
 
 
-@dataclass
+@dataclass(slots=True)
 class SpecificHttpRouteItemWithoutEndpointAndMethods:
     """specific http params without endpoint and methods"""
 
@@ -66,10 +77,10 @@ class SpecificHttpRouteItemWithoutEndpointAndMethods:
 
     @property
     def dict(self):
-        return asdict(self)
+        return shallow_dict(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class BaseHttpRouteItemWithoutEndpoint(SpecificHttpRouteItemWithoutEndpointAndMethods):
     """Req params without endpoint"""
 
@@ -78,7 +89,15 @@ class BaseHttpRouteItemWithoutEndpoint(SpecificHttpRouteItemWithoutEndpointAndMe
     )
 
 
-@dataclass
+def method_unique_id(route: APIRoute) -> str:
+    """多个请求方法的路由的unique_id，不含请求方法，与集合的顺序无关
+
+    文档中每个请求方法的operationId再加上请求方法，见`use_method_operation_ids`
+    """
+    return re.sub(r'\W', '_', f'{route.name}{route.path_format}')
+
+
+@dataclass(slots=True)
 class BaseHttpRouteItem:
     """req params"""
 
@@ -128,13 +147,25 @@ class BaseHttpRouteItem:
         return self
 
     def mount_to(self, anchor: APIRouter | FastAPI):
-        target = anchor.router if isinstance(anchor, FastAPI) else anchor
-        params_dict = asdict(self)
-        for method in self.methods:
-            target.add_api_route(**{**params_dict, 'methods': [method]})
+        """多个请求方法注册为一个路由
 
-
-@dataclass
+        Raises:
+            ValueError: 多个请求方法的路由指定了operation_id，所有请求方法会共用这个operationId
+        """
+        target = anchor.router if isinstance(anchor, FastAPI) else anchor
+        params = shallow_dict(self)
+        if len(self.methods) > 1:
+            if self.operation_id:
+                raise ValueError(
+                    f'"{self.path}"的{len(self.methods)}个请求方法会共用operation_id "{self.operation_id}"，'
+                    '请为每个请求方法分别定义路由'
+                )
+            if isinstance(self.generate_unique_id_function, DefaultPlaceholder):
+                params['generate_unique_id_function'] = method_unique_id
+        target.add_api_route(**params)
+
+
+@dataclass(slots=True)
 class WebSocketRouteItemWithoutEndpoint:
     """websocket params without endpoint"""
 
@@ -144,10 +175,10 @@ class WebSocketRouteItemWithoutEndpoint:
 
     @property
     def dict(self):
-        return asdict(self)
+        return shallow_dict(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class WebSocketRouteItem:
 
     endpoint: Callable
@@ -164,16 +195,16 @@ class WebSocketRouteItem:
         return self
 
     def mount_to(self, anchor: APIRouter | FastAPI):
-        anchor.add_api_websocket_route(**asdict(self))
+        anchor.add_api_websocket_route(**shallow_dict(self))
 
 
 # --------------------------------------------------- route record -------------------------------------------------- #
-@dataclass
+@dataclass(slots=True)
 class EndpointRouteRecord:
     record: BaseHttpRouteItem | WebSocketRouteItem
 
 
-@dataclass
+@dataclass(slots=True)
 class PrefixRouteRecord(Generic[T]):
     """prefix
 
@@ -187,7 +218,7 @@ class PrefixRouteRecord(Generic[T]):
 
 
 # ---------------------------------------------------- record ---------------------------------------------------- #
-@dataclass
+@dataclass(slots=True)
 class UseMiddlewareRecord:
     """use_middleware record in controller"""
 
@@ -269,6 +300,30 @@ class UseMiddlewareRecord:
         return self
 
 
+@dataclass(slots=True)
+class UseMetricsRecord:
+    """use_metrics record in controller"""
+
+    # 指标路由的路径
+    path: str
+    # 延迟直方图的分桶上界(秒)
+    buckets: tuple[float, ...]
+
+
+@dataclass(slots=True)
+class UseProfilerRecord:
+    """use_profiler record in controller"""
+
+    # 采样路由的路径
+    path: str
+    # 采样路由的依赖，如鉴权
+    dependencies: Sequence[Depends] | None = None
+
+
 # ----------------------------------------------------- exception ---------------------------------------------------- #
 class InjectFailException(Exception):
     """inject fail"""
+
+
+class ProfilerBusyException(Exception):
+    """profiling is already running"""
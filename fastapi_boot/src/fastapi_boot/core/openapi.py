@@ -0,0 +1,310 @@
+import json
+import re
+import warnings
+from collections.abc import Callable, Iterable
+from dataclasses import fields, is_dataclass
+from enum import Enum
+from hashlib import sha256
+from inspect import isclass, signature
+from typing import Any, get_args
+
+import fastapi
+import pydantic
+from fastapi import FastAPI, Request
+from fastapi import routing as fastapi_routing
+from fastapi.responses import Response
+from fastapi.routing import APIRoute
+from starlette.routing import BaseRoute, Route
+
+from .lazy import LazyRoute
+from .model import method_unique_id
+from .util import atomic_write, get_routes_version, mark_openapi_schema_current
+
+# repr中的内存地址，每个进程都不同
+ADDRESS = re.compile(r' at 0x[0-9a-fA-F]+')
+# 影响文档的路由属性
+ROUTE_ATTRS = (
+    'path',
+    'methods',
+    'name',
+    # 不用unique_id，多个请求方法的路由的unique_id取决于集合的顺序，每个进程可能不同
+    'generate_unique_id_function',
+    'operation_id',
+    'summary',
+    'description',
+    'response_description',
+    'tags',
+    'deprecated',
+    'include_in_schema',
+    'status_code',
+    'responses',
+    'response_model',
+    'response_class',
+    'openapi_extra',
+    'callbacks',
+    'dependencies',
+)
+
+# 影响文档的include_router参数
+INCLUDE_ATTRS = (
+    'prefix',
+    'tags',
+    'dependencies',
+    'default_response_class',
+    'responses',
+    'callbacks',
+    'deprecated',
+    'include_in_schema',
+    'generate_unique_id_function',
+)
+
+
+def route_signature(router: Any) -> tuple[int, int]:
+    """路由表的版本，路由增删时变化"""
+    return (get_routes_version(router), len(router.routes))
+
+
+def _repr(obj: Any) -> str:
+    """集合按排序后的元素表示，不受哈希种子影响"""
+    if isinstance(obj, (set, frozenset)):
+        return '{' + ', '.join(sorted(map(_repr, obj))) + '}'
+    if isinstance(obj, dict):
+        return '{' + ', '.join(f'{_repr(k)}: {_repr(v)}' for k, v in obj.items()) + '}'
+    if isinstance(obj, (list, tuple)):
+        return '[' + ', '.join(map(_repr, obj)) + ']'
+    return repr(obj)
+
+
+def _iter_schema_routes(routes: Iterable[BaseRoute], context: str = '') -> Iterable[tuple[str, Any]]:
+    """(include_router的参数, 路由)，不构建FastAPI延迟生成的子路由"""
+    for route in routes:
+        if hasattr(route, 'original_router') and hasattr(route, 'include_context'):
+            ctx = route.include_context  # type: ignore
+            desc = _repr([getattr(ctx, i, None) for i in INCLUDE_ATTRS])
+            yield from _iter_schema_routes(route.original_router.routes, context + desc)  # type: ignore
+        else:
+            yield context, route
+
+
+def _describe_models(annotation: Any, seen: set[Any], out: list[str]):
+    """类型注解中用到的模型、枚举、dataclass的定义"""
+    if isclass(annotation) and annotation not in seen:
+        if issubclass(annotation, pydantic.BaseModel):
+            seen.add(annotation)
+            out.append(
+                f'{annotation.__module__}.{annotation.__qualname__}'
+                f'{_repr(annotation.model_config)}{_repr(annotation.model_fields)}'
+            )
+            for field in annotation.model_fields.values():
+                _describe_models(field.annotation, seen, out)
+        elif issubclass(annotation, Enum):
+            seen.add(annotation)
+            out.append(f'{annotation.__qualname__}{[i.value for i in annotation]!r}')
+        elif is_dataclass(annotation):
+            seen.add(annotation)
+            out.append(f'{annotation.__qualname__}{fields(annotation)!r}')
+            for field in fields(annotation):
+                _describe_models(field.type, seen, out)
+    for arg in get_args(annotation):
+        _describe_models(arg, seen, out)
+
+
+def route_table_hash(app: FastAPI) -> str:
+    """路由和模型的哈希，文档相关的内容不变时哈希不变"""
+    h = sha256()
+    h.update(
+        _repr(
+            (
+                fastapi.__version__,
+                pydantic.VERSION,
+                app.title,
+                app.version,
+                app.openapi_version,
+                app.summary,
+                app.description,
+                app.terms_of_service,
+                app.contact,
+                app.license_info,
+                app.openapi_tags,
+                app.servers,
+                app.separate_input_output_schemas,
+            )
+        ).encode()
+    )
+    seen: set[Any] = set()
+    for context, route in _iter_schema_routes([*app.router.routes, *app.webhooks.routes]):
+        if isinstance(route, LazyRoute):
+            # 清单有效时文件都没有变化，路由和模块相同即可
+            h.update(repr((route.path, sorted(route.methods or ()), route.module)).encode())
+            continue
+        if not getattr(route, 'include_in_schema', False):
+            continue
+        desc = [context, _repr([getattr(route, i, None) for i in ROUTE_ATTRS])]
+        if (endpoint := getattr(route, 'endpoint', None)) is not None:
+            sig = signature(endpoint)
+            desc.append(repr(sig))
+            for param in sig.parameters.values():
+                _describe_models(param.annotation, seen, desc)
+            _describe_models(sig.return_annotation, seen, desc)
+        _describe_models(getattr(route, 'response_model', None), seen, desc)
+        h.update(ADDRESS.sub('', '\n'.join(desc)).encode())
+    return h.hexdigest()
+
+
+def dumps(schema: dict[str, Any]) -> bytes:
+    """与FastAPI的JSONResponse相同的编码"""
+    return json.dumps(
+        schema, ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':')
+    ).encode('utf-8')
+
+
+class OpenAPICache:
+    """替换`app.openapi`和文档路由
+
+    - 路由表不变时返回缓存的文档，路由变化后重新生成
+    - 设置了`path`时，按路由和模型的哈希从磁盘读取文档，哈希不一致时重新生成并写入
+    - 文档路由直接返回编码好的字节
+    """
+
+    def __init__(self, app: FastAPI, openapi: Callable[[], dict[str, Any]], path: str | None = None):
+        self.app = app
+        self.openapi = openapi
+        self.path = path
+        self.signature: tuple[int, int] | None = None
+        self.hash: str | None = None
+        # 编码好的文档，{root_path: bytes}
+        self.contents: dict[str, bytes] = {}
+
+    def _load(self, digest: str) -> bytes | None:
+        if self.path is None:
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                header, _, content = f.read().partition(b'\n')
+        except OSError:
+            return None
+        return content if header.decode() == digest else None
+
+    def refresh(self):
+        signature = route_signature(self.app.router)
+        if signature == self.signature and (self.contents or self.app.openapi_schema):
+            return
+        self.signature = signature
+        self.contents.clear()
+        self.app.openapi_schema = None
+        if self.path is None:
+            return
+        digest = route_table_hash(self.app)
+        if (content := self._load(digest)) is not None:
+            self.contents[''] = content
+        else:
+            content = self.contents[''] = dumps(self.openapi())
+            atomic_write(self.path, digest.encode() + b'\n' + content)
+            # 延迟挂载时生成文档会挂载所有模块，仍然按挂载前的哈希缓存
+            self.signature = route_signature(self.app.router)
+        self.hash = digest
+
+    def __call__(self) -> dict[str, Any]:
+        self.refresh()
+        if self.app.openapi_schema is None:
+            if '' in self.contents:
+                # 从磁盘读取的文档
+                self.app.openapi_schema = json.loads(self.contents[''])
+                mark_openapi_schema_current(self.app)
+            else:
+                self.app.openapi_schema = self.openapi()
+        return self.app.openapi_schema
+
+    def content(self, root_path: str = '') -> bytes:
+        self.refresh()
+        if root_path not in self.contents:
+            schema = self()
+            if root_path and self.app.root_path_in_servers:
+                servers = schema.get('servers', [])
+                if root_path not in {s.get('url') for s in servers}:
+                    schema = {**schema, 'servers': [{'url': root_path}, *servers]}
+            self.contents[root_path] = dumps(schema)
+        return self.contents[root_path]
+
+    async def endpoint(self, request: Request) -> Response:
+        root_path = request.scope.get('root_path', '').rstrip('/')
+        return Response(self.content(root_path), media_type='application/json')
+
+
+def use_openapi_cache(app: FastAPI, path: str | None = None) -> OpenAPICache:
+    """用`OpenAPICache`替换`app.openapi`和文档路由
+
+    Args:
+        path (str | None, optional): 磁盘缓存的路径，为None时只缓存在内存中. Defaults to None.
+    """
+    cache = app.openapi
+    if not isinstance(cache, OpenAPICache):
+        cache = OpenAPICache(app, app.openapi)
+        app.openapi = cache  # type: ignore
+        for i, route in enumerate(app.router.routes):
+            if isinstance(route, Route) and route.path == app.openapi_url:
+                app.router.routes[i] = Route(
+                    route.path, cache.endpoint, methods=['GET'], include_in_schema=False
+                )
+    if path is not None and cache.path != path:
+        cache.path = path
+        cache.signature = None
+    return cache
+
+
+# FastAPI展开include_router子路由的上下文，没有时路由已在include_router时复制
+_iter_route_contexts = getattr(fastapi_routing, 'iter_route_contexts', lambda routes: routes)
+
+
+class MethodOperationIds:
+    """替换`app.openapi`，多个请求方法的路由每个请求方法一个operationId
+
+    - FastAPI的一个路由只有一个operationId，所有请求方法共用，生成文档时会警告重复
+    - 用`method_unique_id`的路由，文档中的operationId为`unique_id_请求方法`，如`get_user_user_get`
+    - 指定了operation_id的多个请求方法的路由在挂载时已报错，见`BaseHttpRouteItem.mount_to`
+    """
+
+    def __init__(self, app: FastAPI, openapi: Callable[[], dict[str, Any]]):
+        self.app = app
+        self.openapi = openapi
+        self.signature: tuple[int, int] | None = None
+        # 多个请求方法的路由，[(路径, 请求方法, unique_id)]
+        self.routes: list[tuple[str, set[str], str]] = []
+        # 已处理的文档
+        self.schema: dict[str, Any] | None = None
+
+    def _collect(self):
+        signature = route_signature(self.app.router)
+        if signature == self.signature:
+            return
+        self.routes = [
+            (route.path_format, route.methods, route.unique_id)
+            for route in _iter_route_contexts(self.app.routes)
+            if isinstance(getattr(route, 'original_route', route), APIRoute)
+            and getattr(route, 'original_route', route).generate_unique_id_function is method_unique_id
+            and len(route.methods) > 1
+        ]
+        self.signature = signature
+
+    def __call__(self) -> dict[str, Any]:
+        self._collect()
+        with warnings.catch_warnings():
+            for _, _, unique_id in self.routes:
+                warnings.filterwarnings(
+                    'ignore', message=f'Duplicate Operation ID {re.escape(unique_id)} for'
+                )
+            schema = self.openapi()
+        if schema is not self.schema:
+            paths = schema.get('paths', {})
+            for path, methods, unique_id in self.routes:
+                for method in methods:
+                    if (operation := paths.get(path, {}).get(method.lower())) is not None:
+                        operation['operationId'] = f'{unique_id}_{method.lower()}'
+            self.schema = schema
+        return schema
+
+
+def use_method_operation_ids(app: FastAPI):
+    """用`MethodOperationIds`替换`app.openapi`"""
+    if not isinstance(app.openapi, MethodOperationIds):
+        app.openapi = MethodOperationIds(app, app.openapi)  # type: ignore
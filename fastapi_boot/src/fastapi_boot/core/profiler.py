@@ -0,0 +1,189 @@
+import os
+import sys
+import tracemalloc
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import dataclass, field
+from importlib.abc import Loader, MetaPathFinder
+from time import perf_counter
+from typing import Any
+
+_NULL_SPAN = nullcontext()
+
+
+@dataclass(slots=True)
+class StartupSpan:
+    # import、injectable、bean、controller、mount等
+    kind: str
+    name: str
+    # 从最外层到自身的调用栈，["kind:name"]
+    stack: tuple[str, ...]
+    elapsed: float = 0
+    # 去掉子span后的耗时
+    self_elapsed: float = 0
+    # 净分配内存(字节)，未追踪内存时为0
+    memory: int = 0
+
+
+class ImportProfiler(MetaPathFinder):
+    """包装其他finder找到的loader，记录每个模块的导入"""
+
+    def __init__(self, profiler: 'StartupProfiler'):
+        self.profiler = profiler
+
+    def find_spec(self, fullname: str, path: Any, target: Any = None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        loader = spec.loader
+        # BuiltinImporter等以类作为loader，所有模块共享，不包装
+        if loader is None or isinstance(loader, type) or not hasattr(loader, 'exec_module'):
+            return spec
+        # 多个spec可能共享同一个loader，每个spec各用一个代理，不修改loader
+        spec.loader = ProfiledLoader(loader, self.profiler, fullname)
+        return spec
+
+
+class ProfiledLoader(Loader):
+    """记录`exec_module`耗时的loader代理，其他属性交给原来的loader"""
+
+    def __init__(self, loader: Any, profiler: 'StartupProfiler', fullname: str):
+        self.loader = loader
+        self.profiler = profiler
+        self.fullname = fullname
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.loader, name)
+
+    def create_module(self, spec: Any):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module: Any):
+        with self.profiler.span('import', self.fullname):
+            self.loader.exec_module(module)
+
+
+@dataclass
+class StartupProfiler:
+    """记录启动过程中模块导入、Injectable和Bean的创建、Controller的解析的耗时和内存分配
+
+    - 环境变量`FASTAPI_BOOT_PROFILE=1`或调用`enable`开启，之后导入的模块才会被记录
+    - 命令行: `fastapi-boot profile main:app`
+
+    >>> Example
+    ```python
+    from fastapi_boot.core.profiler import startup_profiler
+
+    startup_profiler.enable()
+    from main import app
+
+    print(startup_profiler.report())
+    startup_profiler.write_collapsed('startup.collapsed')  # flamegraph.pl、speedscope等可以直接打开
+    ```
+    """
+
+    enabled: bool = False
+    spans: list[StartupSpan] = field(default_factory=list)
+    _stack: list[StartupSpan] = field(default_factory=list)
+    _finder: ImportProfiler | None = None
+    _tracing_memory: bool = False
+
+    def enable(self, trace_memory: bool = True):
+        """
+        Args:
+            trace_memory (bool, optional): 用tracemalloc追踪内存分配，会让启动变慢. Defaults to True.
+        """
+        self.enabled = True
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing_memory = True
+        if self._finder is None:
+            self._finder = ImportProfiler(self)
+            sys.meta_path.insert(0, self._finder)
+
+    def disable(self):
+        self.enabled = False
+        if self._finder is not None:
+            sys.meta_path.remove(self._finder)
+            self._finder = None
+        if self._tracing_memory:
+            tracemalloc.stop()
+            self._tracing_memory = False
+
+    def clear(self):
+        self.spans.clear()
+        self._stack.clear()
+
+    def span(self, kind: str, name: str) -> AbstractContextManager[Any]:
+        return self._span(kind, name) if self.enabled else _NULL_SPAN
+
+    @contextmanager
+    def _span(self, kind: str, name: str) -> Iterator[StartupSpan]:
+        parent = self._stack[-1] if self._stack else None
+        span = StartupSpan(kind, name, (*(parent.stack if parent else ()), f'{kind}:{name}'))
+        self._stack.append(span)
+        tracing = tracemalloc.is_tracing()
+        memory = tracemalloc.get_traced_memory()[0] if tracing else 0
+        start = perf_counter()
+        try:
+            yield span
+        finally:
+            span.elapsed = perf_counter() - start
+            span.self_elapsed += span.elapsed
+            if tracing:
+                span.memory = tracemalloc.get_traced_memory()[0] - memory
+            if parent is not None:
+                parent.self_elapsed -= span.elapsed
+            self._stack.pop()
+            self.spans.append(span)
+
+    def report(self, top: int = 30) -> str:
+        """按耗时排序的报告，同名的span合并
+
+        Args:
+            top (int, optional): 每类最多显示的条数. Defaults to 30.
+        """
+        # {(kind, name): [次数, 耗时, 自身耗时, 内存]}
+        groups: defaultdict[tuple[str, str], list] = defaultdict(lambda: [0, 0.0, 0.0, 0])
+        for span in self.spans:
+            group = groups[span.kind, span.name]
+            group[0] += 1
+            group[1] += span.elapsed
+            group[2] += span.self_elapsed
+            group[3] += span.memory
+        by_kind: defaultdict[str, list[tuple[str, list]]] = defaultdict(list)
+        for (kind, name), group in groups.items():
+            by_kind[kind].append((name, group))
+        total = sum(s.elapsed for s in self.spans if len(s.stack) == 1)
+        lines = [f'总耗时 {total * 1000:.1f}ms']
+        for kind in sorted(by_kind, key=lambda k: -sum(g[2] for _, g in by_kind[k])):
+            items = sorted(by_kind[kind], key=lambda i: -i[1][1])
+            lines.append(f'# {kind} ({len(items)})')
+            lines.append(f'  {"耗时ms":>10} {"自身ms":>10} {"内存KB":>10} {"次数":>4}  名称')
+            for name, (cnt, elapsed, self_elapsed, memory) in items[:top]:
+                lines.append(
+                    f'  {elapsed * 1000:>10.2f} {self_elapsed * 1000:>10.2f} {memory / 1024:>10.1f} {cnt:>4}  {name}'
+                )
+        return '\n'.join(lines)
+
+    def collapsed(self) -> str:
+        """flame graph的collapsed stack格式，值为自身耗时(微秒)"""
+        stacks: defaultdict[tuple[str, ...], int] = defaultdict(int)
+        for span in self.spans:
+            stacks[span.stack] += round(span.self_elapsed * 1e6)
+        return '\n'.join(f'{";".join(stack)} {value}' for stack, value in stacks.items() if value > 0)
+
+    def write_collapsed(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.collapsed() + '\n')
+
+
+startup_profiler = StartupProfiler()
+if os.environ.get('FASTAPI_BOOT_PROFILE', '') not in ('', '0', 'false'):
+    startup_profiler.enable()
@@ -0,0 +1,218 @@
+import re
+from collections.abc import Iterator
+from typing import Any
+
+from warnings import warn
+
+from fastapi import APIRouter
+from fastapi import routing as fastapi_routing
+from fastapi.routing import APIRoute
+from starlette.routing import BaseRoute, Match, Mount, Route, WebSocketRoute, get_route_path
+from starlette.types import Receive, Scope, Send
+
+from .lazy import LazyRoute
+from .util import effective_route_contexts, get_own_routes_version, select_effective_route
+
+# 按路径段匹配的参数类型，{name: 正则}
+SEGMENT_CONVERTORS: dict[str, re.Pattern[str]] = {
+    'str': re.compile(r'[^/]+'),
+    'int': re.compile(r'[0-9]+'),
+    'float': re.compile(r'[0-9]+(\.[0-9]+)?'),
+    'uuid': re.compile(
+        r'[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}'
+    ),
+}
+# FastAPI的路由遥测，没有时忽略
+_route_selected = getattr(fastapi_routing, '_route_selected', None)
+PARAM_SEGMENT = re.compile(r'^{([a-zA-Z_][a-zA-Z0-9_]*)(?::([a-zA-Z_][a-zA-Z0-9_]*))?}$')
+
+
+class UncompilableRouteException(Exception):
+    """route can't be compiled into radix tree"""
+
+
+class RadixNode:
+    __slots__ = ('static', 'params', 'catch_all', 'entries')
+
+    def __init__(self):
+        # {路径段: 子节点}
+        self.static: dict[str, RadixNode] = {}
+        # {参数类型: 子节点}
+        self.params: dict[str, RadixNode] = {}
+        # 以{xxx:path}结尾的路由，匹配剩余的所有路径段
+        self.catch_all: set[int] = set()
+        # 在这个节点结束的路由
+        self.entries: set[int] = set()
+
+    def insert(self, segments: list[str], index: int):
+        """segments需要先经过`split_path`检查"""
+        node = self
+        for i, segment in enumerate(segments):
+            if (m := PARAM_SEGMENT.match(segment)) is None:
+                node = node.static.setdefault(segment, RadixNode())
+                continue
+            convertor = m.group(2) or 'str'
+            if convertor == 'path' and i == len(segments) - 1:
+                node.catch_all.add(index)
+                return
+            node = node.params.setdefault(convertor, RadixNode())
+        node.entries.add(index)
+
+    def lookup(self, segments: list[str], i: int, out: set[int]):
+        if i == len(segments):
+            out |= self.entries
+            return
+        out |= self.catch_all
+        segment = segments[i]
+        if (child := self.static.get(segment)) is not None:
+            child.lookup(segments, i + 1, out)
+        for convertor, child in self.params.items():
+            if SEGMENT_CONVERTORS[convertor].fullmatch(segment):
+                child.lookup(segments, i + 1, out)
+
+
+def iter_leaf_routes(route: BaseRoute, prefix: str = '') -> Iterator[tuple[str, BaseRoute]]:
+    """路由(包括include_router的子路由)的完整路径和路由"""
+    if hasattr(route, 'original_router') and hasattr(route, 'include_context'):
+        # FastAPI延迟展开的include_router
+        prefix += route.include_context.prefix  # type: ignore
+        for child in route.original_router.routes:  # type: ignore
+            yield from iter_leaf_routes(child, prefix)
+    elif isinstance(route, (Route, WebSocketRoute, LazyRoute)):
+        yield prefix + route.path, route
+    else:
+        # Mount、Host等
+        raise UncompilableRouteException(repr(route))
+
+
+def iter_radix_leaves(route: BaseRoute) -> Iterator[tuple[str, Any]]:
+    """前缀树的叶子: 完整路径和匹配时使用的路由或include_router子路由的上下文
+
+    不能编译时抛出`UncompilableRouteException`，整个路由作为候选
+    """
+    contexts = effective_route_contexts(route)
+    if contexts is None:
+        # 普通路由，或FastAPI不支持子路由上下文时归到include_router自身
+        for path, _ in iter_leaf_routes(route):
+            yield path, route
+        return
+    for context in contexts:
+        leaf = context.original_route if isinstance(context.original_route, APIRoute) else context.starlette_route
+        if not isinstance(leaf, (Route, WebSocketRoute)):
+            # Mount、Host、前端路由等
+            raise UncompilableRouteException(repr(context.original_route))
+        yield leaf.path if leaf is context.starlette_route else context.path, context
+
+
+def split_path(path: str) -> list[str]:
+    """按路径段切分，有不能编译的路径段时抛出`UncompilableRouteException`"""
+    segments = path.split('/')[1:]
+    for i, segment in enumerate(segments):
+        if '{' not in segment and '}' not in segment:
+            continue
+        m = PARAM_SEGMENT.match(segment)
+        if m is None:
+            # 路径段中既有参数又有静态文本，如 /file-{id}.json
+            raise UncompilableRouteException(segment)
+        convertor = m.group(2) or 'str'
+        if convertor not in SEGMENT_CONVERTORS and not (convertor == 'path' and i == len(segments) - 1):
+            raise UncompilableRouteException(segment)
+    return segments
+
+
+class RadixRouter:
+    """按路径段的前缀树查找候选路由，只对候选路由按原顺序逐个匹配
+
+    - 树的叶子是`entries`中的下标，include_router的子路由各自作为叶子，直接匹配和处理，与FastAPI选中子路由时相同
+    - 参数节点按类型区分(str、int、float、uuid)，`{xxx:path}`只能在结尾
+    - 不能编译的路由(Mount、Host、段中混有参数的路径等)总是作为候选，include_router中有这样的子路由时整个作为候选
+    - 候选中没有匹配时交给原来的router处理(重定向斜杠、404等)，结果与逐个匹配相同
+    - 每个请求只比较FastAPI的路由表版本和顶层路由数量，增删顶层路由时重建；原地替换路由或修改已include的router后调用`invalidate`(或`mark_routes_changed`)
+    """
+
+    def __init__(self, router: APIRouter):
+        self.router = router
+        self.app = router.app
+        self.root = RadixNode()
+        # 顶层路由或include_router子路由的上下文，按匹配顺序
+        self.entries: list[Any] = []
+        # 总是作为候选的下标
+        self.fallback: set[int] = set()
+        self.version: tuple[int, int] | None = None
+
+    def _get_version(self) -> tuple[int, int]:
+        return get_own_routes_version(self.router), len(self.router.routes)
+
+    def invalidate(self):
+        """下一个请求时重建前缀树"""
+        self.version = None
+
+    def build(self):
+        root, entries, fallback = RadixNode(), [], set()
+        for route in self.router.routes:
+            try:
+                leaves = [(split_path(path), entry) for path, entry in iter_radix_leaves(route)]
+            except UncompilableRouteException:
+                fallback.add(len(entries))
+                entries.append(route)
+                continue
+            indexes: dict[int, int] = {}
+            for segments, entry in leaves:
+                if (index := indexes.get(id(entry))) is None:
+                    index = indexes[id(entry)] = len(entries)
+                    entries.append(entry)
+                root.insert(segments, index)
+        self.root, self.entries, self.fallback = root, entries, fallback
+        self.version = self._get_version()
+
+    def candidates(self, path: str) -> list[Any]:
+        if self.version != self._get_version():
+            self.build()
+        indexes = set(self.fallback)
+        self.root.lookup(path.split('/')[1:], 0, indexes)
+        entries = self.entries
+        return [entries[i] for i in sorted(indexes)]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] not in ('http', 'websocket'):
+            await self.app(scope, receive, send)
+            return
+        if 'router' not in scope:
+            scope['router'] = self.router
+        partial: tuple[Any, Any] | None = None
+        for entry in self.candidates(get_route_path(scope)):
+            match, child_scope = entry.matches(scope)
+            if match == Match.FULL:
+                await self._handle(entry, child_scope, scope, receive, send)
+                return
+            if match == Match.PARTIAL and partial is None:
+                partial = (entry, child_scope)
+        if partial is not None:
+            await self._handle(*partial, scope, receive, send)
+            return
+        # 未命中，交给原来的router
+        await self.app(scope, receive, send)
+
+    async def _handle(self, entry: Any, child_scope: Any, scope: Scope, receive: Receive, send: Send):
+        scope.update(child_scope)
+        if isinstance(entry, BaseRoute):
+            route = entry
+            path = getattr(route, 'path_format', None)
+        else:
+            route = select_effective_route(scope, entry)
+            path = getattr(entry.starlette_route, 'path_format', None) or entry.path_format
+        if _route_selected is not None:
+            _route_selected(scope=scope, path=path, mount=isinstance(route, Mount))
+        await route.handle(scope, receive, send)
+
+
+def use_radix_router(router: APIRouter) -> RadixRouter | None:
+    """让router用前缀树查找路由，router自身有中间件时不使用"""
+    if isinstance(router.middleware_stack, RadixRouter):
+        return router.middleware_stack
+    if router.middleware_stack != router.app:
+        warn('router有中间件，不使用前缀树路由')
+        return None
+    radix = RadixRouter(router)
+    router.middleware_stack = radix
+    return radix
@@ -2,9 +2,10 @@ from collections.abc import Callable, Sequence
 from enum import Enum
 from functools import reduce, wraps
 from inspect import Parameter, getmembers, iscoroutinefunction, signature
+from types import MethodType
 from typing import Any, TypeVar
 
-from fastapi import APIRouter, Response, params, WebSocket as FastAPIWebSocket
+from fastapi import APIRouter, FastAPI, Response, params, WebSocket as FastAPIWebSocket
 from fastapi.datastructures import Default
 from fastapi.responses import JSONResponse
 from fastapi.routing import APIRoute
@@ -26,14 +27,20 @@ from .model import (
     EndpointRouteRecord,
     LowerHttpMethod,
     PrefixRouteRecord,
+    UseMetricsRecord,
     UseMiddlewareRecord,
+    UseProfilerRecord,
 )
 from .model import SpecificHttpRouteItemWithoutEndpointAndMethods as SM
 from .model import WebSocketRouteItem, WebSocketRouteItemWithoutEndpoint
+from .metrics import metrics_store
+from .profiler import startup_profiler
+from .sampling import sampling_profiler
 
 
 T = TypeVar('T', bound=Callable)
 RouterCls = TypeVar('RouterCls')
+UseRouteRecord = UseMetricsRecord | UseProfilerRecord
 
 
 # ---------------------------------------------------- Controller ---------------------------------------------------- #
@@ -51,16 +58,37 @@ def get_use_result(cls: type[RouterCls]):
     use_dep_dict = {}
     cls_anno: dict = cls.__dict__.get('__annotations__', {})
     use_middleware_records: list[UseMiddlewareRecord] = []
+    # 包装路由handler的use_metrics、use_profiler
+    use_route_records: list[UseRouteRecord] = []
     for k, v in getmembers(cls):
         if use_dep_record_store.has(v):
             use_dep_dict[k] = (cls_anno.get(k), v)
+        elif isinstance(v, (UseMetricsRecord, UseProfilerRecord)):
+            use_route_records.append(v)
         elif (
             isinstance(v, UseMiddlewareReturnValuePlaceholder)
             and (attr := getattr(v, PropNameConstant.USE_MIDDLEWARE))
             and isinstance(attr, UseMiddlewareRecord)
         ):
             use_middleware_records.append(attr)
-    return use_dep_dict, use_middleware_records
+    return use_dep_dict, use_middleware_records, use_route_records
+
+
+def instrument_route(
+    route: APIRoute, record: UseRouteRecord, controller: str, endpoint: str, path: str
+):
+    if isinstance(record, UseMetricsRecord):
+        metrics_store.instrument(route, controller, endpoint, path, record.buckets)
+    else:
+        sampling_profiler.instrument(route, controller, endpoint, path)
+
+
+def mount_route_record(app: FastAPI, record: UseRouteRecord):
+    """添加指标、采样路由"""
+    if isinstance(record, UseMetricsRecord):
+        metrics_store.mount(app, record.path)
+    else:
+        sampling_profiler.mount(app, record.path, record.dependencies)
 
 
 def trans_endpoint(
@@ -120,6 +148,11 @@ def trans_endpoint(
         '__signature__',
         signature(new_endpoint).replace(parameters=params),
     )
+    setattr(
+        new_endpoint,
+        PropNameConstant.PLAIN_ENDPOINT,
+        MethodType(endpoint, instance) if has_self else endpoint,
+    )
     return new_endpoint
 
 
@@ -130,9 +163,10 @@ def resolve_endpoint(
     use_deps_dict: dict,
     prefix: str,
     use_middleware_records: list[UseMiddlewareRecord],
+    use_route_records: Sequence[UseRouteRecord] = (),
 ):
     """
-    处理endpoint，http中间件
+    处理endpoint，http中间件，指标、采样
 
     :param anchor: 说明
     :type anchor: APIRouter
@@ -146,6 +180,8 @@ def resolve_endpoint(
     :type prefix: str
     :param use_middleware_records: 说明
     :type use_middleware_records: list[UseMiddlewareRecord]
+    :param use_route_records: 说明
+    :type use_route_records: Sequence[UseRouteRecord]
     """
     path = prefix + api_route.record.path
     # http
@@ -159,9 +195,20 @@ def resolve_endpoint(
     path_in_controller = '/'.join(path.split('/')[2:])
     if path_in_controller != '':
         path_in_controller = '/' + path_in_controller
+    mounted = len(anchor.routes)
     api_route.record.replace_endpoint(new_endpoint).replace_path(
         path_in_controller
     ).mount_to(anchor)
+    for route in anchor.routes[mounted:]:
+        if isinstance(route, APIRoute):
+            for record in use_route_records:
+                instrument_route(
+                    route,
+                    record,
+                    type(instance).__name__,
+                    api_route.record.endpoint.__name__,
+                    path,
+                )
 
 
 def resolve_class_based_view(
@@ -184,33 +231,40 @@ def resolve_class_based_view(
 
     """
     cls: type[RouterCls] = route_record.cls
-    use_deps_dict, use_middleware_records = get_use_result(cls)
-    instance: RouterCls = create_injectable_instance(cls)
-    new_prefix = prefix + route_record.prefix
-
-    for v in vars(cls).values():
-        if hasattr(v, PropNameConstant.CONTROLLER_ROUTE_RECORD) and (
-            attr := getattr(v, PropNameConstant.CONTROLLER_ROUTE_RECORD)
-        ):
-            if isinstance(attr, EndpointRouteRecord):
-                resolve_endpoint(
-                    anchor,
-                    attr,
-                    instance,
-                    use_deps_dict,
-                    new_prefix,
-                    use_middleware_records,
-                )
-            elif isinstance(attr, PrefixRouteRecord):
-                resolve_class_based_view(anchor, attr, new_prefix, controller_id)
-    # add http middleware
-    if use_middleware_records:
-        app_task_store.add(
-            controller_id,
-            lambda app: reduce(
-                lambda a, b: a + b, use_middleware_records
-            ).add_http_middleware(app),
-        )
+    with startup_profiler.span('controller', f'{cls.__module__}.{cls.__qualname__}'):
+        use_deps_dict, use_middleware_records, use_route_records = get_use_result(cls)
+        instance: RouterCls = create_injectable_instance(cls)
+        new_prefix = prefix + route_record.prefix
+
+        for v in vars(cls).values():
+            if hasattr(v, PropNameConstant.CONTROLLER_ROUTE_RECORD) and (
+                attr := getattr(v, PropNameConstant.CONTROLLER_ROUTE_RECORD)
+            ):
+                if isinstance(attr, EndpointRouteRecord):
+                    resolve_endpoint(
+                        anchor,
+                        attr,
+                        instance,
+                        use_deps_dict,
+                        new_prefix,
+                        use_middleware_records,
+                        use_route_records,
+                    )
+                elif isinstance(attr, PrefixRouteRecord):
+                    resolve_class_based_view(anchor, attr, new_prefix, controller_id)
+        # add http middleware
+        if use_middleware_records:
+            app_task_store.add(
+                controller_id,
+                lambda app: reduce(
+                    lambda a, b: a + b, use_middleware_records
+                ).add_http_middleware(app),
+            )
+        for record in use_route_records:
+            app_task_store.add(
+                controller_id,
+                lambda app, record=record: mount_route_record(app, record),
+            )
 
 
 class Controller(APIRouter):
@@ -259,7 +313,9 @@ class Controller(APIRouter):
 
     def __call__(self, cls: type[RouterCls]) -> type[RouterCls]:
         resolve_class_based_view(self, PrefixRouteRecord(cls, self.prefix), '', id(cls))
-        app_task_store.add(id(cls), lambda app: app.include_router(self))
+        app_task_store.add(
+            id(cls), lambda app: app.include_router(self), module=cls.__module__
+        )
         return cls
 
     def __getattribute__(self, k: str):
@@ -278,7 +334,9 @@ class Controller(APIRouter):
                             endpoint, methods=[k], *args, **kwds
                         ).mount_to(self)
                     app_task_store.add(
-                        id(endpoint), lambda app: app.include_router(self)
+                        id(endpoint),
+                        lambda app: app.include_router(self),
+                        module=endpoint.__module__,
                     )
                     return endpoint
 
@@ -296,7 +354,11 @@ class Req(BaseHttpRouteItemWithoutEndpoint):
         route_item = BaseHttpRouteItem(endpoint=endpoint, **self.dict).format_methods()
         # 顶层
         if len(endpoint.__qualname__.split('.')) == 1:
-            app_task_store.add(id(endpoint), lambda app: route_item.mount_to(app))
+            app_task_store.add(
+                id(endpoint),
+                lambda app: route_item.mount_to(app),
+                module=endpoint.__module__,
+            )
         else:
             # 作为Controller的方法
             route_record = EndpointRouteRecord(route_item)
@@ -349,7 +411,11 @@ class WebSocket(WebSocketRouteItemWithoutEndpoint):
         route_item = WebSocketRouteItem(endpoint=endpoint, **self.dict)
         # 顶层
         if len(endpoint.__qualname__.split('.')) == 1:
-            app_task_store.add(id(endpoint), lambda app: route_item.mount_to(app))
+            app_task_store.add(
+                id(endpoint),
+                lambda app: route_item.mount_to(app),
+                module=endpoint.__module__,
+            )
         else:
             # 作为Controller的方法
             route_record = EndpointRouteRecord(route_item)
@@ -0,0 +1,247 @@
+import asyncio
+import marshal
+import sys
+import threading
+from collections import Counter
+from collections.abc import Callable, Coroutine, Sequence
+from dataclasses import dataclass, field
+from types import CodeType, FrameType
+from typing import Annotated, Any, Literal
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.params import Depends
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute, request_response
+
+from .model import ProfilerBusyException
+
+# 栈帧标识，(文件名, 函数定义的行号, 函数名)，与pstats相同
+FrameKey = tuple[str, int, str]
+
+
+@dataclass(eq=False, slots=True)
+class ProfileTarget:
+    """一个可被采样的路由"""
+
+    controller: str
+    endpoint: str
+    path: str
+    methods: tuple[str, ...]
+    # 正在处理的请求数，只在事件循环线程中修改
+    in_flight: int = 0
+
+    @property
+    def name(self) -> str:
+        return f'{self.controller}.{self.endpoint}'
+
+
+def _profiled(
+    handler: Callable[[Request], Coroutine[Any, Any, Response]] | None,
+    target: ProfileTarget | None,
+) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+    async def app(request: Request) -> Response:
+        # 采样线程在栈中找到这一帧，读取target判断是否是被选中的路由
+        target.in_flight += 1  # type: ignore
+        try:
+            return await handler(request)  # type: ignore
+        finally:
+            target.in_flight -= 1  # type: ignore
+
+    return app
+
+
+_PROFILED_CODE: CodeType = _profiled(None, None).__code__
+
+
+@dataclass
+class ProfileResult:
+    # {(ProfileTarget.name, 栈帧, ...): 采样次数}，栈帧从外到内
+    samples: Counter[tuple[Any, ...]]
+    interval: float
+    # 有被选中的请求在处理的采样次数，包括事件循环正在处理其他任务时
+    active: int = 0
+
+    def collapsed(self) -> str:
+        """flame graph的collapsed stack格式，值为采样次数"""
+        return '\n'.join(
+            ';'.join([stack[0], *(f'{name} ({file}:{line})' for file, line, name in stack[1:])])
+            + f' {cnt}'
+            for stack, cnt in self.samples.most_common()
+        )
+
+    def stats(self) -> dict[FrameKey, tuple]:
+        """pstats格式的统计，调用次数为采样次数，耗时为采样次数乘以采样间隔"""
+        # {函数: [采样次数, 自身次数, 累计次数, {调用方: [次数, 自身次数, 累计次数]}]}
+        acc: dict[FrameKey, list] = {}
+        for stack, cnt in self.samples.items():
+            frames: tuple[FrameKey, ...] = stack[1:]
+            seen: set[FrameKey] = set()
+            for i, key in enumerate(frames):
+                item = acc.setdefault(key, [0, 0, 0, {}])
+                leaf = i == len(frames) - 1
+                if key not in seen:
+                    seen.add(key)
+                    item[0] += cnt
+                    item[2] += cnt
+                if leaf:
+                    item[1] += cnt
+                if i > 0:
+                    caller = item[3].setdefault(frames[i - 1], [0, 0, 0])
+                    caller[0] += cnt
+                    caller[1] += cnt if leaf else 0
+                    caller[2] += cnt
+        t = self.interval
+        return {
+            key: (
+                n,
+                n,
+                tt * t,
+                ct * t,
+                {c: (cn, cn, ctt * t, cct * t) for c, (cn, ctt, cct) in callers.items()},
+            )
+            for key, (n, tt, ct, callers) in acc.items()
+        }
+
+    def pstats(self) -> bytes:
+        """`pstats.Stats`、snakeviz等可以直接打开的文件内容"""
+        return marshal.dumps(self.stats())
+
+
+@dataclass
+class SamplingSession:
+    targets: set[ProfileTarget]
+    interval: float
+    # 被采样的线程，运行事件循环的线程
+    thread_id: int
+    result: ProfileResult
+    stop: threading.Event = field(default_factory=threading.Event)
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack: list[FrameKey] = []
+        while frame is not None:
+            if frame.f_code is _PROFILED_CODE:
+                target = _target_of(frame)
+                if target in self.targets:
+                    stack.reverse()
+                    self.result.samples[(target.name, *stack)] += 1  # type: ignore
+                    return
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_firstlineno, code.co_qualname))
+            frame = frame.f_back
+
+    def run(self):
+        while not self.stop.wait(self.interval):
+            if any(t.in_flight for t in self.targets):
+                self.result.active += 1
+                self.sample()
+
+
+def _target_of(frame: FrameType) -> ProfileTarget | None:
+    try:
+        return frame.f_locals.get('target')
+    except Exception:
+        return None
+
+
+@dataclass
+class SamplingProfiler:
+    """按需采样指定Controller或路由的调用栈，只统计这些请求正在事件循环中执行时的栈"""
+
+    targets: list[ProfileTarget] = field(default_factory=list)
+    session: SamplingSession | None = None
+
+    def instrument(self, route: APIRoute, controller: str, endpoint: str, path: str):
+        target = ProfileTarget(controller, endpoint, path, tuple(sorted(route.methods)))
+        self.targets.append(target)
+        get_route_handler = route.get_route_handler
+
+        def profiled_get_route_handler():
+            return _profiled(get_route_handler(), target)
+
+        route.get_route_handler = profiled_get_route_handler  # type: ignore
+        route.app = request_response(route.get_route_handler())
+
+    def select(self, controller: str | None = None, route: str | None = None) -> set[ProfileTarget]:
+        """
+        Args:
+            controller (str | None, optional): Controller类名. Defaults to None.
+            route (str | None, optional): 路由路径或endpoint名. Defaults to None.
+        """
+        return {
+            t
+            for t in self.targets
+            if (controller is None or t.controller == controller)
+            and (route is None or route in (t.path, t.endpoint))
+        }
+
+    async def profile(
+        self,
+        seconds: float,
+        controller: str | None = None,
+        route: str | None = None,
+        interval: float = 0.005,
+    ) -> ProfileResult:
+        """在当前事件循环中采样`seconds`秒
+
+        Raises:
+            ProfilerBusyException: 已经在采样
+        """
+        if self.session is not None:
+            raise ProfilerBusyException('已经在采样')
+        session = self.session = SamplingSession(
+            self.select(controller, route),
+            interval,
+            threading.get_ident(),
+            ProfileResult(Counter(), interval),
+        )
+        thread = threading.Thread(target=session.run, name='fastapi-boot-sampler', daemon=True)
+        thread.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            session.stop.set()
+            thread.join()
+            self.session = None
+        return session.result
+
+    async def endpoint(
+        self,
+        seconds: Annotated[float, Query(gt=0, le=600)] = 10,
+        controller: str | None = None,
+        route: str | None = None,
+        format: Literal['collapsed', 'pstats'] = 'collapsed',
+        interval: Annotated[float, Query(ge=0.001, le=1)] = 0.005,
+    ) -> Response:
+        if not self.select(controller, route):
+            raise HTTPException(404, '没有匹配的路由')
+        try:
+            result = await self.profile(seconds, controller, route, interval)
+        except ProfilerBusyException as e:
+            raise HTTPException(409, str(e))
+        if format == 'pstats':
+            return Response(
+                result.pstats(),
+                media_type='application/octet-stream',
+                headers={'Content-Disposition': 'attachment; filename="profile.pstats"'},
+            )
+        return PlainTextResponse(result.collapsed())
+
+    def mount(self, app: FastAPI, path: str, dependencies: Sequence[Depends] | None = None):
+        """添加采样路由，同一个app的同一个路径只添加一次"""
+        for route in app.router.routes:
+            if isinstance(route, APIRoute) and route.path == path and route.endpoint == self.endpoint:
+                return
+        app.add_api_route(
+            path,
+            self.endpoint,
+            methods=['GET'],
+            dependencies=dependencies,
+            include_in_schema=False,
+        )
+
+    def clear(self):
+        self.targets.clear()
+
+
+sampling_profiler = SamplingProfiler()
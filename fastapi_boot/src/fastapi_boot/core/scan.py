@@ -0,0 +1,148 @@
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from hashlib import sha256
+from importlib import import_module
+from importlib.util import find_spec
+
+from fastapi import FastAPI
+from starlette.routing import WebSocketRoute
+
+from .const import app_task_store
+from .radix import UncompilableRouteException, iter_leaf_routes
+from .util import atomic_write
+
+MANIFEST_VERSION = 2
+MANIFEST_NAME = 'fastapi_boot_manifest.json'
+
+
+@dataclass
+class ScanManifest:
+    package: str
+    # {相对路径: [mtime_ns, size, sha256]}
+    files: dict[str, list] = field(default_factory=dict)
+    # 定义了Controller、顶层Req、WS的模块，按注册顺序
+    modules: list[str] = field(default_factory=list)
+    # {模块名: [[路径, 请求方法列表，websocket为None]]}
+    routes: dict[str, list[list]] = field(default_factory=dict)
+    # 添加了app中间件的模块，不能延迟挂载
+    eager: list[str] = field(default_factory=list)
+    version: int = MANIFEST_VERSION
+
+
+def get_package_root(package: str) -> str:
+    spec = find_spec(package)
+    assert (
+        spec is not None and spec.submodule_search_locations
+    ), f'"{package}"不是包，无法扫描'
+    return list(spec.submodule_search_locations)[0]
+
+
+def walk_package(package: str, root: str) -> dict[str, str]:
+    """包中的所有模块，{相对路径: 模块名}，包括命名空间包"""
+    res: dict[str, str] = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root)
+        parts = [] if rel_dir == '.' else rel_dir.split(os.sep)
+        dirnames[:] = sorted(d for d in dirnames if d.isidentifier() and d != '__pycache__')
+        for filename in sorted(filenames):
+            name = filename[:-3]
+            if not filename.endswith('.py') or not name.isidentifier() or name == '__main__':
+                continue
+            module_parts = parts if name == '__init__' else [*parts, name]
+            res['/'.join([*parts, filename])] = '.'.join([package, *module_parts])
+    return res
+
+
+def _hash(path: str) -> str:
+    with open(path, 'rb') as f:
+        return sha256(f.read()).hexdigest()
+
+
+def _file_info(path: str, old: list | None = None) -> list:
+    """[mtime_ns, size, sha256]，mtime和大小都没变时沿用旧的哈希"""
+    stat = os.stat(path)
+    if old is not None and old[0] == stat.st_mtime_ns and old[1] == stat.st_size:
+        return old
+    return [stat.st_mtime_ns, stat.st_size, _hash(path)]
+
+
+def load_manifest(path: str, package: str) -> ScanManifest | None:
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        manifest = ScanManifest(**data)
+    except (OSError, ValueError, TypeError):
+        return None
+    if manifest.version != MANIFEST_VERSION or manifest.package != package:
+        return None
+    return manifest
+
+
+def write_manifest(path: str, manifest: ScanManifest):
+    atomic_write(path, json.dumps(asdict(manifest), ensure_ascii=False).encode('utf-8'))
+
+
+def probe_routes(module: str) -> tuple[list[list], bool]:
+    """把模块中的Controller等挂载到临时app上，得到路由和是否添加了app中间件"""
+    probe = FastAPI(openapi_url=None, docs_url=None, redoc_url=None)
+    for key in app_task_store.keys_of({module}):
+        app_task_store.emit(key, probe)
+    routes: list[list] = []
+    for route in probe.router.routes:
+        try:
+            for path, leaf in iter_leaf_routes(route):
+                methods = None if isinstance(leaf, WebSocketRoute) else sorted(leaf.methods or ())  # type: ignore
+                routes.append([path, methods])
+        except UncompilableRouteException:
+            return routes, True
+    return routes, bool(probe.user_middleware)
+
+
+def scan_package(
+    package: str, manifest_path: str | None = None, lazy: bool = False
+) -> tuple[ScanManifest, list[str]]:
+    """导入包中定义了Controller、顶层Req、WS的模块
+
+    - 清单中所有文件的mtime、大小(变化时再比较哈希)都没变时，只导入清单中的模块
+    - 否则导入包中所有模块，重新生成清单
+
+    Args:
+        package (str): 包名，如`src.controller`
+        manifest_path (str | None, optional): 清单路径. Defaults to `包目录/__pycache__/fastapi_boot_manifest.json`.
+        lazy (bool, optional): 清单有效时只导入不能延迟挂载的模块. Defaults to False.
+
+    Returns:
+        tuple[ScanManifest, list[str]]: 清单、已导入的定义了Controller等的模块
+    """
+    root = get_package_root(package)
+    manifest_path = manifest_path or os.path.join(root, '__pycache__', MANIFEST_NAME)
+    files = walk_package(package, root)
+    manifest = load_manifest(manifest_path, package)
+    if manifest is not None and manifest.files.keys() == files.keys():
+        infos = {
+            rel: _file_info(os.path.join(root, rel), manifest.files[rel]) for rel in files
+        }
+        if all(infos[rel][2] == manifest.files[rel][2] for rel in files):
+            modules = [m for m in manifest.modules if not lazy or m in manifest.eager]
+            for module in modules:
+                import_module(module)
+            if infos != manifest.files:
+                # 只有mtime变了，如重新checkout
+                manifest.files = infos
+                write_manifest(manifest_path, manifest)
+            return manifest, modules
+    # 全量扫描
+    for module in files.values():
+        import_module(module)
+    scanned = set(files.values())
+    modules = list(dict.fromkeys(m for m in app_task_store.modules.values() if m in scanned))
+    manifest = ScanManifest(
+        package, {rel: _file_info(os.path.join(root, rel)) for rel in files}, modules
+    )
+    for module in modules:
+        manifest.routes[module], eager = probe_routes(module)
+        if eager:
+            manifest.eager.append(module)
+    write_manifest(manifest_path, manifest)
+    return manifest, modules
@@ -0,0 +1,72 @@
+import os
+from typing import Any
+from warnings import warn
+
+from fastapi import FastAPI
+from fastapi import routing as fastapi_routing
+from fastapi.routing import APIRoute
+
+
+def atomic_write(path: str, data: bytes):
+    """先写临时文件再替换，多个进程同时启动时不会读到写了一半的文件，失败时只警告"""
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError as e:
+        warn(f'写入 "{path}" 失败: {e}')
+
+
+# FastAPI的私有API只在下面使用，没有时退化为不检查
+
+
+def get_routes_version(router: Any) -> int:
+    """FastAPI的路由表版本(包括include_router的子路由)，路由增删时变化，没有时为0"""
+    get_version = getattr(router, '_get_routes_version', None)
+    return get_version() if get_version is not None else 0
+
+
+def mark_openapi_schema_current(app: FastAPI):
+    """让`app.openapi()`认为已有的`openapi_schema`与当前路由表一致，不再重新生成"""
+    if hasattr(app, '_openapi_routes_version'):
+        app._openapi_routes_version = get_routes_version(app.router)  # type: ignore
+
+
+def get_own_routes_version(router: Any) -> int:
+    """router自身的路由表版本(不包括include_router的子路由)，读取是O(1)的，没有时为0"""
+    return getattr(router, '_routes_version', 0)
+
+
+def mark_routes_changed(router: Any):
+    """原地修改`router.routes`后调用，让FastAPI的缓存(OpenAPI等)和`RadixRouter`失效"""
+    if (mark := getattr(router, '_mark_routes_changed', None)) is not None:
+        mark()
+    if (invalidate := getattr(getattr(router, 'middleware_stack', None), 'invalidate', None)) is not None:
+        invalidate()
+
+
+_get_fastapi_scope = getattr(fastapi_routing, '_get_fastapi_scope', None)
+_EFFECTIVE_ROUTE_CONTEXT_KEY = getattr(fastapi_routing, '_FASTAPI_EFFECTIVE_ROUTE_CONTEXT_KEY', None)
+
+
+def effective_route_contexts(route: Any) -> list[Any] | None:
+    """FastAPI延迟展开的include_router中所有子路由的上下文(带前缀、依赖等)，按匹配顺序
+
+    不是include_router或FastAPI不支持时为None
+    """
+    contexts = getattr(route, 'effective_route_contexts', None)
+    if contexts is None or _get_fastapi_scope is None or _EFFECTIVE_ROUTE_CONTEXT_KEY is None:
+        return None
+    return list(contexts())
+
+
+def select_effective_route(scope: Any, context: Any) -> Any:
+    """与FastAPI选中include_router的子路由时一样把上下文写入scope，返回处理请求的路由"""
+    _get_fastapi_scope(scope)[_EFFECTIVE_ROUTE_CONTEXT_KEY] = context  # type: ignore
+    route = context.original_route
+    if isinstance(route, APIRoute):
+        scope['route'] = route
+        return route
+    return context.starlette_route or route
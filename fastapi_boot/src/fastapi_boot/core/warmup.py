@@ -0,0 +1,83 @@
+from collections.abc import AsyncIterator, Iterable
+from contextlib import asynccontextmanager
+from typing import Any
+
+from fastapi import FastAPI
+from starlette.routing import BaseRoute
+
+from .openapi import use_openapi_cache
+from .profiler import startup_profiler
+
+
+def _iter_fields(route: Any) -> Iterable[Any]:
+    """路由的请求参数、请求体、响应模型的ModelField"""
+    dependants = [getattr(route, 'dependant', None)]
+    while dependants:
+        dependant = dependants.pop()
+        if dependant is None:
+            continue
+        for name in ('path_params', 'query_params', 'header_params', 'cookie_params', 'body_params'):
+            yield from getattr(dependant, name, ())
+        dependants.extend(getattr(dependant, 'dependencies', ()))
+    for name in ('body_field', 'response_field', 'stream_item_field'):
+        if (field := getattr(route, name, None)) is not None:
+            yield field
+    yield from (getattr(route, 'response_fields', None) or {}).values()
+
+
+def _warmup_fields(route: Any):
+    for field in _iter_fields(route):
+        adapter = getattr(field, '_type_adapter', None)
+        # 有前向引用等未完成构建的，再构建一次
+        if adapter is not None and not getattr(adapter, 'pydantic_complete', True):
+            adapter.rebuild(raise_errors=False)
+
+
+def warmup_routes(routes: Iterable[BaseRoute]) -> int:
+    """构建include_router的子路由(FastAPI在第一次匹配时才构建)的依赖、校验器、序列化器
+
+    Returns:
+        int: 预热的路由数
+    """
+    cnt = 0
+    for route in routes:
+        if hasattr(route, 'effective_candidates'):
+            # include_router
+            cnt += warmup_routes(route.effective_candidates())  # type: ignore
+            cnt += warmup_routes(route.effective_low_priority_routes())  # type: ignore
+        elif hasattr(route, 'dependant'):
+            _warmup_fields(route)
+            cnt += 1
+    return cnt
+
+
+def warmup_app(app: FastAPI, openapi: bool = True) -> int:
+    """预热app的所有路由，并生成OpenAPI文档
+
+    Returns:
+        int: 预热的路由数
+    """
+    with startup_profiler.span('warmup', app.title):
+        cnt = warmup_routes(app.router.routes)
+        if openapi and app.openapi_url:
+            app.openapi()
+    return cnt
+
+
+def use_warmup(app: FastAPI, openapi: bool = True):
+    """立即预热，并在lifespan启动时对之后添加的路由再预热一次
+
+    Args:
+        openapi (bool, optional): 是否生成OpenAPI文档. Defaults to True.
+    """
+    use_openapi_cache(app)
+    warmup_app(app, openapi)
+    lifespan_context = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(lifespan_app: Any) -> AsyncIterator[Any]:
+        warmup_app(app, openapi)
+        async with lifespan_context(lifespan_app) as state:
+            yield state
+
+    app.router.lifespan_context = lifespan
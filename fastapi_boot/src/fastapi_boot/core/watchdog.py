@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from time import perf_counter
+from types import FrameType
+from typing import Any
+
+from fastapi import FastAPI
+
+logger = logging.getLogger('fastapi_boot.watchdog')
+UNKNOWN = '<unknown>'
+# 记录的调用栈最多保留最内层的帧数
+MAX_FRAMES = 40
+
+
+@dataclass(slots=True)
+class LagEvent:
+    # 阻塞事件循环的Controller方法(`类名.方法名`)或endpoint函数，未知时为<unknown>
+    target: str
+    # 正在处理的请求，如`GET /user/1`，未知时为空
+    request: str
+    # 心跳比预期晚了多久(秒)
+    lag: float
+    # 阻塞时事件循环线程的调用栈，从外到内，`函数 (文件:行号)`
+    stack: tuple[str, ...]
+    # 时间戳
+    time: float
+
+
+@dataclass(slots=True)
+class LagStats:
+    count: int = 0
+    total: float = 0
+    max: float = 0
+
+
+def _local(frame: FrameType, name: str) -> Any:
+    if name not in frame.f_code.co_varnames and name not in frame.f_code.co_freevars:
+        return None
+    try:
+        return frame.f_locals.get(name)
+    except Exception:
+        return None
+
+
+def _target_of(frame: FrameType) -> str | None:
+    code = frame.f_code
+    if code.co_qualname == 'trans_endpoint.<locals>.new_endpoint':
+        # Controller的endpoint
+        instance, endpoint = _local(frame, 'instance'), _local(frame, 'endpoint')
+        if instance is not None and endpoint is not None:
+            return f'{type(instance).__name__}.{endpoint.__name__}'
+    elif code.co_qualname == 'run_endpoint_function':
+        # 顶层Req等普通路由
+        call = getattr(_local(frame, 'dependant'), 'call', None)
+        if call is not None:
+            return f'{call.__module__}.{call.__qualname__}'
+    return None
+
+
+def _request_of(frame: FrameType) -> str | None:
+    scope = getattr(_local(frame, 'request'), 'scope', None)
+    if isinstance(scope, dict) and 'path' in scope:
+        return f'{scope.get("method", "WS")} {scope["path"]}'
+    return None
+
+
+def capture(thread_id: int) -> tuple[str, str, tuple[str, ...]]:
+    """线程当前的调用栈，以及对应的路由
+
+    Returns:
+        tuple[str, str, tuple[str, ...]]: (target, request, stack)
+    """
+    frame = sys._current_frames().get(thread_id)
+    target = request = None
+    stack: list[str] = []
+    while frame is not None:
+        if len(stack) < MAX_FRAMES:
+            code = frame.f_code
+            stack.append(f'{code.co_qualname} ({code.co_filename}:{frame.f_lineno})')
+        target = target or _target_of(frame)
+        request = request or _request_of(frame)
+        frame = frame.f_back
+    stack.reverse()
+    return target or UNKNOWN, request or '', tuple(stack)
+
+
+@dataclass
+class LoopLagMonitor:
+    """事件循环阻塞监控
+
+    - 事件循环中每隔`threshold / 2`秒一次心跳，心跳晚于预期超过`threshold`秒即为阻塞
+    - 监控线程发现心跳超时时，记录事件循环线程当前的调用栈，并找到正在处理的Controller方法
+    - 统计只在事件循环线程中修改，不加锁
+
+    >>> Example
+    ```python
+    from fastapi_boot.core.watchdog import loop_lag_monitor
+
+    loop_lag_monitor.counts()  # {'UserController.export': 3}
+    loop_lag_monitor.stats['UserController.export'].max  # 最长阻塞(秒)
+    loop_lag_monitor.events[-1].stack  # 最近一次阻塞的调用栈
+    ```
+    """
+
+    threshold: float = 0.1
+    # 是否用logging输出每次阻塞，logger名为fastapi_boot.watchdog
+    log: bool = False
+    # {target: 统计}
+    stats: dict[str, LagStats] = field(default_factory=dict)
+    # 最近的阻塞事件
+    events: deque[LagEvent] = field(default_factory=lambda: deque(maxlen=100))
+    _loop: asyncio.AbstractEventLoop | None = None
+    _thread: threading.Thread | None = None
+    _thread_id: int = 0
+    _stop: threading.Event = field(default_factory=threading.Event)
+    _handle: asyncio.TimerHandle | None = None
+    _last_beat: float = 0
+    # 监控线程捕获的调用栈，由下一次心跳取出
+    _pending: tuple[str, str, tuple[str, ...]] | None = None
+
+    @property
+    def interval(self) -> float:
+        return self.threshold / 2
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, threshold: float | None = None, log: bool | None = None):
+        """在当前正在运行的事件循环中开始监控"""
+        if self.running:
+            return
+        if threshold is not None:
+            self.threshold = threshold
+        if log is not None:
+            self.log = log
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._pending = None
+        self._last_beat = perf_counter()
+        self._handle = self._loop.call_later(self.interval, self._beat)
+        self._thread = threading.Thread(target=self._watch, name='fastapi-boot-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _beat(self):
+        now = perf_counter()
+        lag = now - self._last_beat - self.interval
+        self._last_beat = now
+        if lag >= self.threshold:
+            self._record(lag)
+        if self._loop is not None and not self._stop.is_set():
+            self._handle = self._loop.call_later(self.interval, self._beat)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval / 2):
+            if self._pending is None and perf_counter() - self._last_beat > self.interval + self.threshold:
+                self._pending = capture(self._thread_id)
+
+    def _record(self, lag: float):
+        target, request, stack = self._pending or (UNKNOWN, '', ())
+        self._pending = None
+        stats = self.stats.setdefault(target, LagStats())
+        stats.count += 1
+        stats.total += lag
+        stats.max = max(stats.max, lag)
+        event = LagEvent(target, request, lag, stack, time.time())
+        self.events.append(event)
+        if self.log:
+            logger.warning(
+                '事件循环阻塞了%.0fms: %s %s\n%s', lag * 1000, target, request, '\n'.join(stack)
+            )
+
+    def counts(self) -> dict[str, int]:
+        """{target: 阻塞次数}"""
+        return {k: v.count for k, v in self.stats.items()}
+
+    def clear(self):
+        self.stats.clear()
+        self.events.clear()
+
+
+loop_lag_monitor = LoopLagMonitor()
+
+
+def use_lag_monitor(app: FastAPI, threshold: float = 0.1, log: bool = False):
+    """app启动时开始监控事件循环阻塞，关闭时停止，见`LoopLagMonitor`
+
+    Args:
+        threshold (float, optional): 阻塞超过多少秒时记录. Defaults to 0.1.
+        log (bool, optional): 是否用logging输出每次阻塞. Defaults to False.
+    """
+    lifespan_context = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(lifespan_app: Any) -> AsyncIterator[Any]:
+        loop_lag_monitor.start(threshold, log)
+        try:
+            async with lifespan_context(lifespan_app) as state:
+                yield state
+        finally:
+            loop_lag_monitor.stop()
+
+    app.router.lifespan_context = lifespan
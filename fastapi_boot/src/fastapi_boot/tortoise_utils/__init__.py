@@ -4,4 +4,37 @@ from fastapi_boot.tortoise_utils.decorator import (
     Insert as Insert,
     Delete as Delete,
     Sql as Sql,
+    Upsert as Upsert,
+    Export as Export,
+    statement_timeout as statement_timeout,
+)
+from fastapi_boot.tortoise_utils.const import (
+    query_budget_store as query_budget_store,
+    single_flight_store as single_flight_store,
+    sql_timeout_store as sql_timeout_store,
+)
+from fastapi_boot.tortoise_utils.connection import (
+    connection_pinning as connection_pinning,
+    pin_connection as pin_connection,
+)
+from fastapi_boot.tortoise_utils.counter import (
+    count_queries as count_queries,
+    query_counting as query_counting,
+)
+from fastapi_boot.tortoise_utils.dialect import (
+    Dialect as Dialect,
+    dialect_registry as dialect_registry,
+)
+from fastapi_boot.tortoise_utils.explain import (
+    query_plan_recorder as query_plan_recorder,
+)
+from fastapi_boot.tortoise_utils.group import QueryGroup as QueryGroup
+from fastapi_boot.tortoise_utils.repository import Repository as Repository
+from fastapi_boot.tortoise_utils.model import (
+    Page as Page,
+    Columns as Columns,
+    Row as Row,
+    InvalidCursorException as InvalidCursorException,
+    SqlTimeoutException as SqlTimeoutException,
+    UnsupportedDialectException as UnsupportedDialectException,
 )
@@ -0,0 +1,114 @@
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from tortoise import Tortoise
+from tortoise.backends.base.client import PoolConnectionWrapper, TransactionalDBClient
+
+from .dialect import Dialect, dialect_registry
+
+
+@dataclass
+class PinnedConnection:
+    """请求内固定的驱动连接，由`client.acquire_connection()`从连接池获取"""
+
+    wrapper: PoolConnectionWrapper
+    # 驱动的连接
+    connection: Any
+    dialect: Dialect
+    # 同一请求内并发的语句在这个连接上排队执行
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    async def execute_query(self, sql: str, params: list[Any]) -> tuple[int, list]:
+        """与`client.execute_query`相同，在固定的连接上执行"""
+        async with self.lock:
+            return await self.dialect.execute(self.connection, sql, params)
+
+
+class PinnedConnections:
+    """一个请求内固定使用的连接，按连接名在第一次执行sql时从连接池获取"""
+
+    def __init__(self):
+        # {连接名: 固定的连接}
+        self.connections: dict[str, PinnedConnection] = {}
+        self.lock = asyncio.Lock()
+
+    async def get(self, connection_name: str) -> PinnedConnection | None:
+        """连接名对应的固定连接，当前不能固定时为None
+
+        - 事务中的client总是返回None，sql要在事务的连接上执行才能一起回滚，已经固定的连接不受影响
+        - 不能固定的结果不缓存，事务结束后仍会固定连接
+        """
+        client = Tortoise.get_connection(connection_name)
+        if isinstance(client, TransactionalDBClient):
+            return None
+        if (pinned := self.connections.get(connection_name)) is not None:
+            return pinned
+        async with self.lock:
+            if (pinned := self.connections.get(connection_name)) is not None:
+                return pinned
+            dialect = dialect_registry.of(client)
+            wrapper = client.acquire_connection()
+            # sqlite等单连接的client、不支持在驱动连接上执行的方言都不固定
+            if not isinstance(wrapper, PoolConnectionWrapper) or not dialect.pinnable:
+                return None
+            connection = await wrapper.__aenter__()
+            pinned = self.connections[connection_name] = PinnedConnection(wrapper, connection, dialect)
+            return pinned
+
+    async def release(self):
+        """把连接归还连接池"""
+        pinned = list(self.connections.values())
+        self.connections.clear()
+        for i in pinned:
+            await i.wrapper.__aexit__(None, None, None)
+
+
+pinned_connections_var: ContextVar[PinnedConnections | None] = ContextVar(
+    'fastapi_boot__pinned_connections', default=None
+)
+
+
+@asynccontextmanager
+async def connection_pinning() -> AsyncIterator[PinnedConnections]:
+    """在上下文中固定连接：第一次执行sql时获取，之后的sql都复用这个连接，退出时归还
+
+    >>> Example
+    ```python
+    async with connection_pinning():
+        users = await get_all_user()
+        cnt = await get_user_cnt()  # 与上一条sql使用同一个连接
+    ```
+    """
+    if (current := pinned_connections_var.get()) is not None:
+        # 已在固定连接的上下文中
+        yield current
+        return
+    pinned = PinnedConnections()
+    pinned_connections_var.set(pinned)
+    try:
+        yield pinned
+    finally:
+        pinned_connections_var.set(None)
+        await pinned.release()
+
+
+async def pin_connection():
+    """请求级固定连接的依赖，整个请求中的sql使用同一个连接，响应结束后归还连接池
+
+    >>> Example
+    ```python
+    @Controller('/user')
+    class UserController:
+        _ = use_dep(pin_connection)
+
+    @Get('/foo', dependencies=[Depends(pin_connection)])
+    async def foo(): ...
+    ```
+    """
+    async with connection_pinning():
+        yield
+
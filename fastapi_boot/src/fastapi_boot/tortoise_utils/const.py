@@ -0,0 +1,173 @@
+import asyncio
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+
+# 当前上下文中sql的超时时间(秒)，statement_timeout设置，优先于Sql的timeout参数
+timeout_var: ContextVar[float | None] = ContextVar(
+    'fastapi_boot__sql_timeout', default=None
+)
+
+
+# 当前请求中sql的最大并发数，最外层的QueryGroup设置，嵌套的QueryGroup共用
+query_limiter_var: ContextVar[asyncio.Semaphore | None] = ContextVar(
+    'fastapi_boot__query_limiter', default=None
+)
+
+
+@dataclass
+class StatementTimeoutRecord:
+    # 设置了超时的执行次数
+    executions: int = 0
+    # 超时次数
+    timeouts: int = 0
+    # 未超时的执行中最长耗时(秒)
+    max_elapsed: float = 0.0
+
+
+@dataclass
+class SqlTimeoutStore:
+    # {编译后的sql: record}
+    records: dict[str, StatementTimeoutRecord] = field(default_factory=dict)
+
+    def record(self, sql: str, elapsed: float, timed_out: bool):
+        record = self.records.get(sql)
+        if record is None:
+            record = self.records[sql] = StatementTimeoutRecord()
+        record.executions += 1
+        if timed_out:
+            record.timeouts += 1
+        elif elapsed > record.max_elapsed:
+            record.max_elapsed = elapsed
+
+    @property
+    def timeouts(self) -> int:
+        """所有语句的超时次数"""
+        return sum(i.timeouts for i in self.records.values())
+
+    def clear(self):
+        self.records.clear()
+
+
+sql_timeout_store = SqlTimeoutStore()
+
+
+@dataclass
+class SingleFlightRecord:
+    # 实际执行次数
+    executions: int = 0
+    # 复用正在执行的结果的次数
+    shared: int = 0
+    # 执行出错次数
+    errors: int = 0
+
+
+@dataclass
+class SingleFlightStore:
+    # {(连接名, 编译后的sql, 参数): 正在执行的task}
+    in_flight: dict[tuple[Any, ...], asyncio.Task] = field(default_factory=dict)
+    # {编译后的sql: record}
+    records: dict[str, SingleFlightRecord] = field(default_factory=dict)
+
+    def get_record(self, sql: str) -> SingleFlightRecord:
+        record = self.records.get(sql)
+        if record is None:
+            record = self.records[sql] = SingleFlightRecord()
+        return record
+
+    def clear(self):
+        self.records.clear()
+
+
+single_flight_store = SingleFlightStore()
+
+
+@dataclass
+class QueryCounter:
+    """一个请求内执行的sql"""
+
+    # 执行的语句数
+    count: int = 0
+    # 数据库总耗时(秒)
+    elapsed: float = 0.0
+    # {编译后的sql: 执行次数}
+    statements: dict[str, int] = field(default_factory=dict)
+
+    def record(self, sql: str, elapsed: float):
+        self.count += 1
+        self.elapsed += elapsed
+        self.statements[sql] = self.statements.get(sql, 0) + 1
+
+    @property
+    def max_repeats(self) -> int:
+        """同一条语句的最多执行次数"""
+        return max(self.statements.values(), default=0)
+
+    def repeated(self, threshold: int) -> dict[str, int]:
+        """执行次数超过threshold的语句"""
+        return {k: v for k, v in self.statements.items() if v > threshold}
+
+
+# 当前请求的sql计数，count_queries、query_counting设置
+query_counter_var: ContextVar[QueryCounter | None] = ContextVar(
+    'fastapi_boot__query_counter', default=None
+)
+
+
+@dataclass
+class QueryBudgetRecord:
+    # 请求数
+    requests: int = 0
+    # 所有请求的语句数
+    total_statements: int = 0
+    # 单个请求的最多语句数
+    max_statements: int = 0
+    # 单个请求中同一条语句的最多执行次数
+    max_repeats: int = 0
+    # 单个请求的最长数据库耗时(秒)
+    max_elapsed: float = 0.0
+
+
+@dataclass
+class QueryBudgetStore:
+    # {"请求方法 路由路径": record}
+    records: dict[str, QueryBudgetRecord] = field(default_factory=dict)
+
+    def record(self, route: str, counter: QueryCounter):
+        record = self.records.get(route)
+        if record is None:
+            record = self.records[route] = QueryBudgetRecord()
+        record.requests += 1
+        record.total_statements += counter.count
+        record.max_statements = max(record.max_statements, counter.count)
+        record.max_repeats = max(record.max_repeats, counter.max_repeats)
+        record.max_elapsed = max(record.max_elapsed, counter.elapsed)
+
+    def assert_budget(
+        self,
+        route: str,
+        max_statements: int | None = None,
+        max_repeats: int | None = None,
+    ):
+        """断言路由的单个请求语句数、重复执行次数不超过预算，测试中使用
+
+        Args:
+            route (str): `"请求方法 路由路径"`，如`"GET /user/{id}"`
+            max_statements (int | None, optional): 单个请求最多语句数. Defaults to None.
+            max_repeats (int | None, optional): 单个请求中同一条语句最多执行次数. Defaults to None.
+        """
+        record = self.records.get(route)
+        assert record is not None, f'路由 "{route}" 没有被请求过'
+        assert max_statements is None or record.max_statements <= max_statements, (
+            f'路由 "{route}" 单个请求执行了 {record.max_statements} 条sql, 超过预算 {max_statements}'
+        )
+        assert max_repeats is None or record.max_repeats <= max_repeats, (
+            f'路由 "{route}" 单个请求中同一条sql执行了 {record.max_repeats} 次, 超过预算 {max_repeats}'
+        )
+
+    def clear(self):
+        self.records.clear()
+
+
+query_budget_store = QueryBudgetStore()
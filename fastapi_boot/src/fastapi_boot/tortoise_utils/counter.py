@@ -0,0 +1,70 @@
+from collections.abc import Callable, Coroutine, Iterator
+from contextlib import contextmanager
+from typing import Any
+from warnings import warn
+
+from fastapi import Request, Response
+
+from .const import QueryCounter, query_budget_store, query_counter_var
+
+
+@contextmanager
+def query_counting() -> Iterator[QueryCounter]:
+    """统计上下文中执行的sql
+
+    >>> Example
+    ```python
+    with query_counting() as counter:
+        for user in await get_all_user():
+            await get_books_by_user(user.id)
+    counter.repeated(5)  # {"select * from book where user_id=?": 100}
+    ```
+    """
+    counter = QueryCounter()
+    token = query_counter_var.set(counter)
+    try:
+        yield counter
+    finally:
+        query_counter_var.reset(token)
+
+
+def count_queries(repeat_threshold: int = 5, header: str | None = 'X-Query-Count'):
+    """统计每个请求执行的sql的http中间件，配合`use_http_middleware`使用
+
+    - 记录语句数、数据库总耗时、同一条语句的执行次数，按路由汇总到`query_budget_store`
+    - 同一条编译后的语句在一个请求中执行超过`repeat_threshold`次时发出警告(可能是N+1查询)
+
+    Args:
+        repeat_threshold (int, optional): 同一条语句在一个请求中的执行次数上限. Defaults to 5.
+        header (str | None, optional): 写入语句数的响应头，数据库耗时(毫秒)写入`{header}-Time`，为None时不写. Defaults to 'X-Query-Count'.
+
+    >>> Example
+    ```python
+    @Controller('/user')
+    class UserController:
+        _ = use_http_middleware(count_queries(repeat_threshold=3))
+
+    # 测试中
+    query_budget_store.assert_budget('GET /user/all', max_statements=2, max_repeats=1)
+    ```
+    """
+
+    async def dispatch(
+        request: Request, call_next: Callable[[Request], Coroutine[Any, Any, Response]]
+    ):
+        with query_counting() as counter:
+            resp = await call_next(request)
+        route = request.scope.get('route')
+        path = getattr(route, 'path', None) or request.url.path
+        query_budget_store.record(f'{request.method} {path}', counter)
+        if repeated := counter.repeated(repeat_threshold):
+            for sql, cnt in repeated.items():
+                warn(
+                    f'"{request.method} {path}" 的一个请求中执行了 {cnt} 次 "{sql}", 可能是N+1查询'
+                )
+        if header:
+            resp.headers[header] = str(counter.count)
+            resp.headers[f'{header}-Time'] = f'{counter.elapsed * 1000:.3f}'
+        return resp
+
+    return dispatch
@@ -1,16 +1,42 @@
-from collections.abc import Callable, Coroutine
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable, Coroutine, Iterator, Sequence
+import csv
+import io
+import json
+from contextlib import aclosing, contextmanager, nullcontext
+from contextvars import copy_context
 from functools import wraps
-from inspect import signature
+from inspect import isclass, signature
 import inspect
 import re
 from string import Formatter
-from typing import Any, ParamSpec, TypeVar, cast, get_args, get_origin, overload
+from time import perf_counter
+from typing import Any, Literal, ParamSpec, TypeVar, cast, get_args, get_origin, overload
 from warnings import warn
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from tortoise import Model, Tortoise
-from tortoise.backends.sqlite.client import SqliteClient
-from tortoise.backends.mysql.client import MySQLClient
-from tortoise.backends.asyncpg.client import AsyncpgDBClient
+from tortoise import BaseDBAsyncClient, Model, Tortoise
+
+from .connection import pinned_connections_var
+from .const import (
+    query_counter_var,
+    query_limiter_var,
+    single_flight_store,
+    sql_timeout_store,
+    timeout_var,
+)
+from .dialect import Dialect, dialect_registry
+from .explain import query_plan_recorder
+from .group import QueryGroup
+from .model import (
+    Columns,
+    Page,
+    PageOption,
+    Row,
+    SqlTimeoutException,
+    decode_cursor,
+    encode_cursor,
+)
 
 
 def get_func_params_dict(func: Callable, *args, **kwds):
@@ -33,12 +59,33 @@ def get_func_params_dict(func: Callable, *args, **kwds):
     return res
 
 
+T = TypeVar('T')
 PM = TypeVar('PM', bound=BaseModel)
 TM = TypeVar('TM', bound=Model)
 P = ParamSpec('P')
 formatter = Formatter()
 
 
+@contextmanager
+def statement_timeout(timeout: float | None) -> Iterator[None]:
+    """在当前上下文中覆盖所有Sql的超时时间
+
+    >>> Example
+    ```python
+    with statement_timeout(0.5):
+        users = await get_all_user()
+    ```
+
+    Args:
+        timeout (float | None): 超时时间(秒)，0表示不限制，None表示使用各Sql自己的timeout
+    """
+    token = timeout_var.set(timeout)
+    try:
+        yield
+    finally:
+        timeout_var.reset(token)
+
+
 class Sql:
     """执行原生sql语句
 
@@ -64,58 +111,215 @@ class Sql:
     ```
     """
 
-    def __init__(self, sql: str, connection_name: str = 'default'):
+    def __init__(
+        self,
+        sql: str,
+        connection_name: str = 'default',
+        *,
+        timeout: float | None = None,
+    ):
         """
 
         Args:
             sql (str): 原始sql语句，用`{变量名}`占位，支持`{ins.a}`、`{arr[0]}`等方式取属性
             connection_name (str, optional): 连接名. Defaults to 'default'.
+            timeout (float | None, optional): 超时时间(秒)，超时抛出`SqlTimeoutException`，None或0不限制，可被`statement_timeout`覆盖. Defaults to None.
         """
         self.sql = sql.strip()
         self.connection_name = connection_name
+        self.timeout = timeout
         self.pattern = re.compile(r'{.*?}', flags=re.S)
         # 是否已将插值表达式替换为占位符，只运行一次
         self.formatted: bool = False
         # 占位符的变量，{xxx}、{xxx.xxx}、{xxx[0]}等字符串列表
         self.matched_params: list[str] = []
+        # 结果集的Row类型，{列名元组: Row子类}，每条语句通常只有一个
+        self.row_types: dict[tuple[str, ...], type[Row]] = {}
+        # 相同sql和参数的并发调用是否共享同一次执行，Select可开启
+        self.single_flight: bool = False
+        # 被装饰的函数，`模块.函数名`，非装饰器用法时为None
+        self.name: str | None = None
+
+    @property
+    def dialect(self) -> Dialect:
+        """连接的方言，第一次用到某种数据库时才导入对应的方言模块"""
+        return dialect_registry.of(Tortoise.get_connection(self.connection_name))
 
     @property
     def is_sqlite(self):
-        conn = Tortoise.get_connection(self.connection_name)
-        return conn.__class__ == SqliteClient
+        return self.dialect.name == 'sqlite'
 
     @property
     def is_mysql(self):
-        conn = Tortoise.get_connection(self.connection_name)
-        return conn.__class__ == MySQLClient
+        return self.dialect.name == 'mysql'
 
     @property
     def is_postgresql(self):
-        conn = Tortoise.get_connection(self.connection_name)
-        return conn.__class__ == AsyncpgDBClient
+        return self.dialect.name == 'postgres'
 
     @property
     def placeholder(self):
-        if self.is_sqlite:
-            return '?'
-        # pg、mysql的都看作%s，pg的后面再改
-        return '%s'
+        return self.dialect.placeholder
 
     def _interpolation2placeholder(self):
-        """插值表达式转为占位符"""
-        # {xxx}替换为sql占位符
-        self.sql = self.placeholder.join(self.pattern.split(self.sql))
-        # 如果是pg，占位符改为$1、$2、...
-        if self.is_postgresql:
-            cnt = 1
+        """插值表达式转为占位符，pg为$1、$2、..."""
+        self.sql = self.dialect.compile(self.pattern.split(self.sql))
+
+    def _format(self):
+        """首次执行时把插值表达式转为当前数据库的占位符，只运行一次"""
+        if not self.formatted:
+            self.formatted = True
+            # 占位符的变量，{xxx}、{xxx.xxx}、{xxx[0]}等
+            self.matched_params = self.pattern.findall(self.sql)
+            self._interpolation2placeholder()
+
+    async def _execute_query(self, calling_params: dict[str, Any]) -> tuple[int, list]:
+        """根据调用参数执行sql，返回驱动原始的行数据
+
+        Args:
+            calling_params (dict[str, Any]): 插值表达式求值时用到的变量
+        """
+        self._format()
+        # 根据占位符
+        actual_params = [
+            eval(param[1:-1], calling_params) for param in self.matched_params
+        ]
+        return await self._execute(self.sql, actual_params)
+
+    async def _execute(self, sql: str, params: list[Any]) -> tuple[int, list]:
+        """执行已编译的sql，返回驱动原始的行数据"""
+        if self.single_flight:
+            return await self._execute_single_flight(sql, params)
+        return await self._execute_direct(sql, params)
+
+    async def _execute_single_flight(self, sql: str, params: list[Any]) -> tuple[int, list]:
+        """相同sql和参数的并发调用共享同一次执行
+
+        所有调用方都通过`asyncio.shield`等待，发起执行的调用被取消不影响其他调用方
+        """
+        # 1、True、1.0相等且hash相同，加上类型区分
+        key = (self.connection_name, sql, *((type(p), p) for p in params))
+        try:
+            task = single_flight_store.in_flight.get(key)
+        except TypeError:
+            # 参数不可hash，直接执行
+            return await self._execute_direct(sql, params)
+        record = single_flight_store.get_record(sql)
+        if task is None:
+            record.executions += 1
+            # 共享的执行不使用发起方请求内固定的连接，发起方结束后连接会被归还
+            context = copy_context()
+            context.run(pinned_connections_var.set, None)
+            task = asyncio.get_running_loop().create_task(
+                self._execute_direct(sql, params), context=context
+            )
+            single_flight_store.in_flight[key] = task
+
+            def done(t: asyncio.Task):
+                if single_flight_store.in_flight.get(key) is t:
+                    del single_flight_store.in_flight[key]
+                # 取出异常，所有调用方都被取消时避免 never retrieved 警告
+                if not t.cancelled() and t.exception() is not None:
+                    record.errors += 1
+
+            task.add_done_callback(done)
+        else:
+            record.shared += 1
+        return await asyncio.shield(task)
+
+    async def _execute_direct(self, sql: str, params: list[Any]) -> tuple[int, list]:
+        conn = Tortoise.get_connection(self.connection_name)
+        execute_query = conn.execute_query
+        # 固定连接的上下文中在固定的连接上执行
+        if (connections := pinned_connections_var.get()) is not None:
+            if (pinned := await connections.get(self.connection_name)) is not None:
+                execute_query = pinned.execute_query
+        if query_plan_recorder.enabled:
+            await query_plan_recorder.capture(
+                self.name, conn, self.connection_name, sql, params
+            )
+        timeout = timeout_var.get()
+        if timeout is None:
+            timeout = self.timeout
+        counter = query_counter_var.get()
+        # QueryGroup中的查询，排队不计入耗时和超时
+        limiter = query_limiter_var.get()
+        async with limiter if limiter is not None else nullcontext():
+            start = perf_counter()
+            try:
+                # None和0都不限制
+                if not timeout:
+                    return await execute_query(sql, params)
+                return await self._execute_with_timeout(conn, execute_query, sql, params, timeout)
+            finally:
+                if counter is not None:
+                    counter.record(sql, perf_counter() - start)
+
+    async def _execute_with_timeout(
+        self,
+        conn: BaseDBAsyncClient,
+        execute_query: Callable[[str, list[Any]], Awaitable[tuple[int, list]]],
+        sql: str,
+        params: list[Any],
+        timeout: float,
+    ) -> tuple[int, list]:
+        """超时执行
+
+        - mysql: select语句用`MAX_EXECUTION_TIME`在服务端中止
+        - postgresql: asyncpg在任务被取消时会向服务端发送取消请求，不设置服务端的`statement_timeout`
+        - sqlite: 超时后中断正在执行的语句
+        - 都会用`asyncio.timeout`兜底，取消后连接立即归还连接池
+        """
+        dialect = dialect_registry.of(conn)
+        actual_sql = dialect.timeout_sql(sql, timeout)
+        start = perf_counter()
+        try:
+            async with asyncio.timeout(timeout):
+                resp = await execute_query(actual_sql, params)
+        except TimeoutError:
+            sql_timeout_store.record(sql, timeout, True)
+            await dialect.interrupt(conn)
+            raise SqlTimeoutException(f'sql执行超时({timeout}s): {sql}') from None
+        except Exception as e:
+            if dialect.is_timeout_error(e):
+                sql_timeout_store.record(sql, timeout, True)
+                raise SqlTimeoutException(f'sql执行超时({timeout}s): {sql}') from e
+            raise
+        sql_timeout_store.record(sql, perf_counter() - start, False)
+        return resp
+
+    def _to_rows(self, resp: Sequence[Any]) -> list[Row]:
+        """驱动返回的行转为Row"""
+        if not resp:
+            return []
+        fields = tuple(resp[0].keys())
+        row_type = self.row_types.get(fields)
+        if row_type is None:
+            row_type = self.row_types[fields] = Row.make(fields)
+        # mysql返回的是dict
+        if isinstance(resp[0], dict):
+            return [row_type(tuple(i.values())) for i in resp]
+        return list(map(row_type, map(tuple, resp)))
+
+    @staticmethod
+    async def gather(*aws: Awaitable[Any], limit: int | None = None) -> list[Any]:
+        """并发执行互不依赖的查询，按传入顺序返回结果，见`QueryGroup`
+
+        >>> Example
+        ```python
+        users, cnt = await Sql.gather(get_all_user(), Select('select count(*) as cnt from user').execute())
+        ```
 
-            def fn(_):
-                nonlocal cnt
-                res = f'${cnt}'
-                cnt += 1
-                return res
+        Args:
+            *aws (Awaitable[Any]): 查询
+            limit (int | None, optional): 同时执行的sql的最大数量. Defaults to `QueryGroup.default_limit`.
+        """
+        return await QueryGroup(limit).gather(*aws)
 
-            self.sql = re.compile(f'{self.placeholder}').sub(fn, self.sql)
+    def _bind(self, func: Callable):
+        """记录被装饰的函数，execute中的临时函数除外"""
+        if func.__module__ != __name__:
+            self.name = f'{func.__module__}.{func.__qualname__}'
 
     def fill(self, **kwds):
         """向sql语句中的占位符{}填充已知参数，**会直接替换**，不要填充不确定的值，防止sql注入
@@ -149,22 +353,14 @@ class Sql:
         Returns:
             Callable[P, Coroutine[Any, Any, tuple[int, list[dict]]]]
         """
-        if not self.formatted:
-            self.formatted = True
-            # 占位符的变量，{xxx}、{xxx.xxx}、{xxx[0]}等
-            self.matched_params = self.pattern.findall(self.sql)
-            self._interpolation2placeholder()
+
+        self._bind(func)
 
         @wraps(func)
         async def wrapper(*args: P.args, **kwds: P.kwargs):
-            calling_params = get_func_params_dict(func, *args, **kwds)
-            # 根据占位符
-            actual_params = [
-                eval(param[1:-1], calling_params) for param in self.matched_params
-            ]
-            rows, resp = await Tortoise.get_connection(
-                self.connection_name
-            ).execute_query(self.sql, actual_params)
+            rows, resp = await self._execute_query(
+                get_func_params_dict(func, *args, **kwds)
+            )
             if self.is_sqlite:
                 resp = list(map(dict, resp))
             return rows, resp
@@ -173,7 +369,7 @@ class Sql:
 
 
 class Select(Sql):
-    """Select实现，返回`None` | `BaseModel` | `Model` | `list[BaseModel]` | `list[Model]` | `list[dict]`
+    """Select实现，返回`None` | `BaseModel` | `Model` | `list[BaseModel]` | `list[Model]` | `list[Row]` | `list[dict]`
     >>> Example
 
     ```python
@@ -208,7 +404,8 @@ class Select(Sql):
 
     # ----------------------------------------------------------------------------------
 
-    # 3. 返回值类型注解为`list[dict]`、None, 返回值是`Sql`返回元组的第二项, 即`list[dict]`
+    # 3. 返回值类型注解为None、list, 返回`list[Row]`, Row是按列名创建一次的轻量行对象, 支持`row.name`、`row['name']`
+    #    需要真正的dict时注解为`list[dict]`
 
 
     # ----------------------------------------------------------------------------------
@@ -222,11 +419,37 @@ class Select(Sql):
     # |       return annotation     |      return value type      |
     # |               T             |            T|None           |
     # |            list[T]          |            list[T]          |
-    # |      None|list|list[dict]   |           list[dict]        |
+    # |          None|list          |           list[Row]         |
+    # |          list[dict]         |           list[dict]        |
+    # |   Page[T] (需调用paginate)   |           Page[T]           |
+    # |          Columns[T]         |  Columns[T] (每列一个数组)   |
 
     ```
     """
 
+    def __init__(
+        self,
+        sql: str,
+        connection_name: str = 'default',
+        *,
+        timeout: float | None = None,
+        single_flight: bool = False,
+    ):
+        """
+
+        Args:
+            sql (str): 原始sql语句，用`{变量名}`占位，支持`{ins.a}`、`{arr[0]}`等方式取属性
+            connection_name (str, optional): 连接名. Defaults to 'default'.
+            timeout (float | None, optional): 超时时间(秒)，超时抛出`SqlTimeoutException`，None或0不限制，可被`statement_timeout`覆盖. Defaults to None.
+            single_flight (bool, optional): 编译后的sql和参数都相同的并发调用共享同一次执行，计数见`single_flight_store`. Defaults to False.
+        """
+        super().__init__(sql, connection_name, timeout=timeout)
+        self.single_flight = single_flight
+        # keyset分页配置，调用paginate后开启
+        self.page_option: PageOption | None = None
+        # 分页时实际执行的语句，{是否有游标: Sql}
+        self.page_statements: dict[bool, Sql] = {}
+
     @overload
     async def execute(self, expect: type[PM]) -> PM | None: ...
     @overload
@@ -240,9 +463,16 @@ class Select(Sql):
     async def execute(self, expect: type[list[TM]]) -> list[TM]: ...
 
     @overload
-    async def execute(
-        self, expect: None | type[list] | type[list[dict]] = None
-    ) -> list[dict]: ...
+    async def execute(self, expect: type[Page[T]]) -> Page[T]: ...
+
+    @overload
+    async def execute(self, expect: type[Columns[T]]) -> Columns[T]: ...
+
+    @overload
+    async def execute(self, expect: type[list[dict]]) -> list[dict]: ...
+
+    @overload
+    async def execute(self, expect: None | type[list] = None) -> list[Row]: ...
 
     async def execute(
         self,
@@ -255,14 +485,14 @@ class Select(Sql):
             | type[list]
             | type[list[dict]]
         ) = None,
-    ) -> PM | TM | list[PM] | list[TM] | None | list[dict]:
+    ) -> PM | TM | list[PM] | list[TM] | None | list[Row] | list[dict]:
         """非装饰器用法时执行sql
 
         Args:
             expect (`type[PM] | type[TM] | type[list[PM]] | type[list[TM]] | None | type[list] | type[list[dict]]`, optional): _description_. Defaults to None.
 
         Returns:
-            `PM | TM | list[PM] | list[TM] | None | list[dict]`: _description_
+            `PM | TM | list[PM] | list[TM] | None | list[Row] | list[dict]`: _description_
         """
 
         async def func(): ...
@@ -292,9 +522,24 @@ class Select(Sql):
 
     @overload
     def __call__(
-        self, func: Callable[P, Coroutine[Any, Any, None | list | list[dict]]]
+        self, func: Callable[P, Coroutine[Any, Any, Page[T]]]
+    ) -> Callable[P, Coroutine[Any, Any, Page[T]]]: ...
+
+    @overload
+    def __call__(
+        self, func: Callable[P, Coroutine[Any, Any, Columns[T]]]
+    ) -> Callable[P, Coroutine[Any, Any, Columns[T]]]: ...
+
+    @overload
+    def __call__(
+        self, func: Callable[P, Coroutine[Any, Any, list[dict]]]
     ) -> Callable[P, Coroutine[Any, Any, list[dict]]]: ...
 
+    @overload
+    def __call__(
+        self, func: Callable[P, Coroutine[Any, Any, None | list]]
+    ) -> Callable[P, Coroutine[Any, Any, list[Row]]]: ...
+
     def __call__(
         self,
         func: (
@@ -307,7 +552,8 @@ class Select(Sql):
             | None
         ),
     ) -> Callable[
-        P, Coroutine[Any, Any, PM | TM | list[PM] | list[TM] | None | list[dict]]
+        P,
+        Coroutine[Any, Any, PM | TM | list[PM] | list[TM] | None | list[Row] | list[dict]],
     ]:
         """
 
@@ -318,18 +564,25 @@ class Select(Sql):
             `Callable[P, Coroutine[Any, Any, PM | list[PM] | TM | list[TM] | list[dict] | None]]`: _description_
         """
         anno = func.__annotations__.get('return')
-        super_class = super()
+        is_page = isclass(anno) and issubclass(anno, Page)
+        if self.page_option is not None and not (anno is None or is_page):
+            raise TypeError(f'分页模式下返回值类型注解应为"Page[T]"或省略, 而不是"{anno}"')
+        if self.page_option is None and is_page:
+            raise TypeError('返回值类型注解为"Page[T]"时需要先调用"paginate"')
+        self._bind(func)
 
         @wraps(func)  # type: ignore
         async def wrapper(*args: P.args, **kwds: P.kwargs):
-            lines, resp = await super_class.__call__(
-                cast(
-                    Callable[P, Coroutine[Any, Any, None | tuple[int, list[dict]]]],
-                    func,
-                )
-            )(*args, **kwds)
+            calling_params = get_func_params_dict(func, *args, **kwds)
+            if self.page_option is not None:
+                return await self._execute_page(anno or Page, calling_params)
+            lines, resp = await self._execute_query(calling_params)
             if anno is None or anno is list:
-                return resp
+                return self._to_rows(resp)
+            elif anno == list[dict]:
+                return self._to_dicts(resp)
+            elif get_origin(anno) is Columns:
+                return Columns.from_rows(get_args(anno)[0], resp)
             elif get_origin(anno) is list:
                 arg = get_args(anno)[0]
                 return [arg(**i) for i in resp]
@@ -342,6 +595,96 @@ class Select(Sql):
 
         return wrapper
 
+    def _to_dicts(self, resp: list) -> list[dict]:
+        # single_flight时结果被多个调用方共享，需要复制
+        if resp and (self.single_flight or not isinstance(resp[0], dict)):
+            return list(map(dict, resp))
+        return resp
+
+    def paginate(
+        self,
+        key: str | Sequence[str],
+        limit: int = 20,
+        *,
+        desc: bool = False,
+        cursor: str | None = None,
+    ):
+        """开启keyset分页，把sql改写为`where 排序键 > 游标 order by 排序键 limit n+1`的形式，
+        翻到多深的页耗时都一样；sql中不要再写`order by`和`limit`
+
+        1. 返回值类型注解为`Page[T]`或省略
+        2. 被装饰函数的`cursor`、`limit`参数会覆盖这里的默认值
+
+        >>> Example
+        ```python
+        @Select('select * from {user} where age>{age}').fill(user=User.Meta.table).paginate('id')
+        async def get_user_page(age: int, cursor: str | None = None, limit: int = 20) -> Page[UserVO]: ...
+
+        page = await get_user_page(18)
+        next_page = await get_user_page(18, page.next_cursor)
+
+        page = await Select('select * from user').paginate('id', cursor=cursor).execute(Page[UserVO])
+        ```
+
+        Args:
+            key (str | Sequence[str]): 排序键，结果集中的列名，多个列时按元组比较，组合起来须唯一
+            limit (int, optional): 每页条数. Defaults to 20.
+            desc (bool, optional): 是否倒序. Defaults to False.
+            cursor (str | None, optional): 默认游标，被装饰函数没有`cursor`参数时使用. Defaults to None.
+        """
+        keys = [key] if isinstance(key, str) else list(key)
+        assert keys, '排序键不能为空'
+        self.page_option = PageOption(keys=keys, limit=limit, desc=desc, cursor=cursor)
+        self.page_statements.clear()
+        return self
+
+    def _page_statement(self, seek: bool) -> Sql:
+        """第一页和后续页各编译一次"""
+        if seek not in self.page_statements:
+            option = cast(PageOption, self.page_option)
+            op, direction = ('<', 'desc') if option.desc else ('>', 'asc')
+            order_by = ', '.join(f'{k} {direction}' for k in option.keys)
+            where = ''
+            if seek:
+                cursor_values = ', '.join(
+                    f'{{__page_cursor__[{i}]}}' for i in range(len(option.keys))
+                )
+                if len(option.keys) == 1:
+                    where = f' where {option.keys[0]} {op} {cursor_values}'
+                else:
+                    where = f' where ({", ".join(option.keys)}) {op} ({cursor_values})'
+            self.page_statements[seek] = Sql(
+                f'select * from ({self.sql}) as _page{where} order by {order_by} limit {{__page_limit__}}',
+                self.connection_name,
+                timeout=self.timeout,
+            )
+            self.page_statements[seek].single_flight = self.single_flight
+            self.page_statements[seek].name = self.name
+        return self.page_statements[seek]
+
+    async def _execute_page(self, anno: type[Page], calling_params: dict[str, Any]):
+        option = cast(PageOption, self.page_option)
+        cursor = calling_params.get('cursor', option.cursor)
+        limit = calling_params.get('limit') or option.limit
+        params = {**calling_params, '__page_limit__': limit + 1}
+        if cursor:
+            params['__page_cursor__'] = decode_cursor(cursor, len(option.keys))
+        _, resp = await self._page_statement(bool(cursor))._execute_query(params)
+        has_next = len(resp) > limit
+        resp = resp[:limit]
+        next_cursor = (
+            encode_cursor([resp[-1][k] for k in option.keys]) if has_next else None
+        )
+        item_type = (anno.__pydantic_generic_metadata__['args'] or (None,))[0]
+        items = (
+            self._to_dicts(resp)
+            if item_type is None
+            else [item_type(**i) for i in resp]
+        )
+        return anno.model_construct(
+            items=items, next_cursor=next_cursor, has_next=has_next
+        )
+
 
 class Insert(Sql):
     """用法同`Sql`
@@ -380,6 +723,7 @@ class Insert(Sql):
             `Callable[P, Coroutine[Any, Any, int]]`: _description_
         """
         super_class = super()
+        self._bind(func)
 
         @wraps(func)
         async def wrapper(*args: P.args, **kwds: P.kwargs) -> int:
@@ -425,3 +769,309 @@ class Delete(Insert):
         """
 
         return super().execute()
+
+
+def record2dict(
+    record: BaseModel | Model | dict[str, Any],
+    columns: dict[str, str] | None = None,
+    exclude_unset: bool = False,
+) -> dict[str, Any]:
+    """记录转为{列名: 值}
+
+    Args:
+        record (BaseModel | Model | dict[str, Any]): 记录
+        columns (dict[str, str] | None, optional): {字段名: 列名}，只保留其中的字段并转为列名. Defaults to None: Model按自身的字段映射，dict、BaseModel的键即为列名.
+        exclude_unset (bool, optional): BaseModel是否只保留设置了的字段. Defaults to False.
+    """
+    if isinstance(record, Model):
+        projection = record._meta.fields_db_projection if columns is None else columns
+        return {column: getattr(record, name) for name, column in projection.items()}
+    if isinstance(record, BaseModel):
+        data = record.model_dump(by_alias=True, exclude_unset=exclude_unset)
+    else:
+        data = record
+    if columns is None:
+        return data
+    return {columns[k]: v for k, v in data.items() if k in columns}
+
+
+class Upsert(Sql):
+    """批量upsert，按冲突键插入或更新，每批一条语句、一次往返
+
+    - sqlite、postgresql: `insert ... on conflict (键) do update set 列=excluded.列`
+    - mysql: `insert ... as new on duplicate key update 列=new.列`，需要mysql 8.0.19+
+    - 被装饰函数的第一个参数(self除外)为记录列表，记录可以是`dict`、`BaseModel`、`Model`
+    - 返回值类型注解为`None`|`int`，始终返回`int`，表示`操作行数`，mysql中更新的行计为2
+
+    >>> Example
+    ```python
+    @Upsert(User.Meta.table, conflict='id')
+    async def sync_users(users: list[UserDTO]): ...
+
+    rows: int = await sync_users(users)
+
+    rows: int = await Upsert(User.Meta.table, conflict='id', update=['age']).execute(users)
+    ```
+    """
+
+    def __init__(
+        self,
+        table: str,
+        conflict: str | Sequence[str],
+        update: Sequence[str] | None = None,
+        *,
+        columns: Sequence[str] | None = None,
+        batch_size: int = 500,
+        connection_name: str = 'default',
+        timeout: float | None = None,
+    ):
+        """
+
+        Args:
+            table (str): 表名
+            conflict (str | Sequence[str]): 冲突键，需有唯一约束(mysql中为主键或唯一索引)
+            update (Sequence[str] | None, optional): 冲突时更新的列，空列表表示冲突时不更新. Defaults to 除冲突键外的所有列.
+            columns (Sequence[str] | None, optional): 插入的列. Defaults to 第一条记录的所有列.
+            batch_size (int, optional): 每批最多的记录数，还会受数据库参数个数上限限制. Defaults to 500.
+            connection_name (str, optional): 连接名. Defaults to 'default'.
+            timeout (float | None, optional): 每批的超时时间(秒). Defaults to None.
+        """
+        super().__init__('', connection_name, timeout=timeout)
+        self.table = table
+        self.conflict = [conflict] if isinstance(conflict, str) else list(conflict)
+        self.update = None if update is None else list(update)
+        self.columns = None if columns is None else list(columns)
+        self.batch_size = batch_size
+        # {(列, 记录数): sql}，一批记录数固定，通常只有整批和最后一批两条
+        self.statements: dict[tuple[tuple[str, ...], int], str] = {}
+
+    def _quote(self, name: str) -> str:
+        return '.'.join(map(self.dialect.quote, name.split('.')))
+
+    def _render(self, columns: tuple[str, ...], size: int) -> str:
+        """生成`size`条记录的upsert语句"""
+        if (columns, size) in self.statements:
+            return self.statements[columns, size]
+        cols = ', '.join(map(self._quote, columns))
+        row = '(' + ', '.join(['{}'] * len(columns)) + ')'
+        values = self.dialect.compile(self.pattern.split(', '.join([row] * size)))
+        update = (
+            [c for c in columns if c not in self.conflict]
+            if self.update is None
+            else self.update
+        )
+        sql = f'insert into {self._quote(self.table)} ({cols}) values {values}'
+        if self.is_mysql:
+            # 行别名代替已废弃的`values(列)`；不更新时用`键=键`，冲突的记录保持不变
+            key = self._quote(self.conflict[0])
+            sets = (
+                ', '.join(f'{self._quote(c)}=new.{self._quote(c)}' for c in update)
+                if update
+                else f'{key}={key}'
+            )
+            sql += f' as new on duplicate key update {sets}'
+        else:
+            conflict = ', '.join(map(self._quote, self.conflict))
+            if update:
+                sets = ', '.join(f'{self._quote(c)}=excluded.{self._quote(c)}' for c in update)
+                sql += f' on conflict ({conflict}) do update set {sets}'
+            else:
+                sql += f' on conflict ({conflict}) do nothing'
+            sql += self.dialect.returning
+        self.statements[columns, size] = sql
+        return sql
+
+    async def _upsert(self, records: Sequence[BaseModel | Model | dict[str, Any]]) -> int:
+        if not records:
+            return 0
+        dicts = list(map(record2dict, records))
+        columns = tuple(self.columns or dicts[0])
+        size = max(min(self.batch_size, self.dialect.max_params // len(columns)), 1)
+        total = 0
+        for i in range(0, len(dicts), size):
+            chunk = dicts[i : i + size]
+            params = [d.get(c) for d in chunk for c in columns]
+            rows, _ = await self._execute(self._render(columns, len(chunk)), params)
+            total += rows
+        return total
+
+    async def execute(self, records: Sequence[BaseModel | Model | dict[str, Any]]) -> int:  # type: ignore
+        """非装饰器用法时执行upsert
+
+        Args:
+            records (Sequence[BaseModel | Model | dict[str, Any]]): 记录列表
+        """
+        return await self._upsert(records)
+
+    def __call__(  # type: ignore
+        self, func: Callable[P, Coroutine[Any, Any, None | int]]
+    ) -> Callable[P, Coroutine[Any, Any, int]]:
+        """
+
+        Args:
+            func (`Callable[P, Coroutine[Any, Any, None  |  int]]`): 第一个参数(self除外)为记录列表
+
+        Returns:
+            `Callable[P, Coroutine[Any, Any, int]]`: _description_
+
+        Raises:
+            TypeError: 被装饰函数没有记录列表参数
+        """
+        name = next((k for k in signature(func).parameters if k != 'self'), None)
+        if name is None:
+            raise TypeError(f'Upsert装饰的函数 "{func.__qualname__}" 需要一个记录列表参数')
+        self._bind(func)
+
+        @wraps(func)
+        async def wrapper(*args: P.args, **kwds: P.kwargs) -> int:
+            calling_params = get_func_params_dict(func, *args, **kwds)
+            return await self._upsert(calling_params[name])
+
+        return wrapper
+
+
+class Export(Sql):
+    """流式导出，用游标分批读取，逐批编码为CSV或NDJSON写入`StreamingResponse`，内存占用与总行数无关
+
+    - 游标由方言实现，sqlite: `fetchmany`；postgresql: 事务中的服务端游标；mysql: 不缓冲的`SSDictCursor`
+    - 每批发送完成后才读取下一批，客户端读得慢时数据库读取也会等待；客户端断开时关闭游标并归还连接
+    - 被装饰函数的返回值为`StreamingResponse`，可以直接作为endpoint的返回值
+
+    >>> Example
+    ```python
+    @Export('select * from {user} where age > {age}', format='csv', filename='users.csv').fill(user=User.Meta.table)
+    async def export_users(age: int) -> StreamingResponse: ...
+
+    @Get('/export')
+    async def export(self, age: int):
+        return await export_users(age)
+
+    # 不经过http，分批处理
+    async for rows in Export('select * from {user}').fill(user=User.Meta.table).stream():
+        ...
+    ```
+    """
+
+    MEDIA_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+
+    def __init__(
+        self,
+        sql: str,
+        connection_name: str = 'default',
+        *,
+        format: Literal['csv', 'ndjson'] = 'ndjson',
+        chunk_size: int = 1000,
+        filename: str | None = None,
+    ):
+        """
+
+        Args:
+            sql (str): 原始sql语句，同`Sql`
+            connection_name (str, optional): 连接名. Defaults to 'default'.
+            format (Literal['csv', 'ndjson'], optional): 导出格式. Defaults to 'ndjson'.
+            chunk_size (int, optional): 每批读取的行数. Defaults to 1000.
+            filename (str | None, optional): 下载的文件名，设置后添加`Content-Disposition`响应头. Defaults to None.
+        """
+        super().__init__(sql, connection_name)
+        assert format in self.MEDIA_TYPES, f'不支持的导出格式 "{format}"'
+        assert chunk_size > 0, 'chunk_size必须大于0'
+        self.format = format
+        self.chunk_size = chunk_size
+        self.filename = filename
+
+    async def _cursor(self, sql: str, params: list[Any]) -> AsyncIterator[list[Any]]:
+        """分批读取驱动原始的行数据"""
+        # 响应体在请求结束后才读取，不使用请求内固定的连接
+        conn = Tortoise.get_connection(self.connection_name)
+        if query_plan_recorder.enabled:
+            await query_plan_recorder.capture(
+                self.name, conn, self.connection_name, sql, params
+            )
+        counter = query_counter_var.get()
+        start = perf_counter()
+        dialect = dialect_registry.of(conn)
+        try:
+            async with conn.acquire_connection() as connection:
+                # 提前结束时立即关闭游标，再归还连接
+                async with aclosing(
+                    dialect.cursor(connection, sql, params, self.chunk_size)
+                ) as chunks:
+                    async for rows in chunks:
+                        yield rows
+        finally:
+            if counter is not None:
+                counter.record(sql, perf_counter() - start)
+
+    def stream(self, **calling_params: Any) -> AsyncIterator[list[Row]]:
+        """分批返回行
+
+        Args:
+            **calling_params (Any): 插值表达式求值时用到的变量
+        """
+        return self._stream(calling_params)
+
+    async def _stream(self, calling_params: dict[str, Any]) -> AsyncIterator[list[Row]]:
+        """同`stream`，参数为dict，被装饰的方法的参数中有`self`"""
+        self._format()
+        params = [eval(param[1:-1], calling_params) for param in self.matched_params]
+        async with aclosing(self._cursor(self.sql, params)) as chunks:
+            async for chunk in chunks:
+                yield self._to_rows(chunk)
+
+    async def _encode(self, chunks: AsyncIterator[list[Row]]) -> AsyncIterator[bytes]:
+        header = self.format == 'csv'
+        async for rows in chunks:
+            if not rows:
+                continue
+            keys = rows[0].keys()
+            if self.format == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                if header:
+                    writer.writerow(keys)
+                    header = False
+                writer.writerows(row.values() for row in rows)
+                yield buffer.getvalue().encode()
+            else:
+                yield ''.join(
+                    json.dumps(
+                        dict(zip(keys, row.values())), default=str, ensure_ascii=False
+                    )
+                    + '\n'
+                    for row in rows
+                ).encode()
+
+    def _response(self, calling_params: dict[str, Any]) -> StreamingResponse:
+        headers = (
+            {'Content-Disposition': f'attachment; filename="{self.filename}"'}
+            if self.filename
+            else None
+        )
+        return StreamingResponse(
+            self._encode(self._stream(calling_params)),
+            media_type=self.MEDIA_TYPES[self.format],
+            headers=headers,
+        )
+
+    async def execute(self) -> StreamingResponse:  # type: ignore
+        """非装饰器用法时导出"""
+        return self._response({})
+
+    def __call__(  # type: ignore
+        self, func: Callable[P, Coroutine[Any, Any, None | StreamingResponse]]
+    ) -> Callable[P, Coroutine[Any, Any, StreamingResponse]]:
+        """
+
+        Args:
+            func (`Callable[P, Coroutine[Any, Any, None  |  StreamingResponse]]`): 参数用于插值表达式求值
+
+        Returns:
+            `Callable[P, Coroutine[Any, Any, StreamingResponse]]`
+        """
+        self._bind(func)
+
+        @wraps(func)
+        async def wrapper(*args: P.args, **kwds: P.kwargs) -> StreamingResponse:
+            return self._response(get_func_params_dict(func, *args, **kwds))
+
+        return wrapper
@@ -0,0 +1,127 @@
+from collections.abc import AsyncIterator
+from importlib import import_module
+from typing import Any
+
+from tortoise import BaseDBAsyncClient
+
+from .model import UnsupportedDialectException
+
+
+class Dialect:
+    """数据库方言，驱动相关的差异都放在这里，子类按需覆盖"""
+
+    # 与tortoise的`client.capabilities.dialect`一致
+    name: str = ''
+    # 占位符
+    placeholder: str = '%s'
+    # 占位符是否带序号，如postgresql的$1、$2
+    numbered_placeholder: bool = False
+    # 标识符的引号
+    quote_char: str = '"'
+    # 单条语句的参数个数上限
+    max_params: int = 999
+    # insert、update、delete语句后追加，驱动不返回影响行数时用
+    returning: str = ''
+    # 是否实现了`execute`，可以在请求内固定连接
+    pinnable: bool = False
+
+    def quote(self, name: str) -> str:
+        return f'{self.quote_char}{name}{self.quote_char}'
+
+    def compile(self, parts: list[str]) -> str:
+        """用占位符连接插值表达式分隔出的sql片段"""
+        if not self.numbered_placeholder:
+            return self.placeholder.join(parts)
+        return ''.join(
+            part if i == 0 else f'{self.placeholder}{i}{part}'
+            for i, part in enumerate(parts)
+        )
+
+    def timeout_sql(self, sql: str, timeout: float) -> str:
+        """设置了超时的sql，可以加上服务端的超时提示"""
+        return sql
+
+    async def interrupt(self, conn: BaseDBAsyncClient):
+        """超时后中断正在执行的语句"""
+
+    def is_timeout_error(self, e: Exception) -> bool:
+        """是否为服务端的超时错误"""
+        return False
+
+    async def execute(self, connection: Any, sql: str, params: list[Any]) -> tuple[int, list]:
+        """在驱动连接上执行sql，返回值与`client.execute_query`相同，用于请求内固定连接
+
+        Args:
+            connection (Any): `acquire_connection`得到的驱动连接
+
+        Raises:
+            UnsupportedDialectException: 方言未实现
+        """
+        raise UnsupportedDialectException(f'数据库 "{self.name}" 不支持在驱动连接上执行sql')
+
+    def cursor(
+        self, connection: Any, sql: str, params: list[Any], chunk_size: int
+    ) -> AsyncIterator[list[Any]]:
+        """用游标分批读取驱动原始的行数据，子类实现为异步生成器
+
+        Args:
+            connection (Any): `acquire_connection`得到的驱动连接
+
+        Raises:
+            UnsupportedDialectException: 方言未实现
+        """
+        raise UnsupportedDialectException(f'数据库 "{self.name}" 不支持游标读取')
+
+
+class DialectRegistry:
+    """方言注册表，连接第一次出现时才导入对应的方言模块
+
+    >>> Example
+    ```python
+    from fastapi_boot.tortoise_utils import dialect_registry
+
+    dialect_registry.register('mssql', 'my_project.dialect:MSSQLDialect')
+    ```
+    """
+
+    def __init__(self):
+        # {方言名: "模块:类名" | Dialect子类}
+        self.targets: dict[str, str | type[Dialect]] = {}
+        # {方言名: 实例}
+        self.dialects: dict[str, Dialect] = {}
+
+    def register(self, name: str, target: str | type[Dialect]):
+        """注册方言
+
+        Args:
+            name (str): 方言名，与`client.capabilities.dialect`一致
+            target (str | type[Dialect]): `"模块:类名"`，第一次用到时导入；或者Dialect子类
+        """
+        self.targets[name] = target
+        self.dialects.pop(name, None)
+
+    def get(self, name: str) -> Dialect:
+        dialect = self.dialects.get(name)
+        if dialect is None:
+            target = self.targets.get(name)
+            if target is None:
+                # 未注册的数据库，用通用的%s占位符
+                dialect = Dialect()
+                dialect.name = name
+            else:
+                if isinstance(target, str):
+                    module, _, attr = target.partition(':')
+                    target = getattr(import_module(module), attr)
+                dialect = target()
+            self.dialects[name] = dialect
+        return dialect
+
+    def of(self, conn: BaseDBAsyncClient) -> Dialect:
+        """连接的方言"""
+        return self.get(conn.capabilities.dialect)
+
+
+dialect_registry = DialectRegistry()
+dialect_registry.register('sqlite', 'fastapi_boot.tortoise_utils.dialects.sqlite:SqliteDialect')
+dialect_registry.register('mysql', 'fastapi_boot.tortoise_utils.dialects.mysql:MySQLDialect')
+dialect_registry.register('postgres', 'fastapi_boot.tortoise_utils.dialects.postgres:PostgresDialect')
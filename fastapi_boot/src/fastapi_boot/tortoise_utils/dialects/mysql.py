@@ -0,0 +1,101 @@
+import re
+from collections.abc import AsyncIterator
+from importlib import import_module
+from inspect import isawaitable
+from typing import Any
+
+from tortoise.exceptions import IntegrityError, OperationalError
+
+from ..dialect import Dialect
+
+
+class MySQLDialect(Dialect):
+    name = 'mysql'
+    quote_char = '`'
+    max_params = 65535
+    pinnable = True
+
+    def __init__(self):
+        # 加了MAX_EXECUTION_TIME提示的sql，{(sql, 毫秒): sql}
+        self.timeout_sqls: dict[tuple[str, int], str] = {}
+
+    def timeout_sql(self, sql: str, timeout: float) -> str:
+        """select语句加上MAX_EXECUTION_TIME提示，由服务端中止超时查询"""
+        ms = max(int(timeout * 1000), 1)
+        if (sql, ms) not in self.timeout_sqls:
+            self.timeout_sqls[sql, ms] = re.sub(
+                r'^select\b',
+                lambda m: f'{m.group(0)} /*+ MAX_EXECUTION_TIME({ms}) */',
+                sql,
+                count=1,
+                flags=re.I,
+            )
+        return self.timeout_sqls[sql, ms]
+
+    def is_timeout_error(self, e: Exception) -> bool:
+        # 3024, maximum statement execution time exceeded
+        return (
+            isinstance(e, OperationalError)
+            and bool(e.args)
+            and getattr(e.args[0], 'args', (None,))[0] == 3024
+        )
+
+    async def execute(self, connection: Any, sql: str, params: list[Any]) -> tuple[int, list]:
+        # 与tortoise使用同一个驱动(asyncmy或aiomysql)的异常类型
+        from tortoise.backends.mysql.client import errors
+
+        try:
+            async with connection.cursor() as cursor:
+                await cursor.execute(sql, params)
+                rows = await cursor.fetchall()
+                if not rows:
+                    return cursor.rowcount, []
+                fields = [i[0] for i in cursor.description]
+                return cursor.rowcount, [dict(zip(fields, row)) for row in rows]
+        except errors.IntegrityError as e:
+            raise IntegrityError(e) from e
+        except (
+            errors.OperationalError,
+            errors.ProgrammingError,
+            errors.DataError,
+            errors.InternalError,
+            errors.NotSupportedError,
+        ) as e:
+            raise OperationalError(e) from e
+
+    def unbuffered_cursor_class(self) -> Any:
+        """tortoise使用的驱动(asyncmy或aiomysql)的不缓冲字典游标，没有时为None"""
+        # 与tortoise使用同一个驱动
+        from tortoise.backends.mysql.client import mysql
+
+        try:
+            return import_module(f'{mysql.__name__}.cursors').SSDictCursor
+        except (ImportError, AttributeError):
+            return None
+
+    async def cursor(
+        self, connection: Any, sql: str, params: list[Any], chunk_size: int
+    ) -> AsyncIterator[list[Any]]:
+        cursor_class = self.unbuffered_cursor_class()
+        if cursor_class is None:
+            # 驱动没有不缓冲的游标，整个结果集读到内存后分批返回
+            _, rows = await self.execute(connection, sql, params)
+            for i in range(0, len(rows), chunk_size):
+                yield rows[i : i + chunk_size]
+            return
+        finished = False
+        # aiomysql的cursor()需要await，asyncmy直接返回游标
+        cursor = connection.cursor(cursor_class)
+        if isawaitable(cursor):
+            cursor = await cursor
+        try:
+            await cursor.execute(sql, params)
+            while rows := await cursor.fetchmany(chunk_size):
+                yield rows
+            finished = True
+        finally:
+            if finished:
+                await cursor.close()
+            else:
+                # 关闭不缓冲的游标会读完剩余的行，中途断开时直接关闭连接
+                connection.close()
@@ -0,0 +1,47 @@
+from collections.abc import AsyncIterator
+from typing import Any
+
+from tortoise.exceptions import IntegrityError, OperationalError
+
+from ..dialect import Dialect
+
+
+class PostgresDialect(Dialect):
+    name = 'postgres'
+    placeholder = '$'
+    numbered_placeholder = True
+    max_params = 32767
+    # asyncpg的insert、update、delete不返回影响行数
+    returning = ' returning 1'
+    pinnable = True
+
+    async def execute(self, connection: Any, sql: str, params: list[Any]) -> tuple[int, list]:
+        import asyncpg
+
+        try:
+            if sql.startswith(('UPDATE', 'DELETE')):
+                res = await connection.execute(sql, *params)
+                try:
+                    return int(res.split(' ')[1]), []
+                except (IndexError, ValueError):
+                    return 0, []
+            rows = await connection.fetch(sql, *params)
+            return len(rows), rows
+        except (asyncpg.SyntaxOrAccessError, asyncpg.exceptions.DataError) as e:
+            raise OperationalError(e) from e
+        except asyncpg.IntegrityConstraintViolationError as e:
+            raise IntegrityError(e) from e
+
+    async def cursor(
+        self, connection: Any, sql: str, params: list[Any], chunk_size: int
+    ) -> AsyncIterator[list[Any]]:
+        # asyncpg的游标需要在事务中
+        async with connection.transaction():
+            chunk = []
+            async for record in connection.cursor(sql, *params, prefetch=chunk_size):
+                chunk.append(record)
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
@@ -0,0 +1,24 @@
+from collections.abc import AsyncIterator
+from typing import Any
+
+from tortoise import BaseDBAsyncClient
+
+from ..dialect import Dialect
+
+
+class SqliteDialect(Dialect):
+    name = 'sqlite'
+    placeholder = '?'
+    max_params = 32766
+
+    async def interrupt(self, conn: BaseDBAsyncClient):
+        # 超时后继续执行的语句会一直占着唯一的连接
+        if connection := getattr(conn, '_connection', None):
+            await connection.interrupt()
+
+    async def cursor(
+        self, connection: Any, sql: str, params: list[Any], chunk_size: int
+    ) -> AsyncIterator[list[Any]]:
+        async with connection.execute(sql, params) as cursor:
+            while rows := await cursor.fetchmany(chunk_size):
+                yield rows
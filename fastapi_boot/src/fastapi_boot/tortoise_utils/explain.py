@@ -0,0 +1,184 @@
+import json
+import os
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any
+from warnings import warn
+
+from tortoise import BaseDBAsyncClient
+
+# 需要查看执行计划的语句
+EXPLAINABLE = re.compile(r'^\s*(select|with|update|delete)\b', flags=re.I)
+# sqlite: SCAN user、SCAN user USING INDEX idx_name
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+SQLITE_SEARCH = re.compile(r'^(?:SCAN|SEARCH) (?:TABLE )?(\w+)')
+SQLITE_TEMP_B_TREE = re.compile(r'^USE TEMP B-TREE FOR (.+)$')
+
+
+@dataclass
+class QueryPlan:
+    # 被装饰的函数，非装饰器用法时为None
+    name: str | None
+    connection_name: str
+    sql: str
+    # 执行计划的每一行
+    plan: list[str] = field(default_factory=list)
+    # 全表扫描、临时B树排序等
+    warnings: list[str] = field(default_factory=list)
+    # 执行EXPLAIN出错时的错误信息
+    error: str | None = None
+
+
+@dataclass
+class QueryPlanRecorder:
+    """开发/CI中记录sql的执行计划，每条编译后的sql只EXPLAIN一次，生产环境不开启没有任何开销
+
+    - 环境变量`FASTAPI_BOOT_QUERY_PLAN=1`或调用`enable`开启
+    - 表的行数不少于`min_rows`时，全表扫描和临时B树排序记为警告
+
+    >>> Example
+    ```python
+    from fastapi_boot.tortoise_utils import query_plan_recorder
+
+    query_plan_recorder.enable(min_rows=1000)
+    ...
+    print(query_plan_recorder.report())
+    ```
+    """
+
+    enabled: bool = False
+    min_rows: int = 1000
+    # {(连接名, sql): plan}
+    plans: dict[tuple[str, str], QueryPlan] = field(default_factory=dict)
+    # {(连接名, 表名): 行数}
+    table_rows: dict[tuple[str, str], int | None] = field(default_factory=dict)
+
+    def enable(self, min_rows: int | None = None):
+        self.enabled = True
+        if min_rows is not None:
+            self.min_rows = min_rows
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        self.plans.clear()
+        self.table_rows.clear()
+
+    async def capture(
+        self,
+        name: str | None,
+        conn: BaseDBAsyncClient,
+        connection_name: str,
+        sql: str,
+        params: list[Any],
+    ):
+        """首次执行时EXPLAIN，出错不影响sql本身的执行"""
+        if (connection_name, sql) in self.plans or not EXPLAINABLE.match(sql):
+            return
+        plan = self.plans[connection_name, sql] = QueryPlan(name, connection_name, sql)
+        try:
+            dialect = conn.capabilities.dialect
+            if dialect == 'sqlite':
+                await self._explain_sqlite(plan, conn, params)
+            elif dialect == 'mysql':
+                await self._explain_mysql(plan, conn, params)
+            elif dialect == 'postgres':
+                await self._explain_postgres(plan, conn, params)
+        except Exception as e:
+            plan.error = repr(e)
+            return
+        for w in plan.warnings:
+            warn(f'{name or sql}: {w}')
+
+    async def _count(self, conn: BaseDBAsyncClient, connection_name: str, table: str):
+        """sqlite没有行数估计，查一次表的行数并缓存"""
+        if (connection_name, table) not in self.table_rows:
+            try:
+                _, rows = await conn.execute_query(f'select count(*) from "{table}"')
+                self.table_rows[connection_name, table] = rows[0][0]
+            except Exception:
+                # CTE、子查询等
+                self.table_rows[connection_name, table] = None
+        return self.table_rows[connection_name, table]
+
+    async def _explain_sqlite(self, plan: QueryPlan, conn: BaseDBAsyncClient, params: list[Any]):
+        _, rows = await conn.execute_query(f'explain query plan {plan.sql}', params)
+        large_tables = []
+        temp_b_trees = []
+        for row in rows:
+            detail: str = row['detail']
+            plan.plan.append(detail)
+            if m := SQLITE_SEARCH.match(detail):
+                cnt = await self._count(conn, plan.connection_name, m.group(1))
+                if cnt is not None and cnt >= self.min_rows:
+                    large_tables.append(m.group(1))
+                    if SQLITE_SCAN.match(detail):
+                        plan.warnings.append(f'全表扫描 {m.group(1)}({cnt}行)')
+            elif m := SQLITE_TEMP_B_TREE.match(detail):
+                temp_b_trees.append(m.group(1))
+        if large_tables:
+            plan.warnings.extend(
+                f'临时B树排序 {i}({", ".join(large_tables)})' for i in temp_b_trees
+            )
+
+    async def _explain_mysql(self, plan: QueryPlan, conn: BaseDBAsyncClient, params: list[Any]):
+        _, rows = await conn.execute_query(f'explain {plan.sql}', params)
+        for row in rows:
+            plan.plan.append(json.dumps(row, default=str, ensure_ascii=False))
+            if (row.get('rows') or 0) < self.min_rows:
+                continue
+            if row.get('type') == 'ALL':
+                plan.warnings.append(f'全表扫描 {row.get("table")}({row.get("rows")}行)')
+            extra = row.get('Extra') or ''
+            if 'Using filesort' in extra or 'Using temporary' in extra:
+                plan.warnings.append(f'临时表/文件排序 {row.get("table")}: {extra}')
+
+    async def _explain_postgres(self, plan: QueryPlan, conn: BaseDBAsyncClient, params: list[Any]):
+        _, rows = await conn.execute_query(f'explain (format json) {plan.sql}', params)
+        root = rows[0][0]
+        root = json.loads(root) if isinstance(root, str) else root
+
+        def walk(node: dict[str, Any], depth: int):
+            node_type = node.get('Node Type', '')
+            relation = node.get('Relation Name')
+            plan.plan.append(
+                '  ' * depth + node_type + (f' on {relation}' if relation else '')
+            )
+            if node.get('Plan Rows', 0) >= self.min_rows:
+                if node_type == 'Seq Scan':
+                    plan.warnings.append(f'全表扫描 {relation}(约{node["Plan Rows"]}行)')
+                elif node_type == 'Sort':
+                    plan.warnings.append(f'排序 {node.get("Sort Key")}(约{node["Plan Rows"]}行)')
+            for child in node.get('Plans', []):
+                walk(child, depth + 1)
+
+        walk(root[0]['Plan'], 0)
+
+    def report(self, only_warnings: bool = False) -> str:
+        """按被装饰的函数分组的报告
+
+        Args:
+            only_warnings (bool, optional): 只包含有警告的语句. Defaults to False.
+        """
+        groups: defaultdict[str, list[QueryPlan]] = defaultdict(list)
+        for plan in self.plans.values():
+            if only_warnings and not plan.warnings:
+                continue
+            groups[plan.name or '<execute>'].append(plan)
+        lines = []
+        for name in sorted(groups):
+            lines.append(f'# {name}')
+            for plan in groups[name]:
+                lines.append(f'  [{plan.connection_name}] {plan.sql}')
+                lines.extend(f'    | {i}' for i in plan.plan)
+                lines.extend(f'    ! {i}' for i in plan.warnings)
+                if plan.error:
+                    lines.append(f'    x {plan.error}')
+        return '\n'.join(lines)
+
+
+query_plan_recorder = QueryPlanRecorder(
+    enabled=os.environ.get('FASTAPI_BOOT_QUERY_PLAN', '') not in ('', '0', 'false')
+)
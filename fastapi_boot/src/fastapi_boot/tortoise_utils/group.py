@@ -0,0 +1,82 @@
+import asyncio
+from collections.abc import Awaitable, Coroutine
+from contextvars import copy_context
+from typing import Any, Self, TypeVar
+
+from .connection import pinned_connections_var
+from .const import query_limiter_var
+
+T = TypeVar('T')
+
+
+class QueryGroup:
+    """并发执行互不依赖的查询，耗时从 sum(query) 变为 max(query)
+
+    1. 用信号量限制同时执行的sql数，防止一个请求占满连接池；信号量放在上下文中，嵌套的QueryGroup(如查询中再`Sql.gather`)共用最外层的限制
+    2. 查询不使用请求内固定的连接(`pin_connection`)，各自从连接池获取，否则会在固定的连接上排队执行
+    3. 基于`asyncio.TaskGroup`，请求被取消(如客户端断开)或任一查询出错时，其余查询都会被取消
+
+    >>> Example
+    ```python
+    from fastapi_boot.tortoise_utils import QueryGroup, Sql
+
+    async with QueryGroup(limit=3) as group:
+        users = group.add(get_all_user())
+        books = group.add(get_all_book())
+    users.result(), books.result()
+
+    # 或者
+    users, books = await Sql.gather(get_all_user(), get_all_book(), limit=3)
+    ```
+    """
+
+    # 默认的最大并发数
+    default_limit: int = 4
+
+    def __init__(self, limit: int | None = None):
+        """
+
+        Args:
+            limit (int | None, optional): 同时执行的sql的最大数量，嵌套时使用外层的限制. Defaults to `QueryGroup.default_limit`.
+        """
+        self.limit = limit or self.default_limit
+        assert self.limit > 0, 'limit必须大于0'
+        self.limiter: asyncio.Semaphore | None = None
+        self.task_group: asyncio.TaskGroup | None = None
+
+    async def __aenter__(self) -> Self:
+        self.limiter = query_limiter_var.get() or asyncio.Semaphore(self.limit)
+        self.task_group = asyncio.TaskGroup()
+        await self.task_group.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info: Any):
+        try:
+            return await self.task_group.__aexit__(*exc_info)  # type: ignore
+        finally:
+            self.task_group = None
+
+    async def _run(self, aw: Awaitable[T]) -> T:
+        return await aw
+
+    def _init_context(self):
+        query_limiter_var.set(self.limiter)
+        pinned_connections_var.set(None)
+
+    def add(self, aw: Awaitable[T]) -> asyncio.Task[T]:
+        """添加一个查询，需在`async with`中调用
+
+        Args:
+            aw (Awaitable[T]): 查询，如被`Select`装饰的函数的调用结果
+        """
+        assert self.task_group is not None, 'QueryGroup.add需要在async with中调用'
+        coro: Coroutine[Any, Any, T] = self._run(aw)
+        context = copy_context()
+        context.run(self._init_context)
+        return self.task_group.create_task(coro, context=context)
+
+    async def gather(self, *aws: Awaitable[Any]) -> list[Any]:
+        """并发执行并按传入顺序返回结果"""
+        async with self:
+            tasks = [self.add(aw) for aw in aws]
+        return [task.result() for task in tasks]
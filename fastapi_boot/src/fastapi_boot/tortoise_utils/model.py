@@ -0,0 +1,286 @@
+from array import array
+import base64
+import binascii
+import json
+import struct
+import sys
+from collections.abc import Iterator, Mapping, Sequence
+from dataclasses import dataclass
+from types import NoneType, UnionType
+from typing import Any, Generic, TypeVar, Union, get_args, get_origin
+
+from fastapi import Response
+from pydantic import BaseModel
+from tortoise import Model
+
+T = TypeVar('T')
+
+
+# ------------------------------------------------------- row -------------------------------------------------------- #
+class Row(Mapping[str, Any]):
+    """轻量的行对象，由元组存储值，支持`row.name`、`row['name']`、`row[0]`
+
+    - 每条语句按列名只创建一次子类(`Row.make`)，列名和下标映射在子类上共享
+    - 实现了`Mapping`，可以`dict(row)`、`Model(**row)`，FastAPI会把它序列化为对象
+    - 列名与方法同名(`keys`、`values`、`items`、`get`、`make`)或以下划线开头时，`row.name`取到的是方法或内部属性，
+      需用`row['name']`读取；`dict(row)`、`Model(**row)`不受影响
+    """
+
+    __slots__ = ('_values',)
+    _fields: tuple[str, ...] = ()
+    _index: dict[str, int] = {}
+
+    def __init__(self, values: tuple[Any, ...]):
+        self._values = values
+
+    @classmethod
+    def make(cls, fields: tuple[str, ...]) -> type['Row']:
+        """根据列名创建Row子类"""
+        return type(
+            cls.__name__,
+            (cls,),
+            {
+                '__slots__': (),
+                '_fields': fields,
+                '_index': {name: i for i, name in enumerate(fields)},
+            },
+        )
+
+    def __getitem__(self, key: str | int) -> Any:
+        if key.__class__ is int:
+            return self._values[key]  # type: ignore
+        return self._values[self._index[key]]  # type: ignore
+
+    def __getattr__(self, name: str) -> Any:
+        index = self._index.get(name)
+        if index is None:
+            raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
+        return self._values[index]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def keys(self):  # type: ignore
+        return self._fields
+
+    def values(self):  # type: ignore
+        return self._values
+
+    def __repr__(self) -> str:
+        items = ', '.join(f'{k}={v!r}' for k, v in zip(self._fields, self._values))
+        return f'{self.__class__.__name__}({items})'
+
+
+# ------------------------------------------------------- page ------------------------------------------------------- #
+class Page(BaseModel, Generic[T]):
+    """keyset分页结果
+
+    - items: 当前页数据
+    - next_cursor: 下一页游标，没有下一页时为`None`
+    - has_next: 是否还有下一页
+    """
+
+    items: list[T]
+    next_cursor: str | None = None
+    has_next: bool = False
+
+
+@dataclass
+class PageOption:
+    """Select.paginate的配置"""
+
+    keys: list[str]
+    limit: int = 20
+    desc: bool = False
+    cursor: str | None = None
+
+
+def encode_cursor(values: list[Any]) -> str:
+    """把排序键的值编码为不透明游标"""
+    raw = json.dumps(values, default=str, separators=(',', ':'), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> list[Any]:
+    """解码游标，返回排序键的值
+
+    Args:
+        cursor (str): 游标
+        size (int): 排序键个数
+
+    Raises:
+        InvalidCursorException: 游标格式错误或与排序键个数不一致
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidCursorException(f'无效的游标 "{cursor}"') from e
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorException(f'无效的游标 "{cursor}"')
+    return values
+
+
+# ----------------------------------------------------- columns ---------------------------------------------------- #
+# python类型 => array.array的typecode
+ARRAY_TYPECODES: dict[type, str] = {bool: 'b', int: 'q', float: 'd'}
+# typecode => numpy dtype
+NUMPY_DTYPES: dict[str, str] = {'b': '?', 'q': 'i8', 'd': 'f8'}
+
+
+def _get_column_types(model: type[BaseModel] | type[Model]) -> dict[str, type | None]:
+    """{列名: python类型}，不是基础类型的为None"""
+    if issubclass(model, Model):
+        return {
+            model._meta.fields_db_projection[name]: field.field_type
+            for name, field in model._meta.fields_map.items()
+            if name in model._meta.fields_db_projection
+        }
+    res: dict[str, type | None] = {}
+    for name, field in model.model_fields.items():
+        tp = field.annotation
+        # int | None => int
+        if get_origin(tp) in (Union, UnionType):
+            args = [i for i in get_args(tp) if i is not NoneType]
+            tp = args[0] if len(args) == 1 else None
+        res[field.alias or name] = tp if isinstance(tp, type) else None
+    return res
+
+
+class Columns(Generic[T]):
+    """列式结果，每列一个数组，不创建逐行的dict或模型
+
+    - `bool`、`int`、`float`列为`array.array`，含`None`或其他类型的列为`list`
+    - 列名、列类型取自`T`的字段，`T`为`BaseModel`或`Model`
+
+    >>> Example
+    ```python
+    @Select('select id, age from {user}').fill(user=User.Meta.table)
+    async def get_ages() -> Columns[UserAgeVO]: ...
+
+    cols = await get_ages()
+    cols['age']  # array('q', [20, 21, 22])
+
+    @Get('/ages')
+    async def ages(self):
+        return (await get_ages()).to_response()
+    ```
+    """
+
+    __slots__ = ('data', 'length')
+
+    # 二进制格式的媒体类型
+    BINARY_MEDIA_TYPE = 'application/x-fastapi-boot-columns'
+
+    def __init__(self, data: dict[str, array | list], length: int):
+        self.data = data
+        self.length = length
+
+    @classmethod
+    def from_rows(cls, model: type[BaseModel] | type[Model], rows: Sequence[Any]):
+        """把驱动返回的行转为列，行需支持`row[列名]`"""
+        types = _get_column_types(model)
+        if rows:
+            # 只保留结果集中存在的列
+            keys = set(rows[0].keys())
+            types = {k: v for k, v in types.items() if k in keys}
+        data: dict[str, array | list] = {}
+        for name, tp in types.items():
+            values = [row[name] for row in rows]
+            typecode = ARRAY_TYPECODES.get(tp) if tp else None
+            if typecode is not None:
+                try:
+                    data[name] = array(typecode, values)
+                    continue
+                except (TypeError, OverflowError):
+                    # 含None或超出int64范围的整数
+                    pass
+            data[name] = values
+        return cls(data, len(rows))
+
+    @property
+    def names(self) -> list[str]:
+        return list(self.data)
+
+    def __getitem__(self, name: str) -> array | list:
+        return self.data[name]
+
+    def __len__(self):
+        return self.length
+
+    def to_json(self) -> bytes:
+        """`{"列名": [值, ...], ...}`"""
+        return json.dumps(
+            {k: v.tolist() if isinstance(v, array) else v for k, v in self.data.items()},
+            separators=(',', ':'),
+            ensure_ascii=False,
+            default=str,
+        ).encode()
+
+    def to_bytes(self) -> bytes:
+        """二进制格式：`4字节小端头长度` + `json头` + 各列数据
+
+        - 头：`{"length": 行数, "columns": [[列名, typecode, 字节数], ...]}`
+        - `array`列为小端原始字节，`list`列的typecode为`"json"`，数据为utf-8编码的json数组
+        """
+        columns = []
+        chunks = []
+        for name, values in self.data.items():
+            if isinstance(values, array):
+                if sys.byteorder == 'big':
+                    values = array(values.typecode, values)
+                    values.byteswap()
+                chunk, typecode = values.tobytes(), values.typecode
+            else:
+                chunk = json.dumps(
+                    values, separators=(',', ':'), ensure_ascii=False, default=str
+                ).encode()
+                typecode = 'json'
+            columns.append([name, typecode, len(chunk)])
+            chunks.append(chunk)
+        header = json.dumps(
+            {'length': self.length, 'columns': columns}, separators=(',', ':')
+        ).encode()
+        return b''.join([struct.pack('<I', len(header)), header, *chunks])
+
+    def to_response(self, binary: bool = False, **kwds) -> Response:
+        """直接序列化为响应，跳过FastAPI的`jsonable_encoder`
+
+        Args:
+            binary (bool, optional): 是否用`to_bytes`的二进制格式. Defaults to False.
+            **kwds: 传给`Response`的其他参数
+        """
+        if binary:
+            return Response(self.to_bytes(), media_type=self.BINARY_MEDIA_TYPE, **kwds)
+        return Response(self.to_json(), media_type='application/json', **kwds)
+
+    def to_numpy(self) -> dict[str, Any]:
+        """转为`{列名: numpy数组}`，`array`列零拷贝，需安装numpy"""
+        try:
+            import numpy as np
+        except ImportError as e:
+            raise ImportError('Columns.to_numpy需要安装numpy: pip install numpy') from e
+        return {
+            k: (
+                np.frombuffer(v, dtype=NUMPY_DTYPES[v.typecode])
+                if isinstance(v, array)
+                else np.array(v, dtype=object)
+            )
+            for k, v in self.data.items()
+        }
+
+
+# ----------------------------------------------------- exception ---------------------------------------------------- #
+class InvalidCursorException(Exception):
+    """invalid page cursor"""
+
+
+class SqlTimeoutException(TimeoutError):
+    """sql execution timeout"""
+
+
+class UnsupportedDialectException(Exception):
+    """operation not supported by the database dialect"""
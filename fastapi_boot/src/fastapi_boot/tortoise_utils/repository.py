@@ -0,0 +1,350 @@
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from inspect import isclass
+from typing import Any, ClassVar, Generic, TypeVar, cast, get_args, get_origin
+
+from pydantic import BaseModel
+from tortoise import Model, Tortoise
+
+from fastapi_boot.core import Injectable
+
+from .decorator import Select, Sql, Upsert, record2dict
+from .dialect import Dialect, dialect_registry
+from .model import Page
+
+TM = TypeVar('TM', bound=Model)
+VO = TypeVar('VO')
+
+Record = BaseModel | Model | dict[str, Any]
+
+
+@dataclass
+class RepositoryMeta:
+    """由Model元数据得到的字段映射，每个Repository只计算一次"""
+
+    table: str
+    # 主键的列名、字段名
+    pk_column: str
+    pk_field: str
+    # {字段名: 列名}
+    columns: dict[str, str]
+    # 查询的列，[(列名, 结果中的键)]
+    select: list[tuple[str, str]]
+    # 可插入的字段名(不含自增主键)
+    insert: list[str]
+    # 分页的排序键，即主键在结果中的键
+    page_key: str
+    # 分页查询的列，VO中没有主键时也查询主键作为排序键
+    page_select: list[tuple[str, str]]
+
+
+class Repository(Generic[TM, VO]):
+    """通用Repository，定义子类时自动注册为`Injectable`
+
+    - CRUD、批量CRUD、分页语句由Model的元数据生成，按数据库方言只编译一次
+    - `VO`为`BaseModel`时结果转为`VO`，只查询`VO`中有的列；`VO`为Model本身时结果转为Model实例
+    - 语句都经过`Sql`执行，超时、single-flight、固定连接、执行计划、查询计数同样生效
+
+    >>> Example
+    ```python
+    class UserRepository(Repository[User, UserVO]): ...
+
+    # 按名称注册、指定连接名
+    class UserRepository2(Repository[User, User], name='user2', connection_name='other'): ...
+
+    @Injectable
+    @dataclass
+    class UserService:
+        user_repository: UserRepository
+
+        async def get(self, id: int):
+            return await self.user_repository.get_by_id(id)
+    ```
+    """
+
+    model: ClassVar[type[Model]]
+    vo: ClassVar[type[BaseModel] | None] = None
+    connection_name: ClassVar[str] = 'default'
+    batch_size: ClassVar[int] = 500
+    # 缓存的语句数上限，超过时淘汰最久未用的
+    max_statements: ClassVar[int] = 256
+    # {(方言, 语句key): sql}，按最近使用排序
+    _statements: ClassVar[dict[tuple[Any, ...], Sql]]
+    # upsert_many的语句，按列和批大小缓存自己编译的sql
+    _upsert: ClassVar[Upsert | None]
+    _meta: ClassVar[RepositoryMeta | None]
+
+    def __init_subclass__(
+        cls,
+        name: str | None = None,
+        connection_name: str | None = None,
+        abstract: bool = False,
+        **kwds: Any,
+    ):
+        """
+
+        Args:
+            name (str | None, optional): 依赖名. Defaults to None.
+            connection_name (str | None, optional): 连接名. Defaults to 'default'.
+            abstract (bool, optional): 为True时不注册，用于再被继承的基类. Defaults to False.
+        """
+        super().__init_subclass__(**kwds)
+        for base in cls.__dict__.get('__orig_bases__', ()):
+            if get_origin(base) is Repository:
+                model, vo = get_args(base)
+                cls.model = model
+                cls.vo = vo if isclass(vo) and issubclass(vo, BaseModel) else None
+        if connection_name is not None:
+            cls.connection_name = connection_name
+        cls._statements = {}
+        cls._upsert = None
+        cls._meta = None
+        if abstract:
+            return
+        assert isclass(getattr(cls, 'model', None)) and issubclass(
+            cls.model, Model
+        ), f'"{cls.__name__}"需要指定Model，如 Repository[User, UserVO]'
+        if name is None:
+            Injectable(cls)
+        else:
+            Injectable(name)(cls)
+
+    # ------------------------------------------------ statements ------------------------------------------------ #
+    @classmethod
+    def _get_meta(cls) -> RepositoryMeta:
+        """Tortoise初始化后表名等元数据才完整，第一次执行时计算"""
+        if cls._meta is None:
+            meta = cls.model._meta
+            columns = dict(meta.fields_db_projection)
+            if cls.vo is None:
+                select = [(c, c) for c in columns.values()]
+                page_key = meta.db_pk_column
+            else:
+                keys = [f.alias or n for n, f in cls.vo.model_fields.items()]
+                select = [(columns[k], k) for k in keys if k in columns]
+                page_key = meta.pk_attr
+            page_select = select
+            if all(k != page_key for _, k in select):
+                page_select = [*select, (meta.db_pk_column, page_key)]
+            cls._meta = RepositoryMeta(
+                table=meta.db_table,
+                pk_column=meta.db_pk_column,
+                pk_field=meta.pk_attr,
+                columns=columns,
+                select=select,
+                insert=[n for n, c in columns.items() if c not in meta.generated_db_fields],
+                page_key=page_key,
+                page_select=page_select,
+            )
+        return cls._meta
+
+    @classmethod
+    def _dialect(cls) -> Dialect:
+        return dialect_registry.of(Tortoise.get_connection(cls.connection_name))
+
+    @classmethod
+    def _statement(
+        cls,
+        key: tuple[Any, ...],
+        render: Callable[[RepositoryMeta, Callable[[str], str], Dialect], str],
+        factory: Callable[[str], Sql] | None = None,
+    ) -> Sql:
+        """获取编译好的语句
+
+        Args:
+            key (tuple[Any, ...]): 语句key，第一个元素为方法名
+            render (Callable): `render(meta, quote, dialect)`返回用`{}`占位的sql
+            factory (Callable[[str], Sql] | None, optional): 由sql创建语句，`Select`、`Upsert`等. Defaults to `Sql`.
+        """
+        dialect = cls._dialect()
+        statements = cls._statements
+        stmt = statements.pop((dialect.name, *key), None)
+        if stmt is not None:
+            # 移到末尾，最久未用的在最前
+            statements[dialect.name, *key] = stmt
+        else:
+            sql = render(cls._get_meta(), dialect.quote, dialect)
+            if factory is None:
+                stmt = Sql(sql, cls.connection_name)
+                stmt._format()
+            else:
+                stmt = factory(sql)
+            stmt.name = f'{cls.__module__}.{cls.__qualname__}.{key[0]}'
+            statements[dialect.name, *key] = stmt
+            while len(statements) > cls.max_statements:
+                del statements[next(iter(statements))]
+        return stmt
+
+    async def _execute(
+        self,
+        key: tuple[Any, ...],
+        render: Callable[[RepositoryMeta, Callable[[str], str], Dialect], str],
+        params: list[Any],
+    ) -> tuple[int, list]:
+        stmt = self._statement(key, render)
+        return await stmt._execute(stmt.sql, params)
+
+    @staticmethod
+    def _select_sql(
+        meta: RepositoryMeta, quote: Callable[[str], str], select: list[tuple[str, str]] | None = None
+    ) -> str:
+        cols = ', '.join(
+            quote(c) if c == k else f'{quote(c)} as {quote(k)}' for c, k in select or meta.select
+        )
+        return f'select {cols} from {quote(meta.table)}'
+
+    def _batch_size(self, columns: int) -> int:
+        limit = self._dialect().max_params // max(columns, 1)
+        return max(min(self.batch_size, limit), 1)
+
+    @staticmethod
+    def _pad(chunk: list[Any], size: int) -> list[Any]:
+        """`in (...)`的参数个数补齐到2的幂(不超过`size`)，重复最后一个值，每种批大小只编译log2(size)条语句"""
+        padded = min(1 << (len(chunk) - 1).bit_length(), size)
+        return chunk + [chunk[-1]] * (padded - len(chunk))
+
+    # -------------------------------------------------- mapping ------------------------------------------------- #
+    def _to_results(self, rows: Sequence[Any]) -> list[VO]:
+        if self.vo is not None:
+            vo = self.vo
+            return [vo(**row) for row in rows]  # type: ignore
+        model = self.model
+        return [model._init_from_db(**row) for row in rows]  # type: ignore
+
+    def _to_columns(self, record: Record, exclude_unset: bool = False) -> dict[str, Any]:
+        """记录转为{列名: 值}，只保留Model中有的字段"""
+        return record2dict(record, self._get_meta().columns, exclude_unset)
+
+    # --------------------------------------------------- read --------------------------------------------------- #
+    async def get_by_id(self, pk: Any) -> VO | None:
+        _, rows = await self._execute(
+            ('get_by_id',),
+            lambda m, q, _: f'{self._select_sql(m, q)} where {q(m.pk_column)} = {{}}',
+            [pk],
+        )
+        return self._to_results(rows)[0] if rows else None
+
+    async def get_by_ids(self, pks: Sequence[Any]) -> list[VO]:
+        res: list[VO] = []
+        size = self._batch_size(1)
+        for i in range(0, len(pks), size):
+            chunk = self._pad(list(pks[i : i + size]), size)
+            _, rows = await self._execute(
+                ('get_by_ids', len(chunk)),
+                lambda m, q, _: f'{self._select_sql(m, q)} where {q(m.pk_column)} in ({", ".join(["{}"] * len(chunk))})',
+                chunk,
+            )
+            res.extend(self._to_results(rows))
+        return res
+
+    async def get_all(self) -> list[VO]:
+        _, rows = await self._execute(
+            ('get_all',),
+            lambda m, q, _: f'{self._select_sql(m, q)} order by {q(m.pk_column)}',
+            [],
+        )
+        return self._to_results(rows)
+
+    async def get_page(self, cursor: str | None = None, limit: int = 20) -> Page[VO]:
+        """按主键keyset分页，`VO`为Model时items为dict，`VO`中没有主键时也会查询主键作为排序键"""
+        meta = self._get_meta()
+        stmt = self._statement(
+            ('get_page',),
+            lambda m, q, _: self._select_sql(m, q, m.page_select),
+            lambda sql: Select(sql, self.connection_name).paginate(meta.page_key),
+        )
+        anno = Page if self.vo is None else Page[self.vo]  # type: ignore
+        return await cast(Select, stmt)._execute_page(
+            anno, {'cursor': cursor, 'limit': limit}
+        )
+
+    async def count(self) -> int:
+        _, rows = await self._execute(
+            ('count',), lambda m, q, _: f'select count(*) as cnt from {q(m.table)}', []
+        )
+        return rows[0]['cnt']
+
+    # --------------------------------------------------- write -------------------------------------------------- #
+    async def create(self, record: Record) -> int:
+        """插入一条记录，没有值的字段使用数据库默认值"""
+        return await self.create_many([record])
+
+    async def create_many(self, records: Sequence[Record]) -> int:
+        """批量插入，列取自第一条记录"""
+        if not records:
+            return 0
+        meta = self._get_meta()
+        dicts = [self._to_columns(r) for r in records]
+        insert = {meta.columns[n] for n in meta.insert}
+        # 自增主键有值时也插入
+        columns = tuple(
+            c for c, v in dicts[0].items() if c in insert or (c == meta.pk_column and v is not None)
+        )
+        size = self._batch_size(len(columns))
+        total = 0
+        for i in range(0, len(dicts), size):
+            chunk = dicts[i : i + size]
+            values = '(' + ', '.join(['{}'] * len(columns)) + ')'
+            rows, _ = await self._execute(
+                ('create_many', columns, len(chunk)),
+                lambda m, q, d: f'insert into {q(m.table)} ({", ".join(map(q, columns))}) values {", ".join([values] * len(chunk))}{d.returning}',
+                [d.get(c) for d in chunk for c in columns],
+            )
+            total += rows
+        return total
+
+    async def update(self, record: Record) -> int:
+        """按主键更新，`BaseModel`只更新设置了的字段
+
+        Raises:
+            ValueError: 记录没有主键的值
+        """
+        meta = self._get_meta()
+        data = self._to_columns(record, exclude_unset=True)
+        pk = data.pop(meta.pk_column, None)
+        if pk is None:
+            raise ValueError(f'更新"{meta.table}"的记录需要主键"{meta.pk_field}"的值: {record!r}')
+        columns = tuple(data)
+        if not columns:
+            return 0
+        rows, _ = await self._execute(
+            ('update', columns),
+            lambda m, q, d: f'update {q(m.table)} set {", ".join(f"{q(c)} = {{}}" for c in columns)} where {q(m.pk_column)} = {{}}{d.returning}',
+            [*data.values(), pk],
+        )
+        return rows
+
+    async def upsert_many(self, records: Sequence[Record]) -> int:
+        """按主键批量upsert，见`Upsert`"""
+        cls = type(self)
+        if cls._upsert is None:
+            meta = self._get_meta()
+            cls._upsert = Upsert(
+                meta.table,
+                conflict=meta.pk_column,
+                batch_size=self.batch_size,
+                connection_name=self.connection_name,
+            )
+            cls._upsert.name = f'{cls.__module__}.{cls.__qualname__}.upsert_many'
+        return await cls._upsert.execute([self._to_columns(r) for r in records])
+
+    async def delete_by_id(self, pk: Any) -> int:
+        rows, _ = await self._execute(
+            ('delete_by_id',),
+            lambda m, q, d: f'delete from {q(m.table)} where {q(m.pk_column)} = {{}}{d.returning}',
+            [pk],
+        )
+        return rows
+
+    async def delete_by_ids(self, pks: Sequence[Any]) -> int:
+        total = 0
+        size = self._batch_size(1)
+        for i in range(0, len(pks), size):
+            chunk = self._pad(list(pks[i : i + size]), size)
+            rows, _ = await self._execute(
+                ('delete_by_ids', len(chunk)),
+                lambda m, q, d: f'delete from {q(m.table)} where {q(m.pk_column)} in ({", ".join(["{}"] * len(chunk))}){d.returning}',
+                chunk,
+            )
+            total += rows
+        return total
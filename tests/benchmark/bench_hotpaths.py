@@ -0,0 +1,137 @@
+"""框架热点路径的回归基准，结果和baseline.json比较，见conftest.py
+
+cd tests && python -m pytest benchmark/bench_hotpaths.py -o python_files=bench_*.py -s
+"""
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+
+from fastapi_boot.cli.bench import BenchRequest, call_asgi
+from fastapi_boot.core import provide_app
+from fastapi_boot.core.const import PropNameConstant, DepStore
+from fastapi_boot.core.metrics import DEFAULT_BUCKETS, MetricsStore, _instrumented
+from fastapi_boot.core.model import UseMiddlewareRecord
+from fastapi_boot.core.routing import trans_endpoint
+from fastapi_boot.tortoise_utils import Sql
+from tortoise import Tortoise
+
+from src.test_project.app1.modules.tortoise_utils.controller import UserQueryController
+from src.test_project.app1.modules.tortoise_utils.dao import get_all_user
+from src.test_project.app1.modules.tortoise_utils.model import User, UserVO
+
+PREFIX = PropNameConstant.USE_DEP_PARAM_PREFIX_IN_ENDPOINT
+USERS = 20
+
+
+class Service:
+    def get(self, id: int):
+        return id
+
+
+def test_trans_endpoint(bench):
+    instance = Service()
+    use_dep_dict = {'a': (int, None), 'b': (str, None)}
+
+    def endpoint(self, id: int, q: str | None = None):
+        return id
+
+    bench.run('trans_endpoint.build', lambda: trans_endpoint(instance, endpoint, use_dep_dict, []), 2000)
+
+
+@pytest.mark.anyio
+async def test_trans_endpoint_call(bench):
+    instance = Service()
+    use_dep_dict = {'a': (int, None), 'b': (str, None)}
+
+    async def endpoint(self, id: int, q: str | None = None):
+        return id
+
+    new_endpoint = trans_endpoint(instance, endpoint, use_dep_dict, [])
+    kwargs = {f'{PREFIX}_a': 1, f'{PREFIX}_b': 'b'}
+    await bench.arun('trans_endpoint.call', lambda: new_endpoint(1, q='q', **kwargs), 20000)
+
+
+def test_inject_dep(bench):
+    store: DepStore = DepStore()
+    for i in range(100):
+        tp = type(f'Dep{i}', (), {})
+        store.add_dep(tp, None, tp())
+        store.add_dep(tp, 'named', tp())
+    bench.run('inject_dep.type', lambda: store.inject_dep(tp, None), 100000)
+    bench.run('inject_dep.name', lambda: store.inject_dep(tp, 'named'), 100000)
+
+
+@pytest.mark.anyio
+async def test_http_middleware(bench):
+    async def dispatch(request: Request, call_next):
+        return await call_next(request)
+
+    app = FastAPI(openapi_url=None)
+    app.add_api_route('/matched', lambda: PlainTextResponse('ok'))
+    app.add_api_route('/missed', lambda: PlainTextResponse('ok'))
+    record = UseMiddlewareRecord(
+        [('/matched', 'GET')] + [(f'/other{i}', 'GET') for i in range(20)],
+        [dispatch, dispatch],
+    )
+    record.add_http_middleware(app)
+    plain = FastAPI(openapi_url=None)
+    plain.add_api_route('/matched', lambda: PlainTextResponse('ok'))
+
+    for name, target, path in (
+        ('http_middleware.none', plain, '/matched'),
+        ('http_middleware.missed', app, '/missed'),
+        ('http_middleware.matched', app, '/matched'),
+    ):
+        request = BenchRequest('GET', path)
+        await bench.arun(name, lambda: call_asgi(target, request, {}), 2000)
+
+
+@pytest.mark.anyio
+async def test_metrics(bench):
+    """use_metrics包装handler的开销"""
+    response = PlainTextResponse('ok')
+    request = Request({'type': 'http', 'method': 'GET'})
+
+    async def handler(request: Request):
+        return response
+
+    store = MetricsStore()
+    instrumented = _instrumented(
+        handler, {'GET': store.register('Foo', 'bar', 'GET', '/foo/bar', DEFAULT_BUCKETS)}
+    )
+    await bench.arun('metrics.handler', lambda: handler(request), 50000)
+    await bench.arun('metrics.instrumented', lambda: instrumented(request), 50000)
+
+
+async def create_users():
+    await User.bulk_create([User(name=f'user{i}', age=i) for i in range(USERS)])
+
+
+@pytest.mark.anyio
+async def test_sql(bench):
+    await create_users()
+
+    @Sql('select * from user where age >= {age}')
+    async def get_users(age: int) -> list[dict]: ...
+
+    @Sql('select * from user where age >= {dto.age} and name != {name}')
+    async def get_user_models(dto: UserVO, name: str = '') -> list[UserVO]: ...
+
+    conn = Tortoise.get_connection('default')
+    dto = UserVO(id=0, name='', age=0)
+    await bench.arun('sqlite.execute_query', lambda: conn.execute_query('select * from user where age >= ?', [0]))
+    await bench.arun('sql.call.dicts', lambda: get_users(0))
+    await bench.arun('sql.call.models', lambda: get_user_models(dto))
+    await bench.arun('sql.select.models', get_all_user)
+
+
+@pytest.mark.anyio
+async def test_end_to_end(bench):
+    """Controller + use_dep + use_http_middleware + Select，sqlite内存库"""
+    await create_users()
+    app = provide_app(FastAPI(), controllers=[UserQueryController])
+    request = BenchRequest('GET', '/user-query/all')
+    status, _, _ = await call_asgi(app, request, {})
+    assert status == 200
+    await bench.arun('e2e.user_all', lambda: call_asgi(app, request, {}), 500)
@@ -0,0 +1,51 @@
+"""import耗时基准，每次在新进程中导入
+
+cd tests && python -m pytest benchmark/bench_import.py -o python_files=bench_*.py -s
+"""
+
+import subprocess
+import sys
+
+# 只连sqlite时不应导入的驱动模块
+HEAVY_MODULES = (
+    'aiomysql',
+    'asyncmy',
+    'pymysql',
+    'asyncpg',
+    'tortoise.backends.mysql',
+    'tortoise.backends.asyncpg',
+)
+REPEAT = 5
+
+
+def import_module(module: str) -> tuple[float, list[str]]:
+    """在新进程中导入模块，返回(耗时(秒), 导入后的所有模块)"""
+    code = (
+        'import sys, time\n'
+        'start = time.perf_counter()\n'
+        f'import {module}\n'
+        'print(time.perf_counter() - start)\n'
+        'print(*sys.modules)'
+    )
+    out = subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    return float(out[0]), out[1].split()
+
+
+def best_import_time(module: str) -> tuple[float, list[str]]:
+    results = [import_module(module) for _ in range(REPEAT)]
+    return min(i[0] for i in results), results[0][1]
+
+
+def test_import_core():
+    elapsed, modules = best_import_time('fastapi_boot.core')
+    print(f'\nimport fastapi_boot.core: {elapsed * 1000:.1f}ms')
+    assert not [m for m in modules if m.startswith(('tortoise', 'fastapi_boot.tortoise_utils'))]
+
+
+def test_import_tortoise_utils():
+    elapsed, modules = best_import_time('fastapi_boot.tortoise_utils')
+    print(f'\nimport fastapi_boot.tortoise_utils: {elapsed * 1000:.1f}ms')
+    heavy = [m for m in modules if m.startswith(HEAVY_MODULES)]
+    assert not heavy, f'导入了数据库驱动: {heavy}'
@@ -0,0 +1,65 @@
+"""路由匹配耗时基准，50个Controller、每个5层Prefix共2500个路由，请求最后注册的路由
+
+cd tests && python -m pytest benchmark/bench_radix.py -o python_files=bench_*.py -s
+"""
+
+from statistics import quantiles
+from time import perf_counter
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fastapi_boot.core import Controller, Get, Prefix, provide_app
+
+CONTROLLERS = 50
+ROUTES_PER_PREFIX = 10
+PREFIX_DEPTH = 5
+REQUESTS = 2000
+
+
+def make_controller(index: int):
+    def make_routes(depth: int) -> dict:
+        attrs = {}
+        for i in range(ROUTES_PER_PREFIX):
+
+            def endpoint(self, id: int):
+                return id
+
+            endpoint.__qualname__ = f'Controller{index}.p{depth}.endpoint{i}'
+            attrs[f'endpoint{i}'] = Get(f'/item{i}/{{id}}')(endpoint)
+        if depth < PREFIX_DEPTH:
+            attrs[f'P{depth}'] = Prefix(f'/p{depth}')(
+                type(f'P{depth}', (), make_routes(depth + 1))
+            )
+        return attrs
+
+    return Controller(f'/c{index}')(type(f'Controller{index}', (), make_routes(1)))
+
+
+def measure(radix_router: bool) -> tuple[float, float]:
+    app = provide_app(
+        FastAPI(),
+        controllers=[make_controller(i) for i in range(CONTROLLERS)],
+        radix_router=radix_router,
+    )
+    path = f'/c{CONTROLLERS - 1}' + ''.join(f'/p{i}' for i in range(1, PREFIX_DEPTH)) + '/item9/1'
+    costs = []
+    with TestClient(app) as client:
+        assert client.get(path).json() == 1
+        for _ in range(REQUESTS):
+            start = perf_counter()
+            client.get(path)
+            costs.append(perf_counter() - start)
+    q = quantiles(costs, n=100)
+    return q[49], q[98]
+
+
+def test_radix_router():
+    p50, p99 = measure(radix_router=True)
+    plain_p50, plain_p99 = measure(radix_router=False)
+    print(
+        f'\n{CONTROLLERS * ROUTES_PER_PREFIX * PREFIX_DEPTH} routes: '
+        f'p50 {p50 * 1e6:.0f}us, p99 {p99 * 1e6:.0f}us '
+        f'(linear p50 {plain_p50 * 1e6:.0f}us, p99 {plain_p99 * 1e6:.0f}us)'
+    )
+    assert p50 < plain_p50
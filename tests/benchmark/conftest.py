@@ -0,0 +1,115 @@
+"""热点路径基准的基线比较
+
+- 每项耗时除以校准循环的耗时后和`baseline.json`比较，减小机器性能差异的影响
+- 比基线慢超过阈值时失败，阈值默认0.5(50%)，`--bench-threshold`或环境变量`FASTAPI_BOOT_BENCH_THRESHOLD`设置
+- `--bench-update`用本次结果更新基线
+
+cd tests && python -m pytest benchmark/bench_hotpaths.py -o python_files=bench_*.py -s
+cd tests && python -m pytest benchmark/bench_hotpaths.py -o python_files=bench_*.py -s --bench-update
+"""
+
+import json
+import os
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+import pytest
+
+BASELINE_PATH = Path(__file__).with_name('baseline.json')
+REPEAT = 7
+
+
+def pytest_addoption(parser: pytest.Parser):
+    group = parser.getgroup('benchmark')
+    group.addoption(
+        '--bench-threshold',
+        type=float,
+        default=float(os.environ.get('FASTAPI_BOOT_BENCH_THRESHOLD', 0.5)),
+        help='Allowed slowdown relative to the baseline, 0.5 means 50%%',
+    )
+    group.addoption(
+        '--bench-update', action='store_true', help='Overwrite the baseline with this run'
+    )
+
+
+def _work(d: dict, i: int) -> int:
+    d[i & 63] = i
+    return d.get(i & 31, 0)
+
+
+def calibrate(number: int = 5000) -> float:
+    """纯python的函数调用、字典读写，作为耗时单位"""
+    d: dict = {}
+    start = perf_counter()
+    for i in range(number):
+        _work(d, i)
+    return (perf_counter() - start) / number
+
+
+@dataclass
+class BenchRecorder:
+    # {名称: 耗时 / 校准耗时}
+    baseline: dict[str, float]
+    threshold: float
+    update: bool
+    results: dict[str, float] = field(default_factory=dict)
+
+    def check(self, name: str, elapsed: float, unit: float):
+        """记录每次操作的耗时(秒)，慢于基线超过阈值时失败
+
+        Args:
+            unit (float): 同时测得的校准循环耗时(秒)
+        """
+        ratio = elapsed / unit
+        self.results[name] = ratio
+        base = self.baseline.get(name)
+        diff = f'{ratio / base - 1:+.0%}' if base else 'no baseline'
+        print(f'\n{name:<28} {elapsed * 1e6:>10.2f}us {ratio:>10.1f}x  ({diff})', end='')
+        if base is None or self.update:
+            return
+        if ratio > base * (1 + self.threshold):
+            pytest.fail(
+                f'"{name}"比基线慢了{ratio / base - 1:.0%}，超过阈值{self.threshold:.0%}', pytrace=False
+            )
+
+    def run(self, name: str, func: Callable[[], Any], number: int = 10000) -> float:
+        """每轮先跑校准循环再跑被测函数，各取最快的一轮，CPU频率变化对两者影响相同"""
+        best = unit = float('inf')
+        for _ in range(REPEAT):
+            unit = min(unit, calibrate())
+            start = perf_counter()
+            for _ in range(number):
+                func()
+            best = min(best, perf_counter() - start)
+        self.check(name, best / number, unit)
+        return best / number
+
+    async def arun(self, name: str, func: Callable[[], Awaitable[Any]], number: int = 1000) -> float:
+        await func()
+        best = unit = float('inf')
+        for _ in range(REPEAT):
+            unit = min(unit, calibrate())
+            start = perf_counter()
+            for _ in range(number):
+                await func()
+            best = min(best, perf_counter() - start)
+        self.check(name, best / number, unit)
+        return best / number
+
+
+@pytest.fixture(scope='session')
+def bench(request: pytest.FixtureRequest):
+    config = request.config
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    recorder = BenchRecorder(
+        baseline,
+        config.getoption('--bench-threshold', 0.5),
+        config.getoption('--bench-update', False),
+    )
+    yield recorder
+    if recorder.update and recorder.results:
+        baseline.update({k: round(v, 2) for k, v in recorder.results.items()})
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
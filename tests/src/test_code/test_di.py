@@ -66,3 +66,94 @@ async def test_book_cnt(test_app1_async_client: AsyncClient):
     resp = await test_app1_async_client.get('/book/cnt')
     assert resp.status_code == 200
     assert resp.json() == 4
+
+
+def test_startup_profiler(tmp_path, capsys):
+    import sys
+    from dataclasses import dataclass
+
+    from fastapi_boot.cli.cli import main
+    from fastapi_boot.core import Bean, Controller, Get, Injectable
+    from fastapi_boot.core.profiler import startup_profiler
+
+    startup_profiler.clear()
+    startup_profiler.enable(trace_memory=False)
+    try:
+
+        @Injectable
+        class ProfiledService: ...
+
+        @Bean
+        def profiled_bean() -> int:
+            return 1
+
+        @Controller('/profiled')
+        @dataclass
+        class ProfiledController:
+            service: ProfiledService
+
+            @Get()
+            def get(self):
+                return 'profiled'
+
+    finally:
+        startup_profiler.disable()
+    stacks = [s.stack for s in startup_profiler.spans]
+    prefix = f'{__name__}.test_startup_profiler.<locals>'
+    assert (f'injectable:{prefix}.ProfiledService',) in stacks
+    assert (f'bean:{prefix}.profiled_bean',) in stacks
+    assert (
+        f'controller:{prefix}.ProfiledController',
+        f'injectable:{prefix}.ProfiledController',
+    ) in stacks
+    report = startup_profiler.report()
+    assert '# controller (1)' in report and '# bean (1)' in report
+
+    # 多个模块共享同一个loader实例时，各自记录自己的模块名
+    from importlib.abc import Loader, MetaPathFinder
+    from importlib.machinery import ModuleSpec
+
+    class SharedLoader(Loader):
+        def exec_module(self, module):
+            module.value = module.__name__
+
+    class SharedFinder(MetaPathFinder):
+        loader = SharedLoader()
+
+        def find_spec(self, fullname, path, target=None):
+            if fullname.startswith('profiled_shared_'):
+                return ModuleSpec(fullname, self.loader)
+            return None
+
+    finder = SharedFinder()
+    sys.meta_path.append(finder)
+    startup_profiler.clear()
+    startup_profiler.enable(trace_memory=False)
+    try:
+        import profiled_shared_a  # type: ignore
+        import profiled_shared_b  # type: ignore
+    finally:
+        startup_profiler.disable()
+        sys.meta_path.remove(finder)
+        sys.modules.pop('profiled_shared_a', None)
+        sys.modules.pop('profiled_shared_b', None)
+    assert (profiled_shared_a.value, profiled_shared_b.value) == ('profiled_shared_a', 'profiled_shared_b')
+    assert [s.stack for s in startup_profiler.spans] == [
+        ('import:profiled_shared_a',),
+        ('import:profiled_shared_b',),
+    ]
+    assert 'exec_module' not in vars(SharedFinder.loader)
+
+    # 命令行
+    startup_profiler.clear()
+    sys.modules.pop('src.test_project.scan.util', None)
+    output = tmp_path / 'startup.collapsed'
+    main(['profile', 'src.test_project.scan.util:scan_util', '-o', str(output), '--no-memory'])
+    assert 'src.test_project.scan.util' in capsys.readouterr().out
+    lines = output.read_text().splitlines()
+    assert any(
+        i.startswith('app:src.test_project.scan.util:scan_util;import:src.test_project.scan.util ')
+        for i in lines
+    )
+    assert not startup_profiler.enabled
+    startup_profiler.clear()
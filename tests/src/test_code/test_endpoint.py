@@ -1,8 +1,15 @@
+import json
+import warnings
+
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from httpx import Response, AsyncClient
 import pytest
 
+from fastapi_boot.core import provide_app
+from fastapi_boot.core.model import BaseHttpRouteItem
+from src.test_project.app1.main import app as app1
+
 
 def test_cbv(test_app1_client: TestClient):
     resp: Response = test_app1_client.get('/cbv')
@@ -16,6 +23,39 @@ def test_cbv(test_app1_client: TestClient):
     assert resp.json() == {'code': 0, 'msg': 'cbv_prefix_post'}
 
 
+def test_multi_methods(test_app1_client: TestClient):
+    for method in ('get', 'post'):
+        resp: Response = getattr(test_app1_client, method)('/cbv/multi')
+        assert resp.status_code == 200
+        assert resp.json() == {'code': 0, 'msg': 'cbv_multi'}
+    # 多个请求方法注册为一个路由，文档中每个请求方法的operationId不重复且与集合顺序无关
+    routes = [
+        r
+        for included in app1.routes
+        if hasattr(included, 'original_router')
+        for r in included.original_router.routes
+        if getattr(r, 'path', '') == '/cbv/multi'
+    ]
+    assert len(routes) == 1 and routes[0].methods == {'GET', 'POST'}
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        paths = app1.openapi()['paths']
+    assert {m: o['operationId'] for m, o in paths['/cbv/multi'].items()} == {
+        'get': 'func5_cbv_multi_get',
+        'post': 'func5_cbv_multi_post',
+    }
+
+    # 多个请求方法共用指定的operation_id时报错
+    with pytest.raises(ValueError, match='multi'):
+        BaseHttpRouteItem(
+            lambda: 'multi', '/multi', methods=['GET', 'POST'], operation_id='multi'
+        ).mount_to(FastAPI())
+    # 只有一个请求方法时保留指定的operation_id
+    app = provide_app(FastAPI())
+    BaseHttpRouteItem(lambda: 'one', '/one', methods=['GET'], operation_id='one').mount_to(app)
+    assert app.openapi()['paths']['/one']['get']['operationId'] == 'one'
+
+
 @pytest.mark.anyio
 async def test_fbv(test_app1_async_client: AsyncClient):
     resp: Response = await test_app1_async_client.put('/fbv')
@@ -28,3 +68,341 @@ def test_websocket(app_instance: FastAPI):
     with client.websocket_connect('/app1/websocket') as websocket:
         data = websocket.receive_json()
         assert data == {"msg": "Hello WebSocket"}
+
+
+def test_radix_router():
+    from fastapi import APIRouter
+    from fastapi.routing import APIRoute
+    from fastapi_boot.core.radix import RadixRouter, use_radix_router
+
+    def build():
+        app = FastAPI()
+        router = APIRouter(prefix='/nested')
+        router.add_api_route('/{id:int}', lambda id: f'int {id}')
+        router.add_api_route('/{name}', lambda name: f'str {name}')
+        app.include_router(router)
+        app.add_api_route('/static', lambda: 'static', methods=['POST'])
+        app.add_api_route('/files/{rest:path}', lambda rest: f'path {rest}')
+        app.add_api_route('/file-{id}.json', lambda id: f'mixed {id}')
+        app.mount('/sub', FastAPI())
+        return app
+
+    plain, radix = build(), build()
+    assert isinstance(use_radix_router(radix.router), RadixRouter)
+    # include_router的子路由各自作为候选，Mount、段中混有参数的路由总是作为候选
+    radix_router = radix.router.middleware_stack
+    assert isinstance(radix_router, RadixRouter)
+    paths = [r.path for r in radix_router.candidates('/nested/1')]
+    assert paths == ['/nested/{id:int}', '/nested/{name}', '/file-{id}.json', '/sub']
+    paths = [r.path for r in radix_router.candidates('/nested/abc')]
+    assert paths == ['/nested/{name}', '/file-{id}.json', '/sub']
+    for method, path in [
+        ('get', '/nested/1'),
+        ('get', '/nested/abc'),
+        ('get', '/nested/1/'),
+        ('post', '/static'),
+        ('get', '/static'),
+        ('get', '/files/a/b/c'),
+        ('get', '/file-3.json'),
+        ('get', '/missing'),
+    ]:
+        expected = getattr(TestClient(plain), method)(path, follow_redirects=False)
+        actual = getattr(TestClient(radix), method)(path, follow_redirects=False)
+        assert (actual.status_code, actual.text) == (expected.status_code, expected.text), path
+    # 之后添加的路由
+    radix.add_api_route('/late', lambda: 'late')
+    assert TestClient(radix).get('/late').json() == 'late'
+    # 原地替换路由后需要invalidate
+    radix.router.routes[-1:] = [APIRoute('/late', lambda: 'replaced')]
+    radix_router.invalidate()
+    assert TestClient(radix).get('/late').json() == 'replaced'
+
+
+def test_radix_router_app(test_app1_client: TestClient):
+    from src.test_project.app1.modules.endpoint.controller import endpoint_controllers
+    from fastapi_boot.core.radix import RadixRouter
+
+    # 与app1相同的Controller，单独的app启用前缀树路由
+    app = provide_app(FastAPI(), controllers=endpoint_controllers, radix_router=True)
+    assert isinstance(app.router.middleware_stack, RadixRouter)
+    client = TestClient(app)
+    for method, path in [
+        ('get', '/cbv'),
+        ('post', '/cbv/prefix1/prefix2/prefix3/prefix4/prefix5/prefix6/prefix7'),
+        ('get', '/cbv/multi'),
+        ('post', '/cbv/multi'),
+        ('put', '/fbv'),
+        ('delete', '/cbv'),
+        ('get', '/missing'),
+    ]:
+        expected = getattr(test_app1_client, method)(path, follow_redirects=False)
+        actual = getattr(client, method)(path, follow_redirects=False)
+        assert (actual.status_code, actual.text) == (expected.status_code, expected.text), path
+
+
+def test_warmup():
+    from src.test_project.scan.controller import ScanController
+
+    app = provide_app(FastAPI(), controllers=[ScanController], warmup=True)
+    included = [r for r in app.router.routes if hasattr(r, 'original_router')]
+    assert included and all(r._effective_candidates_version is not None for r in included)
+    assert app.openapi_schema is not None and '/scan' in app.openapi_schema['paths']
+    # 之后添加的路由
+    app.add_api_route('/late', lambda: 'late')
+    client = TestClient(app)
+    assert '/late' in client.get('/openapi.json').json()['paths']
+    with TestClient(app):
+        assert app.openapi_schema is not None and '/late' in app.openapi_schema['paths']
+
+
+def test_openapi_cache(tmp_path):
+    from fastapi_boot.core.openapi import OpenAPICache, route_table_hash
+    from src.test_project.scan.controller import ScanController
+
+    path = str(tmp_path / 'openapi.json')
+    app = provide_app(FastAPI(), controllers=[ScanController], openapi_cache=path)
+    assert '/scan' in TestClient(app).get('/openapi.json').json()['paths']
+    with open(path, 'rb') as f:
+        assert f.readline().strip().decode() == route_table_hash(app)
+
+    # 哈希一致时直接读取，不再生成
+    def fail():
+        raise AssertionError('不应重新生成')
+
+    app = provide_app(FastAPI(), controllers=[ScanController], openapi_cache=path)
+    cache = app.openapi
+    assert isinstance(cache, OpenAPICache)
+    cache.openapi = fail
+    resp = TestClient(app).get('/openapi.json')
+    assert resp.headers['content-type'] == 'application/json'
+    assert '/scan' in resp.json()['paths']
+    assert app.openapi()['paths'].keys() == resp.json()['paths'].keys()
+    # 被mount时加上root_path
+    assert json.loads(cache.content('/root'))['servers'] == [{'url': '/root'}]
+
+    # 路由变化后重新生成并写入
+    cache.openapi = FastAPI.openapi.__get__(app)
+    app.add_api_route('/late', lambda: 'late')
+    assert '/late' in TestClient(app).get('/openapi.json').json()['paths']
+    with open(path, 'rb') as f:
+        assert f.readline().strip().decode() == route_table_hash(app)
+
+
+def test_bench(capsys):
+    from fastapi_boot.cli.bench import BenchRequest, discover_routes, match_route, plain_app
+    from fastapi_boot.cli.cli import main
+    from src.test_project.scan.controller import ScanController
+
+    app = provide_app(FastAPI(), controllers=[ScanController])
+    app.add_api_route('/required', lambda q: q)
+    app.add_api_route('/path/{id}', lambda id: id)
+    assert [str(i) for i in discover_routes(app)] == ['GET /scan']
+    request = BenchRequest.parse('post /user/1?x=1')
+    assert (request.method, request.path, request.query) == ('POST', '/user/1', 'x=1')
+    # 对比的是同一个endpoint，Controller的方法绑定到实例
+    request = BenchRequest.parse('GET /scan')
+    matched = match_route(app, request)
+    assert matched is not None and matched[0] == '/scan'
+    plain = plain_app(request, *matched)
+    endpoint = plain.router.routes[-1].endpoint  # type: ignore
+    assert endpoint.__func__ is ScanController.get and isinstance(endpoint.__self__, ScanController)
+    assert TestClient(plain).get('/scan').json() == 'scan_controller'
+    assert match_route(app, BenchRequest.parse('GET /missing')) is None
+
+    main(['bench', 'src.test_project.app1.main:app', '-r', 'GET /hello', '-r', 'GET /not-found', '-n', '20', '--warmup', '2'])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split()[:2] == ['rps', 'p50']
+    hello = next(i for i in lines if i.endswith('GET /hello'))
+    assert '200x20' in hello
+    not_found = next(i for i in lines if i.endswith('GET /not-found'))
+    assert '404x20' in not_found and not_found.split()[4:6] == ['-', '-']
+    # 少于2个样本无法计算分位数
+    with pytest.raises(SystemExit):
+        main(['bench', 'src.test_project.app1.main:app', '-n', '1'])
+    assert 'must be at least 2' in capsys.readouterr().err
+
+
+def test_metrics():
+    from fastapi import HTTPException
+    from fastapi_boot.core import Controller, Get, Prefix, Req, use_metrics
+    from fastapi_boot.core.metrics import metrics_store
+
+    metrics_store.clear()
+
+    @Controller('/metrics-test')
+    class MetricsController:
+        _ = use_metrics('/admin/metrics', buckets=[1, 0.001])
+
+        @Get('/ok')
+        def ok(self, n: int = 0):
+            return n
+
+        @Get('/missing')
+        async def missing(self):
+            raise HTTPException(404)
+
+        @Req('/multi', methods=['GET', 'POST'])
+        def multi(self):
+            return 'multi'
+
+        @Prefix('/nested')
+        class Nested:
+            @Get('/plain')
+            def plain(self):
+                return 'plain'
+
+    app = provide_app(FastAPI(), controllers=[MetricsController])
+    client = TestClient(app)
+    assert client.get('/metrics-test/ok').status_code == 200
+    assert client.get('/metrics-test/ok', params={'n': 'x'}).status_code == 422
+    assert client.get('/metrics-test/missing').status_code == 404
+    client.post('/metrics-test/multi')
+    client.get('/metrics-test/nested/plain')
+
+    resp = client.get('/admin/metrics')
+    assert resp.headers['content-type'].startswith('text/plain; version=0.0.4')
+    text = resp.text
+    ok = 'controller="MetricsController",endpoint="ok",method="GET",path="/metrics-test/ok"'
+    assert f'fastapi_boot_requests_total{{{ok},status="2xx"}} 1' in text
+    assert f'fastapi_boot_requests_total{{{ok},status="4xx"}} 1' in text
+    assert 'endpoint="missing",method="GET",path="/metrics-test/missing",status="4xx"} 1' in text
+    assert 'endpoint="multi",method="POST",path="/metrics-test/multi",status="2xx"} 1' in text
+    assert f'fastapi_boot_requests_in_flight{{{ok}}} 0' in text
+    assert f'fastapi_boot_request_duration_seconds_bucket{{{ok},le="1.0"}} 2' in text
+    assert f'fastapi_boot_request_duration_seconds_bucket{{{ok},le="+Inf"}} 2' in text
+    assert f'fastapi_boot_request_duration_seconds_count{{{ok}}} 2' in text
+    # 只统计直接endpoint
+    assert 'nested' not in text
+    # 多个Controller共用同一个指标路由
+    assert [getattr(r, 'path', '') for r in app.routes].count('/admin/metrics') == 1
+    metrics_store.clear()
+
+
+@pytest.mark.anyio
+async def test_sampling_profiler(tmp_path):
+    import asyncio
+    import pstats
+    import time
+
+    from fastapi import Depends, HTTPException, Header
+    from httpx import ASGITransport
+    from fastapi_boot.core import Controller, Get, use_profiler
+    from fastapi_boot.core.sampling import sampling_profiler
+
+    sampling_profiler.clear()
+
+    def admin_only(token: str = Header('')):
+        if token != 'admin':
+            raise HTTPException(403)
+
+    def busy_wait():
+        time.sleep(0.02)
+
+    @Controller('/profiled-test')
+    class ProfiledController:
+        _ = use_profiler('/admin/profile', dependencies=[Depends(admin_only)])
+
+        @Get('/slow')
+        def slow(self):
+            busy_wait()
+            return 'slow'
+
+        @Get('/fast')
+        def fast(self):
+            return 'fast'
+
+    app = provide_app(FastAPI(), controllers=[ProfiledController])
+    client = AsyncClient(transport=ASGITransport(app=app), base_url='http://test')
+    assert (await client.get('/admin/profile')).status_code == 403
+    headers = {'token': 'admin'}
+    resp = await client.get('/admin/profile', params={'controller': 'Nope'}, headers=headers)
+    assert resp.status_code == 404
+
+    async def requests():
+        await asyncio.sleep(0.05)
+        for _ in range(10):
+            await client.get('/profiled-test/slow')
+            await client.get('/profiled-test/fast')
+            await asyncio.sleep(0)
+
+    async def profile(**params):
+        return await client.get(
+            '/admin/profile', params={'seconds': 0.4, 'interval': 0.002, **params}, headers=headers
+        )
+
+    resp, _ = await asyncio.gather(profile(route='/profiled-test/slow'), requests())
+    assert resp.status_code == 200
+    lines = resp.text.splitlines()
+    assert lines and all(i.startswith('ProfiledController.slow;') for i in lines)
+    assert any('busy_wait' in i for i in lines)
+    # 没有被选中的路由不采样
+    resp, _ = await asyncio.gather(profile(route='fast', format='collapsed'), requests())
+    assert 'busy_wait' not in resp.text
+
+    resp, _ = await asyncio.gather(profile(controller='ProfiledController', format='pstats'), requests())
+    path = tmp_path / 'profile.pstats'
+    path.write_bytes(resp.content)
+    stats = pstats.Stats(str(path))
+    assert any(name.endswith('busy_wait') for _, _, name in stats.stats)  # type: ignore
+
+    # 同时只能有一个采样
+    first, second = await asyncio.gather(profile(), profile())
+    assert {first.status_code, second.status_code} == {200, 409}
+    sampling_profiler.clear()
+
+
+def test_lag_monitor(caplog):
+    import time
+
+    from fastapi_boot.core import Controller, Get
+    from fastapi_boot.core.watchdog import loop_lag_monitor, use_lag_monitor
+
+    loop_lag_monitor.clear()
+
+    def block_loop():
+        time.sleep(0.2)
+
+    @Controller('/lag-test')
+    class LagController:
+        @Get('/block')
+        def block(self):
+            block_loop()
+            return 'block'
+
+        @Get('/fast')
+        async def fast(self):
+            return 'fast'
+
+    app = provide_app(FastAPI(), controllers=[LagController], lag_threshold=0.05)
+    with TestClient(app) as client:
+        assert loop_lag_monitor.running
+        client.get('/lag-test/fast')
+        assert loop_lag_monitor.counts() == {}
+        client.get('/lag-test/block')
+        time.sleep(0.1)
+        assert loop_lag_monitor.counts() == {'LagController.block': 1}
+        event = loop_lag_monitor.events[-1]
+        assert event.request == 'GET /lag-test/block'
+        assert event.lag >= 0.1
+        assert event.stack[-1].startswith('sleep') or any('block_loop' in i for i in event.stack)
+        assert loop_lag_monitor.stats['LagController.block'].max == event.lag
+    assert not loop_lag_monitor.running
+
+    # 普通路由，日志
+    loop_lag_monitor.clear()
+
+    async def block_async():
+        block_loop()
+
+    app = FastAPI()
+    app.add_api_route('/block', block_async)
+    # 同步endpoint在线程池中执行，不会阻塞事件循环
+    app.add_api_route('/sync', lambda: block_loop())
+    use_lag_monitor(app, threshold=0.05, log=True)
+    with caplog.at_level('WARNING', logger='fastapi_boot.watchdog'), TestClient(app) as client:
+        client.get('/sync')
+        client.get('/block')
+        time.sleep(0.1)
+    assert loop_lag_monitor.counts() == {f'{__name__}.test_lag_monitor.<locals>.block_async': 1}
+    assert len(caplog.records) == 1 and 'GET /block' in caplog.records[0].getMessage()
+    loop_lag_monitor.clear()
@@ -0,0 +1,102 @@
+import sys
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fastapi_boot.core import provide_app
+from fastapi_boot.core.const import app_task_store
+from fastapi_boot.core.scan import load_manifest, write_manifest
+
+PACKAGE = 'src.test_project.scan'
+
+
+def assert_routes(app: FastAPI):
+    client = TestClient(app)
+    assert client.get('/scan').json() == 'scan_controller'
+    assert client.get('/scan-fbv').json() == 'scan_fbv'
+    assert client.get('/scan-nested/prefix').json() == 'scan_nested'
+
+
+def test_scan(tmp_path):
+    manifest_path = str(tmp_path / 'manifest.json')
+    assert_routes(provide_app(FastAPI(), scan_package=PACKAGE, manifest_path=manifest_path))
+    manifest = load_manifest(manifest_path, PACKAGE)
+    assert manifest is not None
+    assert manifest.modules == [
+        f'{PACKAGE}.controller',
+        f'{PACKAGE}.fbv',
+        f'{PACKAGE}.nested.controller',
+    ]
+    assert set(manifest.files) == {'controller.py', 'fbv.py', 'util.py', 'nested/controller.py'}
+
+    # 清单有效时只导入清单中的模块
+    sys.modules.pop(f'{PACKAGE}.util')
+    assert_routes(provide_app(FastAPI(), scan_package=PACKAGE, manifest_path=manifest_path))
+    assert f'{PACKAGE}.util' not in sys.modules
+
+    # 文件变化后全量扫描
+    manifest.files['util.py'] = [0, 0, 'changed']
+    write_manifest(manifest_path, manifest)
+    assert_routes(provide_app(FastAPI(), scan_package=PACKAGE, manifest_path=manifest_path))
+    assert f'{PACKAGE}.util' in sys.modules
+    manifest = load_manifest(manifest_path, PACKAGE)
+    assert manifest is not None and manifest.files['util.py'][2] != 'changed'
+
+
+def test_lazy(tmp_path):
+    from fastapi_boot.core.lazy import LazyRoute
+    from fastapi_boot.core.radix import RadixRouter, iter_leaf_routes
+
+    def candidate_paths(path: str) -> set[str]:
+        radix = app.router.middleware_stack
+        assert isinstance(radix, RadixRouter)
+        return {r.path for r in radix.candidates(path)}
+
+    def leaf_paths(app: FastAPI) -> list[str]:
+        return [p for r in app.router.routes for p, _ in iter_leaf_routes(r)]
+
+    manifest_path = str(tmp_path / 'manifest.json')
+    # 第一次启动全量扫描，生成清单
+    eager_app = provide_app(FastAPI(), scan_package=PACKAGE, manifest_path=manifest_path)
+    assert_routes(eager_app)
+    manifest = load_manifest(manifest_path, PACKAGE)
+    assert manifest is not None
+    assert manifest.routes[f'{PACKAGE}.nested.controller'] == [['/scan-nested/prefix', ['GET']]]
+    assert manifest.eager == []
+
+    nested = f'{PACKAGE}.nested.controller'
+    # 模拟新进程
+    sys.modules.pop(nested)
+    for key in app_task_store.keys_of({nested}):
+        app_task_store.modules.pop(key)
+    app = provide_app(
+        FastAPI(), scan_package=PACKAGE, manifest_path=manifest_path, lazy=True, radix_router=True
+    )
+    assert nested not in sys.modules
+    assert {r.module for r in app.router.routes if isinstance(r, LazyRoute)} == {
+        f'{PACKAGE}.controller',
+        f'{PACKAGE}.fbv',
+        nested,
+    }
+    client = TestClient(app)
+    # 请求方法不匹配时同样加载模块，由真正的路由返回405
+    assert client.post('/scan-nested/prefix').status_code == 405
+    assert nested in sys.modules
+    assert client.get('/scan-nested/prefix').json() == 'scan_nested'
+    assert {r.module for r in app.router.routes if isinstance(r, LazyRoute)} == {
+        f'{PACKAGE}.controller',
+        f'{PACKAGE}.fbv',
+    }
+    # 占位路由被替换为数量相同的路由后前缀树同样重建，候选路由只有匹配的路由
+    assert candidate_paths('/scan') == {'/scan'}
+    assert client.get('/scan-fbv').json() == 'scan_fbv'
+    assert candidate_paths('/scan-fbv') == {'/scan-fbv'}
+    assert candidate_paths('/scan-nested/prefix') == {'/scan-nested/prefix'}
+    # 生成文档时加载所有模块
+    assert '/scan-fbv' in client.get('/openapi.json').json()['paths']
+    assert not any(isinstance(r, LazyRoute) for r in app.router.routes)
+    assert candidate_paths('/scan-fbv') == {'/scan-fbv'}
+    assert candidate_paths('/scan') == {'/scan'}
+    assert_routes(app)
+    # 按需加载的顺序不同，路由顺序仍与不延迟挂载时相同
+    assert leaf_paths(app) == leaf_paths(eager_app)
@@ -1,5 +1,45 @@
+from array import array
+import asyncio
+import json
+import struct
 from httpx import AsyncClient
+from pydantic import BaseModel
 import pytest
+from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+from tortoise.backends.base.client import Capabilities, PoolConnectionWrapper
+from fastapi_boot.tortoise_utils import (
+    Columns,
+    Dialect,
+    Export,
+    QueryGroup,
+    Repository,
+    Select,
+    Row,
+    Sql,
+    SqlTimeoutException,
+    Upsert,
+    connection_pinning,
+    dialect_registry,
+    query_budget_store,
+    query_counting,
+    query_plan_recorder,
+    single_flight_store,
+    sql_timeout_store,
+    statement_timeout,
+    UnsupportedDialectException,
+)
+
+from fastapi_boot.core import inject
+from fastapi_boot.tortoise_utils.connection import PinnedConnection
+
+from src.test_project.app1.modules.tortoise_utils.dao import (
+    UserDao,
+    UserModelRepository,
+    UserRepository,
+    get_all_user,
+)
+from src.test_project.app1.modules.tortoise_utils.model import User, UserDTO, UserVO
 
 
 @pytest.mark.anyio
@@ -41,3 +81,567 @@ async def test_middleware(test_app1_async_client: AsyncClient):
     })
     assert resp.status_code == 200
     assert resp.json()['data'] == 1
+
+
+@pytest.mark.anyio
+async def test_keyset_page(test_app1_async_client: AsyncClient):
+    for i in range(5):
+        resp = await test_app1_async_client.post('/user', json={
+            'id': i,
+            'name': f'user{i}',
+            'age': 20 + i
+        })
+        assert resp.status_code == 200
+
+    names = []
+    cursor = None
+    while True:
+        params = {} if cursor is None else {'cursor': cursor}
+        resp = await test_app1_async_client.get('/user/page', params=params)
+        assert resp.status_code == 200
+        page = resp.json()['data']
+        assert len(page['items']) <= 2
+        names.extend(i['name'] for i in page['items'])
+        if not page['has_next']:
+            assert page['next_cursor'] is None
+            break
+        cursor = page['next_cursor']
+    assert names == [f'user{i}' for i in range(5)]
+
+
+@pytest.mark.anyio
+async def test_columns(test_app1_async_client: AsyncClient):
+    for i in range(3):
+        await test_app1_async_client.post('/user', json={
+            'id': i,
+            'name': f'user{i}',
+            'age': 20 + i
+        })
+
+    resp = await test_app1_async_client.get('/user/columns')
+    assert resp.status_code == 200
+    columns = resp.json()
+    assert columns['name'] == ['user0', 'user1', 'user2']
+    assert columns['age'] == [20, 21, 22]
+
+    resp = await test_app1_async_client.get('/user/columns', params={'binary': True})
+    assert resp.status_code == 200
+    content = resp.content
+    header_len = struct.unpack('<I', content[:4])[0]
+    header = json.loads(content[4:4 + header_len])
+    assert header['length'] == 3
+    offset = 4 + header_len
+    data = {}
+    for name, typecode, size in header['columns']:
+        chunk = content[offset:offset + size]
+        offset += size
+        data[name] = json.loads(chunk) if typecode == 'json' else array(typecode, chunk).tolist()
+    assert data['age'] == [20, 21, 22]
+    assert data['name'] == ['user0', 'user1', 'user2']
+
+    # 含None或超出int64范围时为list
+    rows = [{'id': 1, 'name': 'foo', 'age': 2**63}, {'id': 2, 'name': None, 'age': 20}]
+    columns = Columns.from_rows(UserVO, rows)
+    assert isinstance(columns['id'], array)
+    assert columns['age'] == [2**63, 20]
+    assert columns['name'] == ['foo', None]
+
+
+@pytest.mark.anyio
+async def test_rows():
+    await User.create(name='foo', age=20)
+    await User.create(name='bar', age=21)
+
+    rows = await Select('select name, age from user order by age').execute()
+    assert isinstance(rows[0], Row)
+    assert rows[0].name == 'foo'
+    assert rows[1]['age'] == 21
+    assert rows[1][0] == 'bar'
+    assert dict(rows[0]) == {'name': 'foo', 'age': 20}
+    # 同一条语句的行共享同一个Row子类
+    assert type(rows[0]) is type(rows[1])
+
+    # 与Mapping方法同名的列只能用下标读取
+    row = (await Select('select name as keys, age as get from user order by age').execute())[0]
+    assert (row['keys'], row['get']) == ('foo', 20)
+    assert callable(row.keys) and dict(row) == {'keys': 'foo', 'get': 20}
+
+    dicts = await Select('select name, age from user order by age').execute(list[dict])
+    assert type(dicts[0]) is dict
+    assert dicts == [dict(i) for i in rows]
+
+
+@pytest.mark.anyio
+async def test_gather(monkeypatch: pytest.MonkeyPatch):
+    await User.create(name='foo', age=20)
+
+    rows, cnt = await Sql.gather(
+        Select('select name from user').execute(),
+        Select('select count(*) as cnt from user').execute(),
+    )
+    assert rows[0].name == 'foo'
+    assert cnt[0].cnt == 1
+
+    running = max_running = 0
+
+    class SlowClient(FakePooledClient):
+        async def execute_query(self, query, values=None):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return 1, []
+
+    monkeypatch.setattr(Tortoise, 'get_connection', lambda _: SlowClient())
+
+    async def query(i: int):
+        # 嵌套的QueryGroup共用外层的限制
+        await Sql.gather(*[Sql('select 1').execute() for _ in range(3)], limit=5)
+        return i
+
+    assert await QueryGroup(limit=2).gather(*map(query, range(3))) == list(range(3))
+    assert max_running == 2
+
+
+@pytest.mark.anyio
+async def test_timeout():
+    endless = Select(
+        'with recursive c(x) as (select 1 union all select x + 1 from c) select count(*) as cnt from c',
+        timeout=0.1,
+    )
+    with pytest.raises(SqlTimeoutException):
+        await endless.execute()
+    assert sql_timeout_store.records[endless.sql].timeouts == 1
+
+    # 超时的语句被中断，连接可以继续使用
+    with statement_timeout(1):
+        rows = await Select('select 1 as one').execute()
+    assert rows[0].one == 1
+
+    # statement_timeout覆盖Sql的timeout
+    with statement_timeout(0.05), pytest.raises(SqlTimeoutException):
+        await Select(endless.sql, timeout=10).execute()
+    assert sql_timeout_store.timeouts >= 2
+
+    # statement_timeout(0)不限制，不会回退到Sql的timeout
+    quick = 'with recursive c(x) as (select 1 union all select x + 1 from c where x < 200000) select count(*) as cnt from c'
+    with statement_timeout(0):
+        rows = await Select(quick, timeout=1e-6).execute()
+    assert rows[0].cnt == 200000
+
+
+@pytest.mark.anyio
+async def test_upsert(monkeypatch: pytest.MonkeyPatch):
+    await User.create(id=1, name='foo', age=20)
+
+    dao = inject(UserDao)
+    await dao.upsert([
+        UserDTO(id=1, name='foo', age=30),
+        UserDTO(id=2, name='bar', age=21),
+        UserDTO(id=3, name='baz', age=22),
+    ])
+    users = await User.all().order_by('id').values('id', 'name', 'age')
+    assert users == [
+        {'id': 1, 'name': 'foo', 'age': 30},
+        {'id': 2, 'name': 'bar', 'age': 21},
+        {'id': 3, 'name': 'baz', 'age': 22},
+    ]
+
+    # 冲突时不更新
+    upsert = Upsert(User.Meta.table, conflict='id', update=[])
+    await upsert.execute([{'id': 1, 'name': 'foo', 'age': 40}, {'id': 4, 'name': 'qux', 'age': 23}])
+    assert (await User.get(id=1)).age == 30
+    assert (await User.get(id=4)).name == 'qux'
+
+    # 只更新指定列
+    bar = await User.get(id=2)
+    bar.name, bar.age = 'bar2', 31
+    await Upsert(User.Meta.table, conflict='id', update=['age']).execute([bar])
+    bar = await User.get(id=2)
+    assert (bar.name, bar.age) == ('bar', 31)
+
+    # 没有记录列表参数时在装饰时报错
+    with pytest.raises(TypeError, match='记录列表参数'):
+        @Upsert(User.Meta.table, conflict='id')
+        async def no_records(): ...
+
+    # mysql用行别名
+    monkeypatch.setattr(Tortoise, 'get_connection', lambda _: FakePooledClient())
+    sql = Upsert(User.Meta.table, conflict='id')._render(('id', 'name', 'age'), 1)
+    assert sql.endswith(' as new on duplicate key update `name`=new.`name`, `age`=new.`age`')
+
+
+@pytest.mark.anyio
+async def test_single_flight():
+    await User.create(name='foo', age=20)
+    slow = Select(
+        'with recursive c(x) as (select 1 union all select x + 1 from c where x < 200000) '
+        'select count(*) as cnt, {name} as name from c',
+        single_flight=True,
+    )
+
+    @slow
+    async def query(name: str): ...
+
+    results = await asyncio.gather(*[query('foo') for _ in range(10)], query('bar'))
+    assert [i[0].name for i in results] == ['foo'] * 10 + ['bar']
+    record = single_flight_store.records[slow.sql]
+    assert (record.executions, record.shared) == (2, 9)
+    # 相等但类型不同的参数不共享
+    results = await asyncio.gather(query(1), query(1.0))  # type: ignore
+    assert [type(i[0].name) for i in results] == [int, float]
+
+    # 发起执行的调用被取消，其他调用方仍能拿到结果
+    leader = asyncio.create_task(query('baz'))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(query('baz'))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert (await follower)[0].cnt == 200000
+    assert leader.cancelled()
+    assert not single_flight_store.in_flight
+
+
+class FakePool:
+    def __init__(self):
+        self.acquired = 0
+        self.released = 0
+
+    async def acquire(self):
+        self.acquired += 1
+        return object()
+
+    async def release(self, connection):
+        self.released += 1
+
+
+class FakePooledClient:
+    def __init__(self, dialect: str = 'mysql'):
+        self._pool = FakePool()
+        self._pool_init_lock = asyncio.Lock()
+        self.capabilities = Capabilities(dialect)
+
+    def acquire_connection(self):
+        return PoolConnectionWrapper(self, self._pool_init_lock)
+
+    async def execute_query(self, query, values=None):
+        async with self.acquire_connection() as connection:
+            return 1, [{'connection': id(connection)}]
+
+
+class PinnableDialect(Dialect):
+    name = 'pinnable'
+    pinnable = True
+
+    async def execute(self, connection, sql, params):
+        await asyncio.sleep(0)
+        return 1, [{'connection': id(connection)}]
+
+
+@pytest.mark.anyio
+async def test_connection_pinning(monkeypatch: pytest.MonkeyPatch):
+    client = FakePooledClient('pinnable')
+    monkeypatch.setattr(Tortoise, 'get_connection', lambda _: client)
+    dialect_registry.register('pinnable', PinnableDialect)
+    try:
+        await Sql('select 1').execute()
+        await Sql('select 1').execute()
+        assert client._pool.acquired == 2
+
+        async with connection_pinning():
+            results = [await Sql('select 1').execute() for _ in range(3)]
+            assert client._pool.acquired == 3
+            assert client._pool.released == 2
+            # 并发的查询不使用固定的连接，各自从连接池获取
+            await Sql.gather(*[Sql('select 1').execute() for _ in range(2)])
+            assert client._pool.acquired == 5
+            assert client._pool.released == 4
+        assert len({rows[0]['connection'] for _, rows in results}) == 1
+        assert client._pool.released == 5
+    finally:
+        dialect_registry.targets.pop('pinnable')
+        dialect_registry.dialects.pop('pinnable')
+
+    # 方言不支持在驱动连接上执行时不固定
+    client = FakePooledClient('unknown')
+    async with connection_pinning():
+        await Sql.gather(*[Sql('select 1').execute() for _ in range(3)])
+    assert client._pool.acquired == client._pool.released == 3
+
+
+@pytest.mark.anyio
+async def test_connection_pinning_transaction():
+    async with connection_pinning() as connections:
+        # 事务中第一次执行sql，不缓存不能固定的结果
+        async with in_transaction():
+            await Sql('select 1').execute()
+        assert connections.connections == {}
+
+        # 已经固定了连接(如mysql在事务外执行过sql)，事务中的sql仍在事务的连接上执行
+        wrapper = FakePooledClient('pinnable').acquire_connection()
+        connection = await wrapper.__aenter__()
+        connections.connections['default'] = PinnedConnection(wrapper, connection, PinnableDialect())
+        with pytest.raises(ZeroDivisionError):
+            async with in_transaction():
+                await Sql("insert into user (name, age) values ('pinned', 1)").execute()
+                rows = await Select('select name from user').execute()
+                assert [i.name for i in rows] == ['pinned']
+                1 / 0
+        assert await User.filter(name='pinned').count() == 0
+        # 事务结束后继续使用固定的连接
+        _, rows = await Sql('select 1').execute()
+        assert rows == [{'connection': id(connection)}]
+
+
+@pytest.mark.anyio
+async def test_query_plan():
+    for i in range(3):
+        await User.create(name=f'user{i}', age=20 + i)
+
+    @Select('select * from {user} where id = {id}').fill(user=User.Meta.table)
+    async def get_user_by_id(id: int) -> list[dict]: ...
+
+    @Select('select name from {user} order by age').fill(user=User.Meta.table)
+    async def get_names() -> list[dict]: ...
+
+    query_plan_recorder.enable(min_rows=2)
+    try:
+        with pytest.warns(UserWarning, match='全表扫描'):
+            await get_all_user()
+        await get_all_user()
+        await get_user_by_id(1)
+        with pytest.warns(UserWarning, match='临时B树排序'):
+            await get_names()
+        # 每条语句只EXPLAIN一次
+        assert len(query_plan_recorder.plans) == 3
+        plans = {i.name.rsplit('.', 1)[-1]: i for i in query_plan_recorder.plans.values()}
+        assert plans['get_all_user'].warnings
+        assert not plans['get_user_by_id'].warnings
+        assert any(i.startswith('SEARCH') for i in plans['get_user_by_id'].plan)
+        report = query_plan_recorder.report(only_warnings=True)
+        assert 'dao.get_all_user' in report
+        assert 'get_user_by_id' not in report
+    finally:
+        query_plan_recorder.disable()
+        query_plan_recorder.clear()
+    await get_names()
+    assert not query_plan_recorder.plans
+
+
+@pytest.mark.anyio
+async def test_query_counter(test_app1_async_client: AsyncClient):
+    for i in range(5):
+        await User.create(name=f'user{i}', age=20 + i)
+    query_budget_store.clear()
+
+    resp = await test_app1_async_client.get('/user-query/all')
+    assert resp.headers['X-Query-Count'] == '1'
+    assert float(resp.headers['X-Query-Count-Time']) >= 0
+    query_budget_store.assert_budget('GET /user-query/all', max_statements=1, max_repeats=1)
+
+    # N+1查询：1条查所有 + 5条按id查
+    with pytest.warns(UserWarning, match='N\\+1'):
+        resp = await test_app1_async_client.get('/user-query/one-by-one')
+    assert len(resp.json()['data']) == 5
+    assert resp.headers['X-Query-Count'] == '6'
+    record = query_budget_store.records['GET /user-query/one-by-one']
+    assert (record.requests, record.max_statements, record.max_repeats) == (1, 6, 5)
+    with pytest.raises(AssertionError, match='超过预算'):
+        query_budget_store.assert_budget('GET /user-query/one-by-one', max_repeats=1)
+
+    # 非请求中
+    with query_counting() as counter:
+        await get_all_user()
+        await get_all_user()
+    assert counter.count == 2
+    assert counter.repeated(1) == {'select * from user': 2}
+    query_budget_store.clear()
+
+
+@pytest.mark.anyio
+async def test_repository(monkeypatch: pytest.MonkeyPatch):
+    repo = inject(UserRepository)
+    assert isinstance(repo, UserRepository)
+
+    assert await repo.create(UserDTO(id=1, name='foo', age=20)) == 1
+    assert await repo.create_many([{'name': f'user{i}', 'age': 21 + i} for i in range(4)]) == 4
+    assert await repo.count() == 5
+
+    user = await repo.get_by_id(1)
+    assert isinstance(user, UserVO) and user.name == 'foo'
+    assert await repo.get_by_id(100) is None
+    assert [i.id for i in await repo.get_by_ids([1, 2, 100])] == [1, 2]
+    assert [i.id for i in await repo.get_all()] == [1, 2, 3, 4, 5]
+
+    page = await repo.get_page(limit=2)
+    assert [i.id for i in page.items] == [1, 2] and page.has_next
+    page = await repo.get_page(page.next_cursor, limit=2)
+    assert [i.id for i in page.items] == [3, 4]
+
+    # 只更新设置了的字段
+    assert await repo.update(UserVO.model_construct(id=1, age=30, _fields_set={'id', 'age'})) == 1
+    user = await repo.get_by_id(1)
+    assert (user.name, user.age) == ('foo', 30)
+
+    await repo.upsert_many([UserDTO(id=1, name='foo', age=31), UserDTO(id=6, name='bar', age=40)])
+    assert (await repo.get_by_id(1)).age == 31
+    assert await repo.count() == 6
+
+    assert await repo.delete_by_id(6) == 1
+    assert await repo.delete_by_ids([4, 5, 100]) == 2
+    assert await repo.count() == 3
+
+    # 语句只编译一次
+    size = len(UserRepository._statements)
+    await repo.get_by_id(2)
+    await repo.get_all()
+    assert len(UserRepository._statements) == size
+
+    # in列表的参数个数补齐到2的幂
+    assert [i.id for i in await repo.get_by_ids([1, 2, 3])] == [1, 2, 3]
+    assert [i.id for i in await repo.get_by_ids([3, 2, 1, 100, 101])] == [1, 2, 3]
+    keys = [k[1:] for k in UserRepository._statements if k[1] == 'get_by_ids']
+    assert sorted(keys) == [('get_by_ids', 4), ('get_by_ids', 8)]
+
+    # 缓存的语句数有上限，淘汰最久未用的
+    monkeypatch.setattr(UserRepository, 'max_statements', 2)
+    await repo.count()
+    await repo.get_by_ids([1])
+    assert [k[1:] for k in UserRepository._statements] == [('count',), ('get_by_ids', 1)]
+    monkeypatch.undo()
+
+    # 更新时缺少主键
+    with pytest.raises(ValueError, match='主键'):
+        await repo.update({'name': 'foo'})
+
+    # upsert语句按Repository缓存一个
+    assert UserRepository._upsert is not None and not any(
+        k[1] == 'upsert_many' for k in UserRepository._statements
+    )
+
+    # VO中没有主键时也按主键分页
+    class NameVO(BaseModel):
+        name: str
+
+    class UserNameRepository(Repository[User, NameVO], name='user_name'): ...
+
+    name_repo = inject(UserNameRepository, 'user_name')
+    page = await name_repo.get_page(limit=2)
+    assert [i.name for i in page.items] == ['foo', 'user0'] and page.has_next
+    page = await name_repo.get_page(page.next_cursor, limit=2)
+    assert [i.name for i in page.items] == ['user1'] and not page.has_next
+
+    # VO为Model时返回Model实例
+    model_repo = inject(UserModelRepository, 'user_model')
+    user = await model_repo.get_by_id(1)
+    assert isinstance(user, User) and user.age == 31
+    user.age = 32
+    await user.save()
+    assert (await repo.get_by_id(1)).age == 32
+
+
+@pytest.mark.anyio
+async def test_export(test_app1_async_client: AsyncClient):
+    await User.bulk_create([User(name=f'user{i}', age=i) for i in range(25)])
+
+    resp = await test_app1_async_client.get('/user/export', params={'age': 5})
+    assert resp.headers['content-type'].startswith('text/csv')
+    assert resp.headers['content-disposition'] == 'attachment; filename="users.csv"'
+    lines = resp.text.splitlines()
+    assert lines[0] == 'id,name,age'
+    assert len(lines) == 21
+    assert lines[1] == '6,user5,5'
+
+    # 分批读取
+    export = Export('select id, name from user order by id', chunk_size=10)
+    sizes = [len(rows) async for rows in export.stream()]
+    assert sizes == [10, 10, 5]
+
+    resp = await export.execute()
+    assert resp.media_type == 'application/x-ndjson'
+    body = b''.join([chunk async for chunk in resp.body_iterator])
+    rows = [json.loads(i) for i in body.decode().splitlines()]
+    assert len(rows) == 25
+    assert rows[0] == {'id': 1, 'name': 'user0'}
+
+    # 装饰方法
+    resp = await inject(UserDao).export_names(22)
+    body = b''.join([chunk async for chunk in resp.body_iterator])
+    assert body.decode().splitlines() == ['name', 'user22', 'user23', 'user24']
+
+    # 中途停止时释放连接
+    stream = export.stream()
+    await anext(stream)
+    await stream.aclose()
+    assert await Select('select count(*) as cnt from user').execute(list[dict]) == [{'cnt': 25}]
+
+
+def test_dialect():
+    assert Sql('select 1').dialect is dialect_registry.get('sqlite')
+    assert dialect_registry.get('postgres').compile(['a=', ' and b=', '']) == 'a=$1 and b=$2'
+    assert dialect_registry.get('mysql').compile(['a=', ' and b=', '']) == 'a=%s and b=%s'
+
+    class FooDialect(Dialect):
+        name = 'foo'
+        placeholder = ':p'
+        numbered_placeholder = True
+
+    dialect_registry.register('foo', FooDialect)
+    try:
+        assert dialect_registry.get('foo').compile(['a=', '']) == 'a=:p1'
+        # 未实现游标读取
+        with pytest.raises(UnsupportedDialectException, match='foo'):
+            dialect_registry.get('foo').cursor(None, 'select 1', [], 10)
+    finally:
+        dialect_registry.targets.pop('foo')
+        dialect_registry.dialects.pop('foo')
+
+
+@pytest.mark.anyio
+async def test_mysql_cursor(monkeypatch):
+    from tortoise.backends.mysql.client import mysql
+
+    class FakeCursor:
+        description = [('id',)]
+
+        def __init__(self, cursor_class):
+            self.cursor_class = cursor_class
+            self.rows = [(1,), (2,), (3,)]
+            self.rowcount = 3
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *_):
+            pass
+
+        async def execute(self, sql, params):
+            pass
+
+        async def fetchall(self):
+            return self.rows
+
+        async def fetchmany(self, size):
+            rows, self.rows = self.rows[:size], self.rows[size:]
+            return rows
+
+        async def close(self):
+            pass
+
+    class FakeConnection:
+        """asyncmy的cursor()直接返回游标"""
+
+        def cursor(self, cursor_class=None):
+            return FakeCursor(cursor_class)
+
+    dialect = dialect_registry.get('mysql')
+    # 与tortoise使用同一个驱动的不缓冲游标
+    cursor_class = dialect.unbuffered_cursor_class()
+    assert cursor_class.__module__ == f'{mysql.__name__}.cursors'
+    chunks = [i async for i in dialect.cursor(FakeConnection(), 'select id', [], 2)]
+    assert chunks == [[(1,), (2,)], [(3,)]]
+    # 驱动没有不缓冲的游标时读到内存后分批
+    monkeypatch.setattr(type(dialect), 'unbuffered_cursor_class', lambda self: None)
+    chunks = [i async for i in dialect.cursor(FakeConnection(), 'select id', [], 2)]
+    assert chunks == [[{'id': 1}, {'id': 2}], [{'id': 3}]]
@@ -3,7 +3,7 @@ from .modules.book.controller import BookController
 from .modules.endpoint.controller import endpoint_controllers
 from .modules.middleware.controller import MiddlewareController
 from .modules.subapp.controller import SubAppController
-from .modules.tortoise_utils.controller import UserController
+from .modules.tortoise_utils.controller import UserController, UserQueryController
 
 app = provide_app(
     controllers=[
@@ -12,5 +12,6 @@ app = provide_app(
         MiddlewareController,
         SubAppController,
         UserController,
+        UserQueryController,
     ]
 )
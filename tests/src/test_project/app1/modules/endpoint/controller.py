@@ -1,5 +1,5 @@
 from fastapi import FastAPI, WebSocket
-from fastapi_boot.core import Controller, Get, Prefix, Post, WS
+from fastapi_boot.core import Controller, Get, Prefix, Post, Req, WS
 
 
 @Controller('/cbv')
@@ -8,6 +8,10 @@ class EndpointController:
     def func1(self):
         return {'code': 0, 'msg': 'cbv_get'}
 
+    @Req('/multi', methods=['GET', 'POST'])
+    def func5(self):
+        return {'code': 0, 'msg': 'cbv_multi'}
+
     @Prefix('/prefix1')
     class _:
         @Prefix('/prefix2')
@@ -1,7 +1,8 @@
 from dataclasses import dataclass
 from typing import Annotated
 from fastapi import Query
-from fastapi_boot.core import Controller, Get, Post, Delete
+from fastapi_boot.core import Controller, Get, Post, Delete, use_dep, use_http_middleware
+from fastapi_boot.tortoise_utils import Page, count_queries, pin_connection
 from .service import UserService
 from .model import BaseResp, UserDTO, UserVO
 
@@ -16,6 +17,22 @@ class UserController:
         users = await self.user_service.get_all()
         return BaseResp(data=users)
 
+    @Get('/export')
+    async def export_users(self, age: Annotated[int, Query()] = 0):
+        return await self.user_service.export(age)
+
+    @Get('/page', response_model=BaseResp[Page[UserVO]])
+    async def get_user_page(
+        self, cursor: Annotated[str | None, Query(description='游标')] = None
+    ):
+        page = await self.user_service.get_page(cursor)
+        return BaseResp(data=page)
+
+    @Get('/columns')
+    async def get_user_columns(self, binary: Annotated[bool, Query()] = False):
+        columns = await self.user_service.get_columns()
+        return columns.to_response(binary)
+
     @Get(response_model=BaseResp[list[UserVO]])
     async def get_user_by_name(self, name: Annotated[str, Query(description='用户名')]):
         users = await self.user_service.get_by_name(name)
@@ -37,3 +54,23 @@ class UserController:
     async def delete_by_name(self, name: Annotated[str, Query(description='用户名')]):
         cnt = await self.user_service.delete_by_name(name)
         return BaseResp(data=cnt)
+
+
+@Controller('/user-query')
+@dataclass
+class UserQueryController:
+    user_service: UserService
+    # 请求内的sql使用同一个连接
+    _ = use_dep(pin_connection)
+    # 统计每个请求执行的sql
+    query_counter = use_http_middleware(count_queries(repeat_threshold=3))
+
+    @Get('/all', response_model=BaseResp[list[UserVO]])
+    async def get_all_user(self):
+        users = await self.user_service.get_all()
+        return BaseResp(data=users)
+
+    @Get('/one-by-one', response_model=BaseResp[list[UserVO]])
+    async def get_all_user_one_by_one(self):
+        users = await self.user_service.get_all_one_by_one()
+        return BaseResp(data=users)
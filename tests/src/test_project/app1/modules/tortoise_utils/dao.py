@@ -1,5 +1,15 @@
 from fastapi_boot.core import Injectable
-from fastapi_boot.tortoise_utils import Select, Insert, Delete
+from fastapi.responses import StreamingResponse
+from fastapi_boot.tortoise_utils import (
+    Select,
+    Insert,
+    Delete,
+    Upsert,
+    Export,
+    Page,
+    Columns,
+    Repository,
+)
 
 from src.test_project.app1.modules.tortoise_utils.model import User, UserDTO, UserVO
 
@@ -9,6 +19,31 @@ from src.test_project.app1.modules.tortoise_utils.model import User, UserDTO, Us
 async def get_all_user() -> list[UserVO]: ...
 
 
+# keyset分页
+@Select('select * from {user}').fill(user=User.Meta.table).paginate('id', limit=2)
+async def get_user_page(cursor: str | None = None) -> Page[UserVO]: ...
+
+
+# 列式结果
+@Select('select * from {user}').fill(user=User.Meta.table)
+async def get_user_columns() -> Columns[UserVO]: ...
+
+
+# 流式导出
+@Export(
+    'select * from {user} where age >= {age} order by id',
+    format='csv',
+    chunk_size=10,
+    filename='users.csv',
+).fill(user=User.Meta.table)
+async def export_users(age: int) -> StreamingResponse: ...
+
+
+# 按id查询
+@Select('select * from {user} where id = {id}').fill(user=User.Meta.table)
+async def get_user_by_id(id: int) -> UserVO: ...
+
+
 # 函数调用
 
 
@@ -31,8 +66,25 @@ class UserDao:
     ).fill(table=User.Meta.table)
     async def create(self, user: UserDTO): ...
 
+    # 批量upsert
+    @Upsert(User.Meta.table, conflict='id', batch_size=2)
+    async def upsert(self, users: list[UserDTO]): ...
+
     async def delete_by_name(self, name: str):
         return await User.filter(name=name).delete()
 
     @Delete('delete from {table}').fill(table=User.Meta.table)
     async def clear(self): ...
+
+    # 方法装饰器导出
+    @Export('select name from {table} where age >= {age} order by id', format='csv').fill(
+        table=User.Meta.table
+    )
+    async def export_names(self, age: int) -> StreamingResponse: ...
+
+
+# 通用Repository
+class UserRepository(Repository[User, UserVO]): ...
+
+
+class UserModelRepository(Repository[User, User], name='user_model'): ...
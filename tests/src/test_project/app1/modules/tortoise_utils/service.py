@@ -3,7 +3,11 @@ from fastapi_boot.core import Injectable
 from .dao import (
     UserDao,
     get_all_user,
+    get_user_page,
+    get_user_columns,
     get_user_by_name,
+    get_user_by_id,
+    export_users,
 )
 from .model import UserDTO
 
@@ -16,6 +20,19 @@ class UserService:
     async def get_all(self):
         return await get_all_user()
 
+    async def get_page(self, cursor: str | None):
+        return await get_user_page(cursor)
+
+    async def get_columns(self):
+        return await get_user_columns()
+
+    async def get_all_one_by_one(self):
+        # N+1查询
+        return [await get_user_by_id(user.id) for user in await get_all_user()]
+
+    async def export(self, age: int):
+        return await export_users(age)
+
     async def get_by_name(self, name: str):
         return await get_user_by_name(name)
 
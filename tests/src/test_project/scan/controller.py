@@ -0,0 +1,8 @@
+from fastapi_boot.core import Controller, Get
+
+
+@Controller('/scan')
+class ScanController:
+    @Get()
+    def get(self):
+        return 'scan_controller'
@@ -0,0 +1,6 @@
+from fastapi_boot.core import Get
+
+
+@Get('/scan-fbv')
+def scan_fbv():
+    return 'scan_fbv'
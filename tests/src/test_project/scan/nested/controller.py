@@ -0,0 +1,10 @@
+from fastapi_boot.core import Controller, Get, Prefix
+
+
+@Controller('/scan-nested')
+class NestedScanController:
+    @Prefix('/prefix')
+    class Foo:
+        @Get()
+        def get(self):
+            return 'scan_nested'
@@ -0,0 +1,2 @@
+def scan_util():
+    return 'scan_util'